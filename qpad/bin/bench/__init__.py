@@ -0,0 +1,15 @@
+"""
+Suite de benchmarks de q2h.
+
+    python -m bench run [--quick] [--output res.json] [--baseline base.json]
+    python -m bench corpus -o doc.qtf [--paragraphs 1000 ...]
+
+(desde qpad/bin). corpus.py genera documentos QTF sintéticos y suite.py
+mide convert_qtf_to_html, process_block y post_proc sobre cada eje.
+"""
+import os
+import sys
+
+BIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BIN_DIR not in sys.path:
+    sys.path.insert(0, BIN_DIR)
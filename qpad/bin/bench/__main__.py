@@ -0,0 +1,101 @@
+"""
+Uso (desde qpad/bin):
+    python -m bench run [--quick] [--repeat 3] [--output res.json]
+                        [--baseline base.json] [--threshold 0.10]
+    python -m bench corpus -o doc.qtf [--paragraphs 1000] [--defs 2]
+                        [--nesting 0.2] [--switches 0.1] [--words 12] [--seed 0]
+
+`run` sale con código 1 si alguna métrica empeora más que --threshold
+respecto a --baseline.
+"""
+import argparse
+import json
+import sys
+
+from .corpus import DEFAULTS, generate_qtf
+from .suite import QUICK_PARAGRAPHS, QUICK_SWEEPS, SWEEPS, compare, run_suite
+
+
+def print_entry(entry, elapsed):
+    seconds = entry['seconds']
+    timings = '  '.join(f'{name}={value * 1000:9.2f} ms' for name, value in seconds.items())
+    print(f"{entry['axis']:>10} = {entry['value']:<6} {entry['paragraphs']:6d} P {entry['tags']:8d} tags  "
+          f'{timings}  ({elapsed:.1f}s)', file=sys.stderr)
+
+
+def cmd_run(args) -> int:
+    base = dict(DEFAULTS)
+    sweeps = SWEEPS
+    if args.quick:
+        base['paragraphs'] = QUICK_PARAGRAPHS
+        sweeps = QUICK_SWEEPS
+    results = run_suite(sweeps, repeat=args.repeat, base=base, progress=print_entry)
+    if not results['meta']['post_proc']:
+        print('bs4 not installed: post_proc skipped', file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f'results written to {args.output}', file=sys.stderr)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline, args.threshold)
+    if not rows:
+        print('baseline has no comparable entries', file=sys.stderr)
+        return 0
+    regressions = 0
+    for axis, value, metric, before, now, ratio, regressed in rows:
+        flag = 'REGRESSION' if regressed else ''
+        print(f'{axis:>10} = {value:<6} {metric:<14} {before * 1000:9.2f} -> {now * 1000:9.2f} ms '
+              f'({ratio:5.2f}x) {flag}', file=sys.stderr)
+        regressions += regressed
+    print(f'{regressions} regressions above {args.threshold:.0%}', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def cmd_corpus(args) -> int:
+    qtf = generate_qtf(paragraphs=args.paragraphs, defs=args.defs, nesting=args.nesting,
+                       switches=args.switches, words=args.words, seed=args.seed)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(qtf)
+    print(args.output)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m bench', description='q2h benchmark suite')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='Time the converter across the corpus axes')
+    run.add_argument('--quick', action='store_true', help='Smaller documents and fewer points per axis')
+    run.add_argument('--repeat', type=int, default=3, help='Timing repetitions (best one is kept)')
+    run.add_argument('--output', help='Write the JSON results here instead of stdout')
+    run.add_argument('--baseline', help='Previous JSON results to compare against')
+    run.add_argument('--threshold', type=float, default=0.10,
+                     help='Slowdown ratio over the baseline reported as a regression (0.10 = 10%%)')
+    run.set_defaults(func=cmd_run)
+
+    corpus = sub.add_parser('corpus', help='Write one synthetic QTF document')
+    corpus.add_argument('-o', '--output', required=True, help='Output .qtf file')
+    corpus.add_argument('--paragraphs', type=int, default=DEFAULTS['paragraphs'], help='Number of [P] blocks')
+    corpus.add_argument('--defs', type=int, default=DEFAULTS['defs'], help='<def> line breaks per paragraph')
+    corpus.add_argument('--nesting', type=float, default=DEFAULTS['nesting'],
+                        help='Chance of opening a bold/italic/underline/strikeout tag per word')
+    corpus.add_argument('--switches', type=float, default=DEFAULTS['switches'],
+                        help='Chance of a font/size/color switch per word')
+    corpus.add_argument('--words', type=int, default=DEFAULTS['words'], help='Words per line')
+    corpus.add_argument('--seed', type=int, default=0, help='Random seed')
+    corpus.set_defaults(func=cmd_corpus)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
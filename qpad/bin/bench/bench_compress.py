@@ -0,0 +1,91 @@
+"""
+Benchmark de las salidas minificadas y precomprimidas (--minify, --gzip, --zstd).
+
+Convierte un documento sintético (o --input) con cada combinación y mide
+el tamaño del artefacto que se serviría y el tiempo total de conversión
+(mejor de --repeat), ambos relativos a la conversión sin opciones. La fila
+"gzip afterwards" es la alternativa sin streaming: convertir, volver a leer
+el HTML entero y comprimirlo en memoria. zstd solo se mide si el módulo
+zstandard está instalado.
+
+Uso:
+    python bench/bench_compress.py [--paragraphs 20000] [--repeat 3] [--stream] [--input doc.qtf]
+"""
+import argparse
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.corpus import generate_qtf  # noqa: E402
+from q2h_core import convert_file, zstd_available  # noqa: E402
+
+GZIP_LEVELS = (1, 6, 9)
+ZSTD_LEVELS = (1, 3, 10, 19)
+
+
+def cases() -> list:
+    """(nombre, opciones de convert_file, extensión del artefacto servido)."""
+    found = [('plain', {}, ''), ('minify', dict(minify=True), '')]
+    found += [(f'gzip {level}', dict(compress={'gz': level}), '.gz') for level in GZIP_LEVELS]
+    found.append(('minify + gzip 6', dict(minify=True, compress={'gz': 6}), '.gz'))
+    if zstd_available():
+        found += [(f'zstd {level}', dict(compress={'zst': level}), '.zst') for level in ZSTD_LEVELS]
+        found.append(('minify + gzip 6 + zstd 3', dict(minify=True, compress={'gz': 6, 'zst': 3}), '.zst'))
+    return found
+
+
+def gzip_afterwards(qtf_path: str, html_path: str, stream: bool):
+    convert_file(qtf_path, html_path, stream=stream)
+    with open(html_path, 'rb') as f:
+        data = gzip.compress(f.read(), 6)
+    with open(html_path + '.gz', 'wb') as f:
+        f.write(data)
+
+
+def best_time(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Compare minified and precompressed output sizes and times')
+    parser.add_argument('--paragraphs', type=int, default=20000, help='Paragraphs of the generated document')
+    parser.add_argument('--input', help='Convert this .qtf instead of a generated document')
+    parser.add_argument('--repeat', type=int, default=3, help='Conversions per case (best time is kept)')
+    parser.add_argument('--stream', action='store_true', help='Use the streaming converter')
+    args = parser.parse_args(argv)
+    if not zstd_available():
+        print('zstandard is not installed: zstd cases skipped', file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        qtf_path = args.input
+        if qtf_path is None:
+            qtf_path = os.path.join(tmp, 'doc.qtf')
+            with open(qtf_path, 'w', encoding='utf-8') as f:
+                f.write(generate_qtf(paragraphs=args.paragraphs, switches=0.3, nesting=0.3))
+        html_path = os.path.join(tmp, 'doc.html')
+        print(f'input: {os.path.getsize(qtf_path) / 1024:.0f} KB')
+        print(f'{"case":<26} {"bytes":>10} {"size":>7} {"time":>8} {"vs plain":>9}')
+        base_size = base_time = None
+        rows = [(name, lambda options=options: convert_file(qtf_path, html_path, stream=args.stream, **options),
+                 ext) for name, options, ext in cases()]
+        rows.append(('gzip afterwards (6)', lambda: gzip_afterwards(qtf_path, html_path, args.stream), '.gz'))
+        for name, func, ext in rows:
+            elapsed = best_time(func, args.repeat)
+            size = os.path.getsize(html_path + ext)
+            if base_size is None:
+                base_size, base_time = size, elapsed
+            print(f'{name:<26} {size:>10} {size / base_size:>6.1%} {elapsed:>7.3f}s {elapsed / base_time:>8.2f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
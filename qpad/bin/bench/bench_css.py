@@ -0,0 +1,69 @@
+"""
+Benchmark del modo de clases CSS (css_classes) frente a los estilos en línea.
+
+Para cada documento sintético (barriendo switches y defs de corpus.py) se
+convierte con convert_file en los dos modos y se compara el tamaño de la
+salida, su tamaño comprimido con gzip (lo que se transfiere) y el tiempo
+de conversión (mejor de --repeat).
+
+Uso:
+    python bench/bench_css.py [--paragraphs 5000] [--repeat 3] [--stream]
+"""
+import argparse
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.corpus import generate_qtf  # noqa: E402
+from q2h_core import convert_file  # noqa: E402
+
+CASES = [
+    ('switches=0', dict(switches=0.0)),
+    ('switches=0.1', dict(switches=0.1)),
+    ('switches=0.5', dict(switches=0.5)),
+    ('switches=0.5 defs=8', dict(switches=0.5, defs=8)),
+    ('switches=0.9 nesting=0.5', dict(switches=0.9, nesting=0.5)),
+]
+
+
+def measure(qtf_path: str, html_path: str, repeat: int, **options) -> tuple:
+    """(mejor tiempo, bytes, bytes con gzip) de convertir `qtf_path` con `options`."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        convert_file(qtf_path, html_path, **options)
+        best = min(best, time.perf_counter() - started)
+    with open(html_path, 'rb') as f:
+        data = f.read()
+    return best, len(data), len(gzip.compress(data, 6))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Compare inline styles with --css-classes output')
+    parser.add_argument('--paragraphs', type=int, default=5000, help='Paragraphs per generated document')
+    parser.add_argument('--repeat', type=int, default=3, help='Conversions per mode (best time is kept)')
+    parser.add_argument('--stream', action='store_true', help='Use the streaming converter')
+    args = parser.parse_args(argv)
+
+    print(f'{"case":<26} {"inline":>10} {"classes":>10} {"ratio":>6} {"gz inline":>10} {"gz classes":>10} '
+          f'{"t inline":>9} {"t classes":>9}')
+    with tempfile.TemporaryDirectory() as tmp:
+        qtf_path = os.path.join(tmp, 'doc.qtf')
+        html_path = os.path.join(tmp, 'doc.html')
+        for name, params in CASES:
+            with open(qtf_path, 'w', encoding='utf-8') as f:
+                f.write(generate_qtf(paragraphs=args.paragraphs, **params))
+            t_inline, size_inline, gz_inline = measure(qtf_path, html_path, args.repeat, stream=args.stream)
+            t_classes, size_classes, gz_classes = measure(qtf_path, html_path, args.repeat, stream=args.stream,
+                                                          css_classes=True)
+            print(f'{name:<26} {size_inline:>10} {size_classes:>10} {size_inline / size_classes:>5.2f}x '
+                  f'{gz_inline:>10} {gz_classes:>10} {t_inline:>8.3f}s {t_classes:>8.3f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Benchmark de la caché en memoria del daemon (q2h_daemon.ConversionServer)
+con peticiones duplicadas simultáneas.
+
+Cada ronda lanza a la vez --duplicates peticiones "qtf" idénticas por cada
+uno de --documents documentos de corpus.py, como varios clientes pidiendo
+lo mismo: once() las une en una conversión por documento. Tras cada ronda
+se comprueba que MemoryCache.size es la suma de las entradas guardadas y
+que no pasa de max_size; la segunda ronda pide lo mismo y mide los aciertos.
+El tamaño de la caché (--cache-docs) deja fuera parte de los documentos
+para que también haya expulsiones.
+
+Uso (desde qpad/bin):
+    python bench/bench_daemon.py [--documents 20] [--duplicates 4] [--cache-docs 8] [--paragraphs 200]
+
+Sale con código 1 si la contabilidad de la caché no cuadra.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.corpus import generate_qtf  # noqa: E402
+from q2h_core import convert_qtf_to_html  # noqa: E402
+from q2h_daemon import ConversionServer  # noqa: E402
+
+
+def check(memory) -> list:
+    """Problemas de contabilidad de `memory` (vacío si cuadra)."""
+    stored = sum(len(html) for html in memory.entries.values())
+    problems = []
+    if memory.size != stored:
+        problems.append(f'size {memory.size} != {stored} stored in {len(memory.entries)} entries')
+    if memory.size > memory.max_size:
+        problems.append(f'size {memory.size} > max_size {memory.max_size}')
+    return problems
+
+
+async def run(args) -> int:
+    documents = [generate_qtf(paragraphs=args.paragraphs, seed=seed) for seed in range(args.documents)]
+    largest = max(len(convert_qtf_to_html(qtf)) for qtf in documents)
+    with tempfile.TemporaryDirectory() as tmp:
+        failed = await run_rounds(args, documents, ConversionServer(workers=args.workers, folder=tmp,
+                                                                    memory_cache_bytes=largest * args.cache_docs))
+    return 1 if failed else 0
+
+
+async def run_rounds(args, documents, server) -> int:
+    """Las dos rondas de peticiones; devuelve cuántos problemas de contabilidad hubo."""
+    server.start_pool()
+    failed = 0
+    try:
+        print(f'{"round":<7} {"requests":>8} {"time":>9} {"hits":>6} {"entries":>8} {"size":>10}')
+        for round_no in (1, 2):
+            hits_before = server.memory.hits
+            requests = [{'op': 'convert', 'qtf': qtf} for qtf in documents for _ in range(args.duplicates)]
+            started = time.perf_counter()
+            await asyncio.gather(*(server.handle_request(request) for request in requests))
+            elapsed = time.perf_counter() - started
+            memory = server.memory
+            print(f'{round_no:<7} {len(requests):>8} {elapsed * 1000:>7.0f}ms {memory.hits - hits_before:>6} '
+                  f'{len(memory.entries):>8} {memory.size:>10}')
+            for problem in check(memory):
+                failed += 1
+                print(f'  round {round_no}: {problem}', file=sys.stderr)
+    finally:
+        server.close()
+    return failed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Daemon memory cache under concurrent duplicate requests')
+    parser.add_argument('--documents', type=int, default=20, help='Distinct documents per round')
+    parser.add_argument('--duplicates', type=int, default=4, help='Identical concurrent requests per document')
+    parser.add_argument('--cache-docs', type=int, default=8, help='Memory cache size, in largest documents')
+    parser.add_argument('--paragraphs', type=int, default=200, help='Paragraphs per generated document')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes of the server')
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
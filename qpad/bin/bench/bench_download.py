@@ -0,0 +1,132 @@
+"""
+Benchmark y comprobaciones de qpad_download contra bench/fake_github.py.
+
+speed: el mismo asset con 1, 2, 4 y 8 segmentos y la velocidad limitada por
+    conexión (--rate), como un enlace que no llena la línea con una sola
+    conexión. Muestra tiempo, MB/s y avisos de progreso por segundo.
+
+checks (falla con exit 1 si algo no cumple):
+    drops       conexiones cortadas a mitad: se reintenta cada segmento
+                desde lo recibido y el resultado verifica
+    resume      se cancela a mitad y la siguiente llamada solo pide lo que
+                faltaba (bytes servidos ~ tamaño)
+    checksum    un SHA-256 que no coincide descarta el fichero
+    no-ranges   servidor sin Range: una sola conexión, también verificada
+    progress    los avisos no pasan de 1 / PROGRESS_INTERVAL por segundo
+
+Uso (desde qpad/bin):
+    python bench/bench_download.py [--size-mb 32] [--rate 8M]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_github import FakeGitHub, parse_rate  # noqa: E402
+from qpad_download import PROGRESS_INTERVAL, ChecksumError, DownloadCancelled, download  # noqa: E402
+
+NAME = 'QPad-setup.exe'
+
+
+def timed_download(server, dest, **options):
+    calls = []
+    started = time.perf_counter()
+    download(server.asset_url(NAME), dest, sha256=server.assets[NAME].sha256,
+             progress=lambda done, total: calls.append(done), **options)
+    return time.perf_counter() - started, calls
+
+
+def cmd_speed(data, args, tmp):
+    size_mb = len(data) / (1 << 20)
+    print(f'{"segments":>8} {"time":>8} {"MB/s":>8} {"progress/s":>11}')
+    with FakeGitHub({NAME: data}, rate=args.rate) as server:
+        for segments in (1, 2, 4, 8):
+            dest = os.path.join(tmp, f'speed-{segments}.exe')
+            elapsed, calls = timed_download(server, dest, segments=segments)
+            print(f'{segments:>8} {elapsed:>7.2f}s {size_mb / elapsed:>8.1f} {len(calls) / elapsed:>11.1f}')
+            os.remove(dest)
+
+
+def check_drops(data, args, tmp):
+    with FakeGitHub({NAME: data}, drops=3, drop_after=len(data) // 10) as server:
+        dest = os.path.join(tmp, 'drops.exe')
+        timed_download(server, dest)
+        return open(dest, 'rb').read() == data, f'{server.requests} requests, {server.bytes_sent} bytes sent'
+
+
+def check_resume(data, args, tmp):
+    dest = os.path.join(tmp, 'resume.exe')
+    with FakeGitHub({NAME: data}, rate=args.rate) as server:
+        cancel = threading.Event()
+
+        def progress(done, total):
+            if done >= total // 2:
+                cancel.set()
+
+        try:
+            download(server.asset_url(NAME), dest, progress=progress, cancel=cancel)
+            return False, 'the download was not cancelled'
+        except DownloadCancelled:
+            pass
+        first = server.bytes_sent
+        partial = os.path.exists(dest + '.part') and os.path.exists(dest + '.part.json')
+        server.reset_counters()
+        download(server.asset_url(NAME), dest, sha256=server.assets[NAME].sha256)
+        second = server.bytes_sent
+    ok = partial and not os.path.exists(dest + '.part') and first + second <= len(data) * 1.05
+    return ok, f'{first} bytes before cancelling, {second} after resuming (size {len(data)})'
+
+
+def check_checksum(data, args, tmp):
+    dest = os.path.join(tmp, 'bad.exe')
+    with FakeGitHub({NAME: data}) as server:
+        try:
+            download(server.asset_url(NAME), dest, sha256='0' * 64)
+        except ChecksumError as e:
+            left = [p for p in (dest, dest + '.part', dest + '.part.json') if os.path.exists(p)]
+            return not left, f'{e.__class__.__name__}, leftovers: {left or "none"}'
+    return False, 'accepted a wrong digest'
+
+
+def check_no_ranges(data, args, tmp):
+    dest = os.path.join(tmp, 'single.exe')
+    with FakeGitHub({NAME: data}, ranges=False) as server:
+        timed_download(server, dest)
+        return open(dest, 'rb').read() == data, f'{server.requests} requests'
+
+
+def check_progress(data, args, tmp):
+    dest = os.path.join(tmp, 'progress.exe')
+    with FakeGitHub({NAME: data}, rate=args.rate) as server:
+        elapsed, calls = timed_download(server, dest, segments=8)
+    limit = elapsed / PROGRESS_INTERVAL + 2
+    return len(calls) <= limit and calls[-1] == len(data), f'{len(calls)} calls in {elapsed:.2f}s'
+
+
+CHECKS = [('drops', check_drops), ('resume', check_resume), ('checksum', check_checksum),
+          ('no-ranges', check_no_ranges), ('progress', check_progress)]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Segmented download benchmark and checks')
+    parser.add_argument('--size-mb', type=float, default=32, help='Size of the served asset')
+    parser.add_argument('--rate', type=parse_rate, default=8 << 20,
+                        help='Per-connection speed limit of the fake server (e.g. 8M)')
+    args = parser.parse_args(argv)
+    data = os.urandom(int(args.size_mb * (1 << 20)))
+    failed = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        cmd_speed(data, args, tmp)
+        for name, check in CHECKS:
+            ok, detail = check(data, args, tmp)
+            failed += not ok
+            print(f'{name:<10} {"ok" if ok else "FAILED":<7} {detail}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Benchmark de arranque hasta el editor (time-to-editor) de qpad.py y del
+actualizador contra bench/fake_github.py.
+
+QPAD_MAIN_EXE apunta a un editor falso que solo crea un fichero marca: el
+tiempo hasta el editor es lo que pasa desde lanzar el proceso hasta que
+existe la marca (su mtime). También se mide cuánto tarda el lanzador en
+terminar. Cada modo se prueba con la caché de releases vacía (una consulta
+a la API con --latency) y fresca (sin red):
+
+    launcher             qpad.py: lanza el editor y consulta en paralelo
+    launcher --splash    qpad.py --splash: consulta, barra y luego el editor
+    updater --background qpad-updater.py --background (Qt offscreen si no
+                         hay pantalla)
+
+El modo --splash necesita una pantalla para Tk; sin ella se omite.
+
+Uso (desde qpad/bin):
+    python bench/bench_launch.py [--runs 3] [--latency 0.3]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_github import FakeGitHub  # noqa: E402
+
+BIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QPAD = os.path.join(os.path.dirname(BIN_DIR), 'qpad.py')
+UPDATER = os.path.join(BIN_DIR, 'qpad-updater.py')
+VERSION = 'v1.3.0'
+TIMEOUT = 30
+
+
+def fake_editor(folder: str, marker: str) -> str:
+    """Ejecutable que solo crea `marker` (un .cmd en Windows, sh en el resto)."""
+    if os.name == 'nt':
+        path = os.path.join(folder, 'editor.cmd')
+        with open(path, 'w') as f:
+            f.write(f'@echo off\r\ntype nul > "{marker}"\r\n')
+    else:
+        path = os.path.join(folder, 'editor.sh')
+        with open(path, 'w') as f:
+            f.write(f'#!/bin/sh\n: > "{marker}"\n')
+        os.chmod(path, 0o755)
+    return path
+
+
+def tk_available() -> bool:
+    probe = subprocess.run([sys.executable, '-c', 'import tkinter; tkinter.Tk().destroy()'],
+                           capture_output=True)
+    return probe.returncode == 0
+
+
+def launch(command, folder, env):
+    """(segundos hasta el editor, segundos hasta que termina el lanzador)."""
+    marker = os.path.join(folder, 'editor-started')
+    if os.path.exists(marker):
+        os.remove(marker)
+    env = dict(env, QPAD_MAIN_EXE=fake_editor(folder, marker))
+    started = time.time_ns()
+    proc = subprocess.Popen(command, cwd=folder, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        _, stderr = proc.communicate(timeout=TIMEOUT)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        raise RuntimeError(f'{command} did not finish in {TIMEOUT}s')
+    finished = time.time_ns()
+    if not os.path.exists(marker):
+        raise RuntimeError(f'{command} never started the editor: {stderr.decode(errors="replace")[-400:]}')
+    # el editor falso es un proceso aparte y puede crear la marca tras salir el lanzador
+    return (os.stat(marker).st_mtime_ns - started) / 1e9, (finished - started) / 1e9
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Time-to-editor benchmark of the launcher and updater')
+    parser.add_argument('--runs', type=int, default=3, help='Launches per mode and cache state (median shown)')
+    parser.add_argument('--latency', type=float, default=0.3, help='Seconds added to every API response')
+    args = parser.parse_args(argv)
+
+    modes = [('launcher', [sys.executable, QPAD])]
+    if tk_available():
+        modes.append(('launcher --splash', [sys.executable, QPAD, '--splash']))
+    else:
+        print('no display for Tk: launcher --splash skipped', file=sys.stderr)
+    modes.append(('updater --background', [sys.executable, UPDATER, '--background']))
+
+    with tempfile.TemporaryDirectory() as tmp, FakeGitHub(latency=args.latency) as server:
+        server.releases = [server.make_release(VERSION)]
+        for name in ('cv.txt', 'currentversion.txt'):
+            with open(os.path.join(tmp, name), 'w') as f:
+                f.write(VERSION)    # al día: ningún aviso que esperar
+        cache = os.path.join(tmp, 'release-cache.json')
+        env = dict(os.environ, QPAD_GITHUB_API=server.url, QPAD_RELEASE_CACHE=cache)
+        if os.name != 'nt' and not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY'):
+            env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+        print(f'{"mode":<22} {"cache":<6} {"to editor":>10} {"launcher exit":>14}')
+        for label, command in modes:
+            for state in ('cold', 'fresh'):
+                editor, total = [], []
+                for _ in range(args.runs):
+                    if state == 'cold' and os.path.exists(cache):
+                        os.remove(cache)
+                    elif state == 'fresh' and not os.path.exists(cache):
+                        launch(command, tmp, env)   # llena la caché
+                    to_editor, to_exit = launch(command, tmp, env)
+                    editor.append(to_editor)
+                    total.append(to_exit)
+                print(f'{label:<22} {state:<6} {statistics.median(editor) * 1000:>8.0f}ms '
+                      f'{statistics.median(total) * 1000:>12.0f}ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
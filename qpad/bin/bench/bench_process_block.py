@@ -0,0 +1,144 @@
+"""
+Micro-benchmark de process_block: tokenizador de una pasada frente a la
+implementación anterior (split + findall + concatenación de strings), sola
+y seguida de post_proc, que era necesario para quitar los tags vacíos.
+
+Uso:
+    python bench/bench_process_block.py [--tags 10000] [--repeat 5]
+"""
+import argparse
+import html
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from q2h_core import post_proc, process_block  # noqa: E402
+
+
+def legacy_process_block(content: str, debug=False) -> str:
+    """process_block tal y como estaba antes del tokenizador de una pasada."""
+    def dbg(msg):
+        if debug:
+            print(f"[DEBUG] {msg}")
+
+    SEM = {'bold': 'strong', 'italic': 'em', 'underline': 'u', 'strikeout': 'del'}
+    TOKEN_RE = re.compile(r'(?:<def>)|(?:</?[A-Za-z]+(?:=[^>]+)?>)', re.IGNORECASE)
+    parts = TOKEN_RE.split(content)
+    tags = TOKEN_RE.findall(content)
+    seq = []
+    for txt, tag in zip(parts, tags + ['']):
+        if txt: seq.append(('text', txt))
+        if tag: seq.append(('tag', tag))
+
+    semantic = []
+    style = {'font': None, 'size': None, 'color': None}
+    span_open = False
+
+    def close_span():
+        dbg("close span")
+        nonlocal span_open
+        if span_open:
+            span_open = False
+            return '</span>'
+        return ''
+
+    def open_span():
+        dbg("open span")
+        nonlocal span_open
+        css = []
+        if style['font']: css.append(f'font-family:{style["font"]};')
+        if style['size']: css.append(f'font-size:{style["size"]};')
+        if style['color']: css.append(f'color:{style["color"]};')
+        if css:
+            span_open = True
+            return f'<span style="{" ".join(css)}">'
+        return ''
+
+    def open_sem(t):
+        dbg("open sem")
+        if t not in semantic:
+            semantic.append(t)
+            return f'<{SEM[t]}>'
+        return ''
+
+    def close_sem(t):
+        dbg("close sem")
+        if semantic and semantic[-1] == t:
+            semantic.pop()
+            return f'</{SEM[t]}>'
+        return ''
+
+    out = ''
+    for kind, val in seq:
+        if kind == 'text':
+            out += html.escape(val)
+            continue
+        tag = val[1:-1].lower()
+        if tag == 'def':
+            if semantic:
+                out += close_sem(semantic[-1])
+            out += close_span() + '<br/>' + open_span()
+            for s in semantic:
+                out += f'<{SEM[s]}>'
+            continue
+        if tag in SEM:
+            out += open_sem(tag)
+            continue
+        if tag.startswith('/'):
+            inner = tag[1:]
+            if inner in SEM:
+                out += close_sem(inner)
+            continue
+        if '=' in tag:
+            key, val2 = tag.split('=', 1)
+            if key in style and style[key] != val2:
+                out += close_span()
+                style[key] = val2
+                out += open_span()
+                for s in semantic:
+                    out += f'<{SEM[s]}>'
+            continue
+
+    out += close_span()
+    while semantic:
+        out += close_sem(semantic[-1])
+    return out
+
+
+def make_paragraph(n_tags: int, seed=0) -> str:
+    """Genera una línea QTF con `n_tags` tags mezclados con texto."""
+    rnd = random.Random(seed)
+    tags = ['<bold>', '</bold>', '<italic>', '</italic>', '<underline>', '</underline>',
+            '<strikeout>', '</strikeout>', '<font=Arial>', '<font=Verdana>',
+            '<size=12pt>', '<size=18pt>', '<color=red>', '<color=blue>', '<def>']
+    words = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'a < b', 'x & y']
+    return ' '.join(f'{rnd.choice(tags)}{rnd.choice(words)}' for _ in range(n_tags))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='process_block micro-benchmark')
+    parser.add_argument('--tags', type=int, default=10000, help='Tags per paragraph')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions')
+    args = parser.parse_args()
+
+    content = make_paragraph(args.tags)
+
+    legacy = min(timeit.repeat(lambda: legacy_process_block(content), number=1, repeat=args.repeat))
+    cleaned = min(timeit.repeat(lambda: post_proc(f'<p>{legacy_process_block(content)}</p>'),
+                                number=1, repeat=args.repeat))
+    current = min(timeit.repeat(lambda: process_block(content), number=1, repeat=args.repeat))
+
+    print(f'paragraph: {args.tags} tags, {len(content)} chars')
+    print(f'legacy            : {legacy * 1000:9.2f} ms')
+    print(f'legacy + post_proc: {cleaned * 1000:9.2f} ms')
+    print(f'single-pass       : {current * 1000:9.2f} ms')
+    print(f'speedup (raw)     : {legacy / current:9.2f}x')
+    print(f'speedup (cleaned) : {cleaned / current:9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark de release_cache.ReleaseCache contra bench/fake_github.py.
+
+Cada escenario consulta la última release como al arrancar qpad.py o el
+actualizador, con --latency segundos por respuesta de la API, y muestra el
+tiempo de la consulta y las peticiones que llegaron al servidor:
+
+    no cache           sin caché: una petición síncrona
+    fresh              caché dentro del TTL: ninguna petición
+    stale              TTL vencido: respuesta inmediata y 304 en segundo plano
+    expired            más viejo que max_stale: petición condicional síncrona (304)
+    new release        la revalidación trae la release nueva (200)
+    api down           API caída con caché vencida: se usa lo guardado
+
+Falla (exit 1) si algún escenario no hace las peticiones esperadas.
+
+Uso (desde qpad/bin):
+    python bench/bench_release_cache.py [--latency 0.3]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from bench.fake_github import FakeGitHub  # noqa: E402
+from release_cache import ReleaseCache  # noqa: E402
+
+REPO = 'Soyzian/qpad'
+
+
+def age_cache(path: str, seconds: float):
+    """Hace que todas las entradas del fichero parezcan `seconds` más viejas."""
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+    for entry in entries.values():
+        entry['fetched'] -= seconds
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Release metadata cache benchmark')
+    parser.add_argument('--latency', type=float, default=0.3, help='Seconds added to every API response')
+    args = parser.parse_args(argv)
+
+    failed = 0
+    print(f'{"scenario":<14} {"lookup":>9} {"requests":>9} {"304":>4} {"tag":>8}')
+    with tempfile.TemporaryDirectory() as tmp, FakeGitHub(latency=args.latency) as server:
+        server.releases = [server.make_release('v1.3.1', prerelease=True), server.make_release('v1.3.0')]
+        path = os.path.join(tmp, 'release-cache.json')
+        ttl, max_stale = 3600, 7 * 86400
+
+        def scenario(name, expected_requests, expected_tag, before=None):
+            nonlocal failed
+            if before:
+                before()
+            server.reset_counters()
+            cache = ReleaseCache(path, api=server.url, ttl=ttl, max_stale=max_stale)
+            started = time.perf_counter()
+            release = cache.latest_release(REPO)
+            elapsed = time.perf_counter() - started
+            cache.wait()
+            tag = release['tag_name'] if release else None
+            ok = server.api_requests == expected_requests and tag == expected_tag
+            failed += not ok
+            print(f'{name:<14} {elapsed * 1000:>7.1f}ms {server.api_requests:>9} {server.not_modified:>4} '
+                  f'{tag or "-":>8} {"" if ok else "FAILED"}')
+
+        scenario('no cache', 1, 'v1.3.0')
+        scenario('fresh', 0, 'v1.3.0')
+        scenario('stale', 1, 'v1.3.0', lambda: age_cache(path, ttl + 1))
+        scenario('expired', 1, 'v1.3.0', lambda: age_cache(path, max_stale + 1))
+
+        def publish():
+            server.releases.insert(0, server.make_release('v1.4.0'))
+            age_cache(path, ttl + 1)
+
+        # stale-while-revalidate: esta consulta aún ve v1.3.0, la siguiente ya v1.4.0
+        scenario('new release', 1, 'v1.3.0', publish)
+        scenario('fresh', 0, 'v1.4.0')
+
+        def outage():
+            server.api_down = True
+            age_cache(path, max_stale + 1)
+
+        scenario('api down', 1, 'v1.4.0', outage)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Benchmark adversarial y fuzz del escáner estructural (scan_qtf_body).
+
+adversarial: documentos patológicos (marcas sin cerrar, [Body] repetidos,
+    align sin ']'...) a tamaños crecientes. Para cada caso se mide el tiempo
+    de parse_qtf y del modo streaming y se comprueba que crece de forma
+    lineal: falla (exit 1) si el coste por byte del tamaño mayor supera en
+    más de --max-growth veces al del menor. Con --legacy se mide también la
+    versión anterior con expresiones regulares (cuadrática en estos casos).
+
+fuzz: muta documentos válidos insertando y borrando marcas al azar y
+    comprueba que el escáner no falla, que str y bytes (mmap) dan lo mismo
+    y que, si no hay diagnósticos, el resultado es el de las regex de antes.
+
+Uso:
+    python bench/bench_scan.py adversarial [--size 20000] [--steps 4] [--legacy]
+    python bench/bench_scan.py fuzz [--cases 2000] [--seed 0]
+"""
+import argparse
+import io
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.corpus import generate_qtf  # noqa: E402
+from q2h_core import (  # noqa: E402
+    QtfBodyScanner, QtfDiagnostics, iter_body_paragraphs, iter_qtf_lines, normalize_block, parse_qtf,
+    parse_qtf_buffer, read_qtf_header
+)
+
+
+def legacy_parse_qtf(qtf_content: str):
+    """parse_qtf tal y como estaba antes del escáner (solo los párrafos)."""
+    content = '\n'.join(line.strip() for line in qtf_content.splitlines())
+    body_match = re.search(r"\[Body\](.*?)\[/Body\]", content, re.DOTALL)
+    if not body_match:
+        return []
+    return re.findall(r"\[P(?:\s+align=([^\]]+))?\](.*?)\[/P\]", body_match.group(1), re.DOTALL)
+
+
+def scan_str(doc: str):
+    diagnostics = QtfDiagnostics()
+    return parse_qtf(doc, diagnostics=diagnostics)[2], diagnostics
+
+
+def scan_stream(doc: str):
+    lines = iter_qtf_lines(io.StringIO(doc))
+    _, _, head = read_qtf_header(lines)
+    return [] if head is None else list(iter_body_paragraphs(lines, head, QtfDiagnostics()))
+
+
+def scan_chunked(doc: bytes, chunk: int):
+    """El escáner alimentado en bloques de `chunk` bytes, normalizado como parse_qtf_buffer."""
+    scanner = QtfBodyScanner(QtfDiagnostics(), text=False)
+    found = []
+    for pos in range(0, len(doc), chunk):
+        found.extend(scanner.feed(doc[pos:pos + chunk]))
+    found.extend(scanner.close())
+    return [(None if align is None else normalize_block(align.decode('utf-8')), normalize_block(block.decode('utf-8')))
+            for align, block, _ in found]
+
+
+# (nombre, generador de un documento de ~n unidades)
+ADVERSARIAL = [
+    ('unclosed [P]', lambda n: '[Body]' + '[P]x' * n + '[/Body]'),
+    ('unclosed [P], no [/Body]', lambda n: '[Body]' + '[P]x\n' * n),
+    ('repeated [Body]', lambda n: '[Body]' * n),
+    ('[P align= without ]', lambda n: '[Body]' + '[P align=x' * n),
+    ('[P followed by space', lambda n: '[Body]' + '[P ' * n + '[/Body]'),
+    ('stray [/P]', lambda n: '[Body]' + '[/P]' * n + '[/Body]'),
+    ('one huge unclosed [P]', lambda n: '[Body][P]' + 'lorem ipsum\n' * n),
+    ('well formed', lambda n: generate_qtf(paragraphs=max(n // 40, 1), defs=1, nesting=0.2, switches=0.1)),
+]
+
+
+def best_time(func, arg, repeat=3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def cmd_adversarial(args) -> int:
+    parsers = [('scan', scan_str), ('stream', scan_stream)]
+    if args.legacy:
+        parsers.append(('legacy', legacy_parse_qtf))
+    sizes = [args.size * (2 ** step) for step in range(args.steps)]
+    failed = 0
+    for name, make in ADVERSARIAL:
+        docs = [make(n) for n in sizes]
+        for parser_name, func in parsers:
+            if parser_name == 'legacy' and name != 'well formed':
+                # cuadrático: solo los dos tamaños menores, para no esperar minutos
+                docs_used = docs[:2]
+            else:
+                docs_used = docs
+            per_byte = [best_time(func, doc) / len(doc) for doc in docs_used]
+            growth = per_byte[-1] / per_byte[0]
+            cells = '  '.join(f'{len(doc) / 1024:8.0f} KB {t * 1e9:7.1f} ns/B' for doc, t in zip(docs_used, per_byte))
+            flag = ''
+            if parser_name != 'legacy' and growth > args.max_growth:
+                flag = 'NOT LINEAR'
+                failed += 1
+            print(f'{name:<26} {parser_name:<7} {cells}  growth {growth:5.2f}x {flag}')
+    print(f'{failed} cases above {args.max_growth}x growth per byte', file=sys.stderr)
+    return 1 if failed else 0
+
+
+MUTATIONS = ['[P]', '[/P]', '[P align=center]', '[P align=', '[Body]', '[/Body]', ']', '[P', '[P ',
+             '\n', '  ', '<bold>', 'x']
+
+
+def mutate(rnd: random.Random, doc: str) -> str:
+    for _ in range(rnd.randrange(1, 6)):
+        pos = rnd.randrange(len(doc) + 1)
+        if rnd.random() < 0.3 and doc:
+            doc = doc[:pos] + doc[pos + rnd.randrange(1, 8):]
+        else:
+            doc = doc[:pos] + rnd.choice(MUTATIONS) + doc[pos:]
+    return doc
+
+
+def cmd_fuzz(args) -> int:
+    rnd = random.Random(args.seed)
+    clean = mismatches = 0
+    started = time.perf_counter()
+    for case in range(args.cases):
+        doc = generate_qtf(paragraphs=rnd.randrange(1, 8), defs=rnd.randrange(3), words=4, seed=case)
+        if rnd.random() < 0.9:
+            doc = mutate(rnd, doc)
+        blocks, diagnostics = scan_str(doc)
+        data = doc.encode('utf-8')
+        mapped = list(parse_qtf_buffer(data, diagnostics=QtfDiagnostics())[2])
+        problem = None
+        if mapped != blocks:
+            problem = 'str and bytes scans differ'
+        elif scan_chunked(data, rnd.randrange(1, 64)) != blocks:
+            problem = 'chunked scan differs'
+        elif scan_stream(doc) != blocks:
+            problem = 'stream scan differs'
+        elif not diagnostics.count:
+            clean += 1
+            legacy = [(align or None, block) for align, block in legacy_parse_qtf(doc)]
+            if legacy != blocks:
+                problem = 'differs from the regex parser without diagnostics'
+        if problem:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f'case {case}: {problem}\n{doc!r}', file=sys.stderr)
+    elapsed = time.perf_counter() - started
+    print(f'{args.cases} cases ({clean} without diagnostics) in {elapsed:.1f}s: {mismatches} mismatches')
+    return 1 if mismatches else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Structural scanner benchmarks')
+    sub = parser.add_subparsers(dest='command', required=True)
+    adv = sub.add_parser('adversarial', help='Time pathological documents at growing sizes')
+    adv.add_argument('--size', type=int, default=20000, help='Repetitions of the pattern at the smallest size')
+    adv.add_argument('--steps', type=int, default=4, help='Number of sizes (each one doubles the previous)')
+    adv.add_argument('--max-growth', type=float, default=3.0,
+                     help='Allowed growth of the per-byte cost from the smallest to the largest size')
+    adv.add_argument('--legacy', action='store_true', help='Also time the old regex parser')
+    adv.set_defaults(func=cmd_adversarial)
+    fuzz = sub.add_parser('fuzz', help='Compare the scanner with the regex parser on mutated documents')
+    fuzz.add_argument('--cases', type=int, default=2000, help='Number of mutated documents')
+    fuzz.add_argument('--seed', type=int, default=0, help='Random seed')
+    fuzz.set_defaults(func=cmd_fuzz)
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
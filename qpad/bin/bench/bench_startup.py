@@ -0,0 +1,106 @@
+"""
+Benchmark de arranque del CLI q2h.
+
+Lanza `python -X importtime q2h.py -i <doc> -o <tmp>` varias veces, mide el
+tiempo total y el tiempo de import acumulado, y falla (exit 1) si el camino
+CLI carga algún módulo prohibido (PyQt6, bs4) o supera --max-import-ms.
+
+Uso:
+    python bench/bench_startup.py [--runs 5] [--max-import-ms 150]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+Q2H = os.path.join(BIN_DIR, 'q2h.py')
+
+FORBIDDEN = ('PyQt6', 'bs4')
+
+SAMPLE_QTF = """[Doc]
+[Meta]
+Font=Arial
+Size=12pt
+[/Meta]
+[Body]
+[P align=center]<bold>Bienvenido a QPad</bold>[/P]
+[P]<italic>Ejemplo</italic> de <underline>documento</underline>.[/P]
+[/Body]
+[/Doc]
+"""
+
+
+def parse_importtime(stderr: str):
+    """Devuelve ({módulo: µs acumulados}, µs totales) de la salida de -X importtime."""
+    modules = {}
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # cabecera
+        modules[fields[2].strip()] = int(fields[1])
+        total += int(fields[0])
+    return modules, total
+
+
+def run_once(doc: str, out_dir: str):
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', Q2H, '-i', doc, '-o', out_dir],
+                          capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise SystemExit(f'q2h failed ({proc.returncode}):\n{proc.stderr}')
+    modules, import_us = parse_importtime(proc.stderr)
+    return elapsed, import_us, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='q2h CLI startup benchmark')
+    parser.add_argument('--runs', type=int, default=5, help='Number of cold starts to time')
+    parser.add_argument('--max-import-ms', type=float, default=None,
+                        help='Fail if the median import time exceeds this many ms')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        doc = os.path.join(tmp, 'sample.qtf')
+        with open(doc, 'w', encoding='utf-8') as f:
+            f.write(SAMPLE_QTF)
+
+        walls, imports = [], []
+        modules = {}
+        for _ in range(args.runs):
+            wall, import_us, modules = run_once(doc, tmp)
+            walls.append(wall)
+            imports.append(import_us / 1000)
+
+    walls.sort()
+    imports.sort()
+    median_wall = walls[len(walls) // 2] * 1000
+    median_import = imports[len(imports) // 2]
+    slowest = sorted(modules.items(), key=lambda kv: kv[1], reverse=True)[:10]
+
+    print(f'runs           : {args.runs}')
+    print(f'wall (median)  : {median_wall:8.1f} ms')
+    print(f'import (median): {median_import:8.1f} ms')
+    print('slowest imports (cumulative):')
+    for name, us in slowest:
+        print(f'  {us / 1000:8.1f} ms  {name}')
+
+    failures = []
+    loaded = [name for name in modules if name.split('.')[0] in FORBIDDEN]
+    if loaded:
+        failures.append(f'forbidden modules imported on the CLI path: {", ".join(sorted(loaded))}')
+    if args.max_import_ms is not None and median_import > args.max_import_ms:
+        failures.append(f'import time {median_import:.1f} ms exceeds {args.max_import_ms} ms')
+    for failure in failures:
+        print(f'FAIL: {failure}', file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
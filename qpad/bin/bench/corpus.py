@@ -0,0 +1,66 @@
+"""
+Generador de documentos QTF sintéticos para los benchmarks.
+
+Cada eje se controla por separado:
+    paragraphs   número de bloques [P]
+    defs         saltos <def> por párrafo
+    nesting      probabilidad de abrir un tag semántico antes de cada palabra
+                 (los tags abiertos se cierran en orden inverso, así que a
+                 mayor valor más profundo es el anidamiento)
+    switches     probabilidad de un cambio <font=>/<size=>/<color=> por palabra
+    words        palabras por línea
+
+El mismo `seed` produce siempre el mismo documento.
+"""
+import random
+
+SEMANTIC = ('bold', 'italic', 'underline', 'strikeout')
+FONTS = ('Arial', 'Verdana', 'Times New Roman', 'Courier New')
+SIZES = ('10pt', '12pt', '14pt', '18pt')
+COLORS = ('red', 'blue', 'green', '#333333')
+WORDS = ('lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'a < b', 'x & y', 'qpad')
+ALIGNS = (None, None, 'left', 'center', 'right', 'justify')
+
+DEFAULTS = {'paragraphs': 1000, 'defs': 2, 'nesting': 0.2, 'switches': 0.1, 'words': 12}
+
+
+def generate_line(rnd: random.Random, nesting: float, switches: float, words: int) -> str:
+    """Una línea QTF (sin <def>) con tags semánticos y de estilo intercalados."""
+    out = []
+    opened = []
+    for _ in range(words):
+        if rnd.random() < switches:
+            kind = rnd.randrange(3)
+            if kind == 0:
+                out.append(f'<font={rnd.choice(FONTS)}>')
+            elif kind == 1:
+                out.append(f'<size={rnd.choice(SIZES)}>')
+            else:
+                out.append(f'<color={rnd.choice(COLORS)}>')
+        if rnd.random() < nesting:
+            free = [t for t in SEMANTIC if t not in opened]
+            if free:
+                tag = rnd.choice(free)
+                opened.append(tag)
+                out.append(f'<{tag}>')
+        out.append(rnd.choice(WORDS))
+        if opened and rnd.random() < nesting / 2:
+            out.append(f'</{opened.pop()}>')
+        out.append(' ')
+    while opened:
+        out.append(f'</{opened.pop()}>')
+    return ''.join(out).strip()
+
+
+def generate_qtf(paragraphs=DEFAULTS['paragraphs'], defs=DEFAULTS['defs'], nesting=DEFAULTS['nesting'],
+                 switches=DEFAULTS['switches'], words=DEFAULTS['words'], seed=0) -> str:
+    """Documento QTF completo con los parámetros dados."""
+    rnd = random.Random(seed)
+    lines = ['[Doc]', '[Meta]', 'Font=Arial', 'Size=12pt', '[/Meta]', '[Body]']
+    for _ in range(paragraphs):
+        align = rnd.choice(ALIGNS)
+        opening = f'[P align={align}]' if align else '[P]'
+        body = '<def>'.join(generate_line(rnd, nesting, switches, words) for _ in range(defs + 1))
+        lines.append(f'{opening}{body}[/P]')
+    lines.extend(['[/Body]', '[/Doc]'])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,269 @@
+"""
+Servidor HTTP local que hace de GitHub para probar el actualizador y el
+lanzador sin red.
+
+Sirve la API de releases (/repos/<owner>/<repo>/releases y .../latest, que
+excluye borradores y prereleases) con ETag e If-None-Match -> 304, con una
+latencia configurable (`latency`) y la opción de simular una caída
+(`api_down`). Sirve también los assets registrados en /download/<nombre>
+con ETag, Last-Modified, Range e If-Range como los de una release.
+
+Para simular una red real se puede limitar la velocidad por conexión
+(`rate`, bytes/s) y hacer que las primeras `drops` respuestas se corten
+tras enviar `drop_after` bytes. Lleva la cuenta de peticiones (también las
+de la API y los 304) y de bytes servidos para comprobar qué se reanudó.
+
+Desde código:
+    with FakeGitHub({'QPad-setup.exe': data}, rate=4 << 20) as server:
+        download(server.asset_url('QPad-setup.exe'), 'QPad-setup.exe')
+
+Desde la línea de comandos (Ctrl+C para parar; QPAD_GITHUB_API=<url> hace
+que qpad.py y el actualizador lo usen en vez de api.github.com):
+    python bench/fake_github.py QPad-setup.exe [--port 8000] [--tag v9.9.9] [--latency 0.3]
+                                [--rate 4M] [--no-ranges]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Asset:
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self.data = data
+        self.sha256 = hashlib.sha256(data).hexdigest()
+        self.etag = f'"{self.sha256[:16]}"'
+        self.last_modified = formatdate(time.time(), usegmt=True)
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'FakeGitHub'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        if self.path.startswith('/repos/'):
+            self.send_api()
+            return
+        if not self.path.startswith('/download/'):
+            self.send_error(404)
+            return
+        asset = server.assets.get(self.path[len('/download/'):])
+        if asset is None:
+            self.send_error(404)
+            return
+        self.send_asset(asset)
+
+    def send_api(self):
+        server = self.server
+        with server.lock:
+            server.api_requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if server.api_down:
+            self.send_error(503)
+            return
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if len(parts) < 4 or parts[3] != 'releases' or len(parts) > 5 or parts[4:] not in ([], ['latest']):
+            self.send_error(404)
+            return
+        published = [r for r in server.releases if not r['draft'] and not r['prerelease']]
+        if parts[4:] == ['latest']:
+            if not published:
+                self.send_error(404)
+                return
+            payload = published[0]
+        else:
+            payload = server.releases
+        body = json.dumps(payload).encode('utf-8')
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        if self.headers.get('If-None-Match') == etag:
+            with server.lock:
+                server.not_modified += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def parse_range(self, asset: Asset):
+        """(inicio, fin inclusivo) pedido, None para el fichero entero o 'invalid'."""
+        header = self.headers.get('Range')
+        if not header or not self.server.ranges:
+            return None
+        if_range = self.headers.get('If-Range')
+        if if_range and if_range not in (asset.etag, asset.last_modified):
+            return None     # cambió: se manda entero
+        first, _, last = header.removeprefix('bytes=').partition('-')
+        size = len(asset.data)
+        if not first:
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        if start >= size or start > end:
+            return 'invalid'
+        return start, end
+
+    def send_asset(self, asset: Asset):
+        size = len(asset.data)
+        rng = self.parse_range(asset)
+        if rng == 'invalid':
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        start, end = rng or (0, size - 1)
+        self.send_response(206 if rng else 200)
+        if rng:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        if self.server.ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('ETag', asset.etag)
+        self.send_header('Last-Modified', asset.last_modified)
+        self.end_headers()
+        self.send_body(asset.data, start, end + 1)
+
+    def send_body(self, data: bytes, start: int, end: int):
+        server = self.server
+        with server.lock:
+            drop = server.drops > 0 and end - start > server.drop_after
+            if drop:
+                server.drops -= 1
+        limit = start + server.drop_after if drop else end
+        block = 16 * 1024
+        started = time.monotonic()
+        sent = 0
+        for pos in range(start, limit, block):
+            piece = data[pos:min(pos + block, limit)]
+            try:
+                self.wfile.write(piece)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            sent += len(piece)
+            with server.lock:
+                server.bytes_sent += len(piece)
+            if server.rate:
+                # velocidad limitada por conexión, como un enlace lento
+                ahead = sent / server.rate - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+        if drop:
+            # conexión cortada a mitad de respuesta
+            self.close_connection = True
+            self.connection.shutdown(2)
+
+
+class FakeGitHub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, assets=None, port=0, rate=0, drops=0, drop_after=0, ranges=True, releases=None,
+                 latency=0.0, api_down=False):
+        super().__init__(('127.0.0.1', port), FakeHandler)
+        self.assets = {name: Asset(name, data) for name, data in (assets or {}).items()}
+        # lista de releases como las de la API, la más reciente primero
+        self.releases = releases if releases is not None else []
+        self.latency = latency
+        self.api_down = api_down
+        self.api_requests = 0
+        self.not_modified = 0
+        self.rate = rate
+        self.drops = drops
+        self.drop_after = drop_after
+        self.ranges = ranges
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def asset_url(self, name: str) -> str:
+        return f'{self.url}/download/{name}'
+
+    def make_release(self, tag: str, draft=False, prerelease=False, body='') -> dict:
+        """Release con todos los assets servidos (y el digest sha256 que pone GitHub)."""
+        return {
+            'tag_name': tag, 'name': tag, 'draft': draft, 'prerelease': prerelease, 'body': body,
+            'html_url': f'{self.url}/releases/tag/{tag}',
+            'assets': [{'name': asset.name, 'size': len(asset.data), 'digest': f'sha256:{asset.sha256}',
+                        'browser_download_url': self.asset_url(asset.name)} for asset in self.assets.values()],
+        }
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.api_requests = 0
+            self.not_modified = 0
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+def parse_rate(value: str) -> int:
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    if value and value[-1].upper() in units:
+        return int(float(value[:-1]) * units[value[-1].upper()])
+    return int(value)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Local stand-in for the GitHub release endpoints')
+    parser.add_argument('assets', nargs='*', help='Files served as release assets under /download/<name>')
+    parser.add_argument('--port', type=int, default=8000, help='Port on 127.0.0.1')
+    parser.add_argument('--tag', default='v9.9.9', help='Tag of the published release holding the assets')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every API response')
+    parser.add_argument('--rate', type=parse_rate, default=0, help='Per-connection limit in bytes/s (e.g. 2M)')
+    parser.add_argument('--drops', type=int, default=0, help='Cut this many responses short')
+    parser.add_argument('--drop-after', type=parse_rate, default=1 << 20, help='Bytes sent before a cut')
+    parser.add_argument('--no-ranges', action='store_true', help='Ignore Range headers (always 200)')
+    args = parser.parse_args(argv)
+    assets = {}
+    for path in args.assets:
+        with open(path, 'rb') as f:
+            assets[os.path.basename(path)] = f.read()
+    server = FakeGitHub(assets, port=args.port, rate=args.rate, drops=args.drops, drop_after=args.drop_after,
+                        ranges=not args.no_ranges, latency=args.latency)
+    server.releases = [server.make_release(args.tag)]
+    print(f'API: {server.url} (QPAD_GITHUB_API={server.url})')
+    for asset in server.assets.values():
+        print(f'{server.asset_url(asset.name)}  sha256={asset.sha256}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Ejecución de la suite y comparación con una línea base.
+
+Cada eje de corpus.DEFAULTS se barre por separado dejando el resto en su
+valor por defecto. Para cada documento se mide (mejor de `repeat`):
+
+    convert       convert_qtf_to_html del documento completo
+    process_block process_block sobre todas las líneas (partidas por <def>)
+    post_proc     post_proc sobre el HTML generado (se omite sin bs4)
+
+Los resultados son un dict serializable a JSON; compare() los contrasta con
+una ejecución anterior y marca como regresión todo lo que sea más lento que
+la base en más de `threshold` (0.10 = 10 %).
+"""
+import importlib.util
+import platform
+import sys
+import time
+import timeit
+from datetime import datetime
+
+from q2h_core import CONVERTER_VERSION, TOKEN_RE, convert_qtf_to_html, parse_qtf, post_proc, process_block
+
+from .corpus import DEFAULTS, generate_qtf
+
+SWEEPS = {
+    'paragraphs': [100, 1000, 5000],
+    'defs': [0, 2, 8],
+    'nesting': [0.0, 0.2, 0.6],
+    'switches': [0.0, 0.1, 0.5],
+}
+QUICK_SWEEPS = {
+    'paragraphs': [100, 500],
+    'defs': [0, 4],
+    'nesting': [0.0, 0.4],
+    'switches': [0.0, 0.3],
+}
+QUICK_PARAGRAPHS = 200
+
+METRICS = ('convert', 'process_block', 'post_proc')
+
+
+def have_bs4() -> bool:
+    return importlib.util.find_spec('bs4') is not None
+
+
+def best_of(func, repeat: int) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def measure(params: dict, repeat: int, with_post_proc: bool) -> dict:
+    """Mide las tres métricas sobre el documento generado con `params`."""
+    qtf = generate_qtf(**params)
+    _, _, p_blocks = parse_qtf(qtf)
+    lines = [line.strip() for _, block in p_blocks for line in block.split('<def>') if line.strip()]
+
+    def run_lines():
+        for line in lines:
+            process_block(line)
+
+    timings = {
+        'convert': best_of(lambda: convert_qtf_to_html(qtf), repeat),
+        'process_block': best_of(run_lines, repeat),
+    }
+    if with_post_proc:
+        html = convert_qtf_to_html(qtf)
+        timings['post_proc'] = best_of(lambda: post_proc(html), repeat)
+    return {
+        'params': params,
+        'chars': len(qtf),
+        'paragraphs': len(p_blocks),
+        'tags': len(TOKEN_RE.findall(qtf)),
+        'seconds': {name: round(value, 6) for name, value in timings.items()},
+    }
+
+
+def run_suite(sweeps=None, repeat=3, base=None, progress=None) -> dict:
+    """
+    Ejecuta cada barrido de `sweeps` (por defecto SWEEPS) con el resto de
+    parámetros en `base` (por defecto corpus.DEFAULTS).
+    """
+    sweeps = sweeps or SWEEPS
+    base = dict(base or DEFAULTS)
+    with_post_proc = have_bs4()
+    results = []
+    for axis, values in sweeps.items():
+        for value in values:
+            params = dict(base, **{axis: value})
+            started = time.perf_counter()
+            entry = measure(params, repeat, with_post_proc)
+            entry.update(axis=axis, value=value)
+            results.append(entry)
+            if progress:
+                progress(entry, time.perf_counter() - started)
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'converter_version': CONVERTER_VERSION,
+            'repeat': repeat,
+            'base': base,
+            'post_proc': with_post_proc,
+        },
+        'results': results,
+    }
+
+
+def result_key(entry: dict):
+    return entry['axis'], entry['value']
+
+
+def compare(current: dict, baseline: dict, threshold=0.10) -> list:
+    """
+    Devuelve una fila por (eje, valor, métrica) presente en ambas ejecuciones:
+    (eje, valor, métrica, base_s, actual_s, ratio, regresión).
+    """
+    previous = {result_key(entry): entry for entry in baseline.get('results', [])}
+    rows = []
+    for entry in current['results']:
+        old = previous.get(result_key(entry))
+        if old is None:
+            continue
+        for metric in METRICS:
+            now = entry['seconds'].get(metric)
+            before = old['seconds'].get(metric)
+            if now is None or not before:
+                continue
+            ratio = now / before
+            rows.append((entry['axis'], entry['value'], metric, before, now, ratio, ratio > 1 + threshold))
+    return rows
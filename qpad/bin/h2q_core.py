@@ -0,0 +1,294 @@
+"""
+Conversión inversa HTML -> QTF (q2h.py --h2q).
+
+Se apoya en html.parser.HTMLParser alimentado por bloques (feed), sin
+construir ningún árbol: cada <p> se convierte en un [P] en cuanto se cierra y
+la memoria queda acotada por el párrafo más grande, como en el modo
+streaming de q2h_core.
+
+    <strong>/<b>      <bold>        <em>/<i>          <italic>
+    <u>               <underline>   <del>/<s>/<strike> <strikeout>
+    <span style>      <font=> <size=> <color=>
+    <br>              <def>
+    <p style="text-align:X"> / <p align=X>           [P align=X]
+    <body style="font-family/font-size">              Font= / Size= de [Meta]
+    class="sN" + <style> (q2h --css-classes)         como el style equivalente
+
+El HTML de --css-classes lleva los estilos en un único <style> en <head>
+(body{...} y una regla .sN{...} por estilo): se leen sus reglas y el class
+de cada elemento cuenta como su style; si hay los dos, gana el style.
+Los semánticos anidados del mismo tipo (p. ej. <u><span><u>, que genera el
+propio q2h al reabrir estilos) cuentan como uno solo. QTF no puede quitar
+un estilo, así que al cerrar un <span> solo se restauran los valores que
+tenía el estilo exterior. Otros bloques (div, h1..h6, li...) también abren
+un [P]; el texto suelto en <body> va a un [P] implícito.
+"""
+import logging
+import re
+from functools import lru_cache
+from html.parser import HTMLParser
+
+from q2h_core import CHUNK_SIZE, STYLE_CACHE_SIZE, atomic_open, claim_output_path, time_now
+
+log = logging.getLogger('q2h.io')
+
+SEMANTIC_TAGS = {
+    'strong': 'bold', 'b': 'bold',
+    'em': 'italic', 'i': 'italic',
+    'u': 'underline', 'ins': 'underline',
+    'del': 'strikeout', 's': 'strikeout', 'strike': 'strikeout',
+}
+# Tags de estilo QTF en el orden de la clave de estilo de q2h_core, y su propiedad CSS
+STYLE_TAGS = ('font', 'size', 'color')
+STYLE_PROPS = {'font-family': 0, 'font-size': 1, 'color': 2}
+BLOCK_TAGS = frozenset(['p', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'blockquote', 'pre', 'td', 'th'])
+# Contenido que no es texto del documento
+SKIP_TAGS = frozenset(['head', 'title', 'script', 'style'])
+# Reglas del <style> de StyleSheet: selectores simples ("body", ".s0") y sus declaraciones
+CSS_RULE_RE = re.compile(r'([^{}]+)\{([^{}]*)\}')
+
+
+@lru_cache(maxsize=STYLE_CACHE_SIZE)
+def parse_css(style: str) -> dict:
+    """
+    'font-family:arial; color:red;' -> {'font-family': 'arial', 'color': 'red'}.
+    Cacheado: q2h repite los mismos style en cada <span>; no modificar el resultado.
+    """
+    css = {}
+    for declaration in style.split(';'):
+        name, sep, value = declaration.partition(':')
+        if sep:
+            css[name.strip().lower()] = value.strip()
+    return css
+
+
+def parse_stylesheet(text: str):
+    """
+    Reglas de un <style> -> (css de body, {clase: css}). Solo entiende los
+    selectores que escribe StyleSheet; el resto se ignora.
+    """
+    body = {}
+    classes = {}
+    # StyleSheet escapa '<' como \3c para que no cierre el <style>
+    text = text.replace('\\3c ', '<')
+    for m in CSS_RULE_RE.finditer(text):
+        css = parse_css(m.group(2))
+        for selector in m.group(1).split(','):
+            selector = selector.strip()
+            if selector == 'body':
+                body.update(css)
+            elif selector.startswith('.') and selector[1:].replace('-', '').replace('_', '').isalnum():
+                classes.setdefault(selector[1:], {}).update(css)
+    return body, classes
+
+
+class HtmlToQtfParser(HTMLParser):
+    """
+    HTMLParser que va dejando en `self.out` las piezas QTF ya completas
+    (cabecera y un [P] por bloque). iter_html_qtf las recoge tras cada feed().
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.header_done = False
+        self.default_style = [None, None, None]
+        self.skip = 0               # profundidad dentro de head/script/style
+        self.stylesheet = None      # texto del <style> en curso
+        self.body_css = {}          # body{...} y .clase{...} de los <style> leídos
+        self.class_css = {}
+        self.para = None            # piezas del [P] abierto
+        self.align = None
+        self.semantic = {}          # tag QTF -> elementos HTML abiertos
+        self.style = [None, None, None]       # último estilo emitido en QTF
+        self.style_stack = []                 # (tag, estilo pedido) por cada elemento con estilo
+
+    # Cabecera y párrafos
+
+    def emit_header(self):
+        if self.header_done:
+            return
+        self.header_done = True
+        lines = ['[Doc]', '[Meta]']
+        font, size, _ = self.default_style
+        if font:
+            lines.append(f'Font={font}')
+        if size:
+            lines.append(f'Size={size}')
+        lines.extend(['[/Meta]', '[Body]'])
+        self.out.append('\n'.join(lines))
+
+    def open_paragraph(self, align=None):
+        self.close_paragraph()
+        self.emit_header()
+        self.para = []
+        self.align = align
+        # process_block empieza cada línea sin estilo ni semánticos
+        self.semantic = {}
+        self.style = [None, None, None]
+        self.style_stack = []
+
+    def close_paragraph(self):
+        if self.para is None:
+            return
+        content = ''.join(self.para)
+        if content.strip():
+            opening = f'[P align={self.align}]' if self.align else '[P]'
+            self.out.append(f'{opening}{content}[/P]')
+        self.para = None
+
+    def ensure_paragraph(self):
+        if self.para is None:
+            self.open_paragraph()
+
+    # Estilo
+
+    def apply_style(self, wanted):
+        for index, value in enumerate(wanted):
+            if value is not None and value != self.style[index]:
+                self.style[index] = value
+                self.para.append(f'<{STYLE_TAGS[index]}={value}>')
+
+    def current_wanted(self):
+        return self.style_stack[-1][1] if self.style_stack else [None, None, None]
+
+    def element_css(self, tag, attrs) -> dict:
+        """style del elemento más lo que aportan sus clases (y body{...} para <body>)."""
+        css = parse_css(attrs.get('style') or '')
+        classes = attrs.get('class')
+        if not (classes and self.class_css) and not (tag == 'body' and self.body_css):
+            return css
+        merged = dict(self.body_css) if tag == 'body' else {}
+        for name in (classes or '').split():
+            merged.update(self.class_css.get(name, ()))
+        merged.update(css)
+        return merged
+
+    # Eventos de HTMLParser
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skip += 1
+            if tag == 'style':
+                self.stylesheet = []
+            return
+        if self.skip:
+            return
+        attrs = dict(attrs)
+        css = self.element_css(tag, attrs)
+        if tag == 'body':
+            self.default_style = [css.get('font-family'), css.get('font-size'), None]
+            self.emit_header()
+            return
+        if tag in BLOCK_TAGS:
+            self.open_paragraph(css.get('text-align') or attrs.get('align'))
+            return
+        if tag == 'br':
+            self.ensure_paragraph()
+            self.para.append('<def>')
+            return
+        if tag in SEMANTIC_TAGS:
+            self.ensure_paragraph()
+            name = SEMANTIC_TAGS[tag]
+            depth = self.semantic.get(name, 0)
+            self.semantic[name] = depth + 1
+            if not depth:
+                self.para.append(f'<{name}>')
+            return
+        if tag == 'span' or css:
+            self.ensure_paragraph()
+            wanted = list(self.current_wanted())
+            for prop, value in css.items():
+                if prop in STYLE_PROPS:
+                    wanted[STYLE_PROPS[prop]] = value
+            self.style_stack.append((tag, wanted))
+            self.apply_style(wanted)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag == 'br':
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self.skip = max(self.skip - 1, 0)
+            if tag == 'style' and self.stylesheet is not None:
+                body, classes = parse_stylesheet(''.join(self.stylesheet))
+                self.body_css.update(body)
+                self.class_css.update(classes)
+                self.stylesheet = None
+            return
+        if self.skip:
+            return
+        if tag in BLOCK_TAGS or tag == 'body':
+            self.close_paragraph()
+            return
+        if self.para is None:
+            return
+        if tag in SEMANTIC_TAGS:
+            name = SEMANTIC_TAGS[tag]
+            depth = self.semantic.get(name, 0)
+            if depth:
+                self.semantic[name] = depth - 1
+                if depth == 1:
+                    self.para.append(f'</{name}>')
+            return
+        if self.style_stack and self.style_stack[-1][0] == tag:
+            self.style_stack.pop()
+            self.apply_style(self.current_wanted())
+
+    def handle_data(self, data):
+        if self.skip:
+            if self.stylesheet is not None:
+                self.stylesheet.append(data)
+            return
+        if self.para is None:
+            if not data.strip():
+                return
+            self.open_paragraph()
+        self.para.append(data)
+
+    def finish(self):
+        """Cierra lo pendiente y añade el final del documento."""
+        self.close()
+        self.close_paragraph()
+        self.emit_header()
+        self.out.append('[/Body]\n[/Doc]')
+
+
+def iter_html_qtf(stream, chunk_size=CHUNK_SIZE):
+    """Lee HTML de `stream` por bloques y produce el QTF por piezas (cabecera, [P]..., cierre)."""
+    parser = HtmlToQtfParser()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        parser.feed(chunk)
+        if parser.out:
+            yield from parser.out
+            parser.out.clear()
+    parser.finish()
+    yield from parser.out
+
+
+def convert_html_to_qtf(html_content: str) -> str:
+    """Convierte un documento HTML completo a QTF."""
+    parser = HtmlToQtfParser()
+    parser.feed(html_content)
+    parser.finish()
+    return '\n'.join(parser.out) + '\n'
+
+
+def qtf_path_for(input_path: str, folder: str) -> str:
+    """Ruta de salida `folder`/<nombre>.qtf, con sufijo si otro fuente ya tiene ese nombre."""
+    return claim_output_path(input_path, folder, extension='qtf')
+
+
+def convert_html_file(input_path: str, output_path: str, chunk_size=CHUNK_SIZE) -> str:
+    """Convierte `input_path` (HTML) a QTF en streaming, con escritura atómica."""
+    log.info("Reverse [Started at> %s | Input> %s]", time_now(), input_path)
+    with open(input_path, encoding='utf-8') as src, atomic_open(output_path) as dst:
+        for piece in iter_html_qtf(src, chunk_size):
+            dst.write(piece)
+            dst.write('\n')
+    log.info("Reverse Done.")
+    return output_path
@@ -1,337 +1,449 @@
-import html
-import sys
-import os
-import re
+"""
+CLI del conversor QTF -> HTML.
+
+    q2h.py -i doc.qtf [-o carpeta]     convierte uno o varios ficheros/carpetas
+    q2h.py --gui                       abre el exportador gráfico (PyQt6)
+    q2h.py -i doc.qtf --profile        tiempos por etapa en stderr (ver q2h_profile.py)
+    q2h.py --serve [--port 8765]       conversor residente por socket (ver q2h_daemon.py)
+    q2h.py --h2q -i doc.html           conversión inversa HTML -> QTF (ver h2q_core.py)
+    q2h.py -i doc.qtf --format text,md varios formatos en una pasada (ver q2h_emit.py)
+    q2h.py -i doc.qtf --css-classes    estilos como clases en un único <style> (ver StyleSheet)
+    q2h.py -i doc.qtf --minify --gzip  HTML sin espacios sobrantes y doc.html.gz al lado (ver open_output)
+    q2h.py -i docs/ --index            indexa el texto para `q2h.py search` (ver q2h_search.py)
+    q2h.py search "palabras"           busca en el índice
+
+La conversión está en q2h_core.py; este módulo no importa PyQt6 ni bs4.
+"""
 import argparse
-from bs4 import BeautifulSoup
-from datetime import datetime
-from PyQt6.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QPushButton,
-    QFileDialog, QProgressBar, QLabel, QMessageBox
+import glob
+import logging
+import os
+import sys
+import time
+
+from q2h_cache import ConversionCache, convert_cached, default_cache_dir, default_output_dir, publish
+from q2h_core import (
+    COMPRESSORS, STAGES, add_log_handler, check_compress, claim_output_path, claim_output_paths, convert_file,
+    convert_path, init_worker_logging, log_levels
+)
+from q2h_incremental import convert_incremental
+# Compatibilidad con quien importaba el conversor desde q2h
+from q2h_core import (  # noqa: F401
+    convert_qtf_file, convert_qtf_to_html, iter_qtf_html, post_proc, process_block
 )
-from PyQt6.QtCore import QThread, pyqtSignal
-
-def post_proc(html: str, debug=False) -> str:
-    def dbg(msg):
-        if debug:
-            print(f"[DEBUG] {msg}")
-    dbg("POST PROCESS aka POST-PROC> Starting BeautifulSoup4")
-    soup = BeautifulSoup(html, 'html.parser')
-    for tag_name in ['span', 'em', 'u', 'del', 'strong']:
-        for tag in soup.find_all(tag_name):
-            # Si el tag está vacío o solo espacios, lo eliminamos
-            if not tag.text.strip():
-                tag.decompose()
-                dbg("POST-PROC> Tag empty detected by bs4.BeautifulSoup")
-                dbg("POST-PROC> [DESCOMPOSING...]")
-                dbg(tag.text)
-    dbg("POST-PROC> [POST-PROC] Finished BeautifulSoup4")
-    dbg("POST-PROC> [POST-PROC] Returning the soup...")
-    return str(soup)
-
-def time_now() -> str:
-    """Devuelve la hora actual formateada para logs."""
-    return datetime.now().strftime('%H:%M:%S~%Y/%m/%d')
-
-
-def convert_qtf_to_html(qtf_content: str, progress_callback=None, debug=False) -> str:
-    def dbg(msg):
-        if debug:
-            print(f"[DEBUG-QPAD] {msg}")
 
+
+def expand_inputs(inputs, pattern='*.qtf') -> list:
     """
-    Convierte contenido QTF a HTML.
-    Si se pasa progress_callback, se actualiza el progreso (0-100).
+    Expande las entradas del CLI: ficheros, directorios (se buscan `pattern`
+    de forma recursiva) y '-' para leer rutas desde stdin, una por línea.
     """
-    origin = "GUI" if progress_callback else "CLI"
-    print(f"[QPad-QTF2HTML]: Parsing [Started at> {time_now()} | Origin> {origin}]")
-
-    dbg("Parsing-debug [Started at> {time_now()} | Origin> {origin}]")
-    dbg("[DBG ENABLED]")
-    lines = [line.strip() for line in qtf_content.splitlines()]
-    default_font = None
-    default_size = None
-
-    for line in lines:
-        if line.startswith('Font='):
-            default_font = line.split('=', 1)[1]
-        elif line.startswith('Size='):
-            default_size = line.split('=', 1)[1]
-
-    html = ['<!DOCTYPE html>', '<html>', '<head>', '<meta charset="utf-8">', '</head>']
-
-    style = []
-    if default_font:
-        style.append(f"font-family:{default_font};")
-    if default_size:
-        style.append(f"font-size:{default_size};")
-    body_style = " ".join(style)
-    html.append(f'<body style="{body_style}">')
-
-    content = '\n'.join(lines)
-    body_match = re.search(r"\[Body\](.*?)\[/Body\]", content, re.DOTALL)
-
-    if body_match:
-        body = body_match.group(1)
-        p_blocks = re.findall(r"\[P(?:\s+align=([^\]]+))?\](.*?)\[/P\]", body, re.DOTALL)
-        total = len(p_blocks)
-
-        for idx, (align, block) in enumerate(p_blocks, start=1):
-            # Dividir por <def> para separar líneas
-            lines = block.split('<def>')
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                if debug:
-                    print("[dbg]segment call >> process_block")
-                ...
-                segment = process_block(line, debug=debug)
-                ...
-                if segment.strip():
-                    p_tag = f'<p style="text-align:{align};">' if align else '<p>'
-                    html.append(f"{p_tag}{segment}</p>")
-            if progress_callback:
-                progress_callback(int(idx / total * 100))
-
-    html.extend(['</body>', '</html>'])
-
-    if progress_callback:
-        progress_callback(100)
-    print("[QPad-QTF2HTML]: Parsing Done.")
-
-    html_result = '\n'.join(html)
-
-    # Aquí aplicas el post-proceso para eliminar spans vacíos
-    html_result = post_proc(html_result, debug=debug)
-
-    if progress_callback:
-        progress_callback(100)
-    print("[QPad-QTF2HTML]: Post-Parsing Done.")
-
-    return html_result
-
-def process_block(content: str, debug=False) -> str:
-    import re, html
-
-    def dbg(msg):
-        if debug:
-            print(f"[DEBUG] {msg}")
-
-    dbg("[dbg] (qtf-daemon) > DEFINING SEM")
-    # Mapeo semántico
-    SEM = {'bold':'strong','italic':'em','underline':'u','strikeout':'del'}
-
-    dbg("[dbg] (qtf-daemon) > TOKENIZE")
-    # Tokenizamos en texto o tags (<def>, <bold>, </bold>, <font=...>, etc.)
-    TOKEN_RE = re.compile(r'(?:<def>)|(?:</?[A-Za-z]+(?:=[^>]+)?>)', re.IGNORECASE)
-    parts = TOKEN_RE.split(content)
-    tags  = TOKEN_RE.findall(content)
-    seq = []
-    for txt, tag in zip(parts, tags+['']):
-        if txt: seq.append(('text', txt))
-        if tag: seq.append(('tag', tag))
-
-    semantic = []               # stack de 'bold','italic',...
-    style = {'font':None,'size':None,'color':None}
-    span_open = False
-
-    def close_span():
-        dbg("[dbg] (qtf-daemon) > Closing span")
-        nonlocal span_open
-        if span_open:
-            span_open = False
-            return '</span>'
-        return ''
-
-    def open_span():
-        dbg("[dbg] (qtf-daemon) > Opening span")
-        nonlocal span_open
-        css = []
-        if style['font']: css.append(f'font-family:{style["font"]};')
-        if style['size']: css.append(f'font-size:{style["size"]};')
-        if style['color']:css.append(f'color:{style["color"]};')
-        if css:
-            span_open = True
-            dbg("[dbg] (qtf-daemon) > Open span [with CSS]")
-            return f'<span style="{" ".join(css)}">'
-        return ''
-
-    def open_sem(t):
-        dbg("[dbg] (qtf-daemon) > Opening span [with SEM]")
-        if t not in semantic:
-            semantic.append(t)
-            return f'<{SEM[t]}>'
-        return ''
-
-    def close_sem(t):
-        dbg("[dbg] (qtf-daemon) > Closing span [with SEM]")
-        if semantic and semantic[-1]==t:
-            semantic.pop()
-            return f'</{SEM[t]}>'
-        return ''
-
-    out = ''
-    first = True
-
-    for kind, val in seq:
-        if kind=='text':
-            out += html.escape(val)
-            first = False
-            continue
+    paths = []
+    for item in inputs:
+        if item == '-':
+            paths.extend(line.strip() for line in sys.stdin if line.strip())
+        elif os.path.isdir(item):
+            paths.extend(sorted(glob.glob(os.path.join(item, '**', pattern), recursive=True)))
+        else:
+            paths.append(item)
+    return paths
 
-        tag = val[1:-1].lower()  # quita < y >
-        if tag=='def':
-            # cerrar semánticos (solo el tope) y span
-            if semantic:
-                out += close_sem(semantic[-1])
-            out += close_span() + '<br/>' + open_span()
-            dbg("[dbg] (qtf-daemon) > Closing span [with SEM] [DEF]")
-            # reabrir semánticos en orden
-            for s in semantic:
-                out += f'<{SEM[s]}>'
-            continue
 
-        # semántico open
-        if tag in SEM:
-            out += open_sem(tag)
-            dbg("[dbg] (qtf-daemon) > Opening SEM <SEM> [DEF-SEM]")
-            continue
+def output_paths(paths, folder) -> list:
+    """Rutas de salida del lote; los nombres repetidos o ya de otra entrada reciben un sufijo (claim_output_paths)."""
+    return claim_output_paths(paths, folder)
 
-        # semántico close
-        if tag.startswith('/'):
-            dbg("[dbg] (qtf-daemon) > Closing SEM </SEM> [DEF-SEM]")
-            inner = tag[1:]
-            if inner in SEM:
-                out += close_sem(inner)
-                dbg("[dbg] (qtf-daemon) > Closing SEM [DEF-SEM]")
-            continue
 
-        # visual style
-        if '=' in tag:
-            dbg("[dbg] (qtf-daemon) > VSSTYLE [DEF-SEM-css]")
-            key,val2 = tag.split('=',1)
-            key=key.lower()
-            if key in style and style[key]!=val2:
-                dbg("[dbg] (qtf-daemon) > VSSTYLE [DEF-SEM-css] >> Closing SPAN [DEF]")
-                out += close_span()
-                style[key]=val2
-                dbg("[dbg] (qtf-daemon) > VSSTYLE [DEF-SEM-css] >> Opening SPAN [DEF]")
-                out += open_span()
-                # reabrir semánticos
-                for s in semantic:
-                    dbg("[dbg] (qtf-daemon) > VSSTYLE [DEF-SEM-css] >> Reopen SEM [SEM]")
-                    out += f'<{SEM[s]}>'
-            continue
+def index_texts(search_index, path):
+    """
+    Lista vacía que la conversión de `path` debe llenar con los textos para
+    el índice, o None si no hay índice o el documento ya está al día.
+    """
+    if search_index is None:
+        return None
+    try:
+        return [] if search_index.wants(path) else None
+    except OSError:
+        return None   # el error ya lo dará la conversión
+
 
-        # ignorar cualquier otro
+def index_converted(search_index, path, texts):
+    """Indexa un documento ya convertido; un fallo aquí no cuenta como fallo de conversión."""
+    if texts is None:
+        return
+    try:
+        search_index.add_file(path, texts)
+    except (OSError, ValueError) as e:
+        print(f'[QPad-QTF2HTML]: index: {path}: {e}', file=sys.stderr)
 
-    # cierre final
-    dbg("[dbg] (qtf-daemon) > END [DEF] >> Closing SPAN [DEF]")
-    out += close_span()
-    while semantic:
-        dbg("[dbg] (qtf-daemon) > END [DEF] >> Closing SEM [SEM]")
-        out += close_sem(semantic[-1])
 
-    dbg("[dbg] (qtf-daemon) > RETURN")
-    return out
+def convert_indexed(convert, input_path, output_file, **options):
+    """
+    convert() recogiendo los textos para el índice, en un proceso del pool:
+    la lista del proceso principal no se llenaría, así que se devuelve
+    (salida, textos).
+    """
+    texts = []
+    return convert(input_path, output_file, texts=texts, **options), texts
 
-class ParserThread(QThread):
-    progress = pyqtSignal(int)
-    finished = pyqtSignal(str)
 
-    def __init__(self, input_path: str):
-        super().__init__()
-        self.input_path = input_path
-        self.output_folder = os.path.join(os.getcwd(), 'comp', 'cache')
-        os.makedirs(self.output_folder, exist_ok=True)
-    def run(self):
+def run_batch(paths, folder, cli_args, cache=None, profile=None, search_index=None) -> int:
+    """
+    Convierte varios ficheros repartiéndolos en un pool de `--jobs` procesos
+    (cada fichero se convierte en serie dentro de su proceso). Los errores se
+    informan por fichero sin detener el lote. Devuelve el número de fallos.
+
+    Con `cache`, las búsquedas se hacen aquí antes de repartir: los aciertos
+    no llegan al pool y solo los fallos se convierten. Con `profile` el lote
+    se convierte en serie para poder medir cada fichero. Con `search_index`
+    cada fichero convertido se indexa aquí mismo con los textos que recogió
+    su conversión; los que el índice aún no tiene al día se convierten
+    aunque estén en la caché.
+    """
+    if cli_args.incremental and not cli_args.stream:
+        convert = convert_incremental
+        options = dict(state_dir=cli_args.cache_dir or default_cache_dir(),
+                       strict_cleanup=cli_args.strict_cleanup, css_classes=cli_args.css_classes,
+                       minify=cli_args.minify, compress=cli_args.compress)
+    else:
+        convert = convert_file
+        options = dict(stream=cli_args.stream, strict_cleanup=cli_args.strict_cleanup,
+                       css_classes=cli_args.css_classes, minify=cli_args.minify, compress=cli_args.compress)
+    serial = cli_args.jobs <= 1
+    if profile is not None:
+        options['profile'] = profile
+        if not serial:
+            logging.getLogger('q2h').warning("--profile converts the batch serially, ignoring --jobs")
+            serial = True
+    started = time.perf_counter()
+    done = failed = 0
+    total_bytes = 0
+
+    def report(path, output_file, result, key=None, target=None, texts=None):
+        nonlocal done, failed, total_bytes
         try:
-            with open(self.input_path, encoding='utf-8') as f:
-                qtf = f.read()
-            html = convert_qtf_to_html(qtf, progress_callback=self.progress.emit)
-            base = os.path.splitext(os.path.basename(self.input_path))[0]
-            output_file = os.path.join(self.output_folder, f'{base}.html')
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(html)
-            self.finished.emit(output_file)
+            converted = result()
+            if key is not None:
+                publish(cache.store(key, converted, path), output_file)
         except Exception as e:
-            self.finished.emit(f'ERROR: {e}')
-
-
-class Qtf2HtmlExporter(QWidget):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle('QTF → HTML Exporter')
-        self.resize(400, 200)
-
-        self.layout = QVBoxLayout(self)
-
-        self.label = QLabel('Select a QTF file')
-        self.layout.addWidget(self.label)
-
-        self.browse_button = QPushButton('Browse')
-        self.browse_button.clicked.connect(self.select_file)
-        self.layout.addWidget(self.browse_button)
-
-        self.progress_bar = QProgressBar()
-        self.layout.addWidget(self.progress_bar)
-
-        self.thread = None
+            failed += 1
+            print(f'ERROR: {path}: {e}', file=sys.stderr)
+            if key is not None and os.path.exists(target):
+                os.remove(target)
+            return
+        done += 1
+        total_bytes += os.path.getsize(path)
+        print(output_file)
+        index_converted(search_index, path, texts)
+
+    def collected(future, texts):
+        """Salida de convert_indexed, dejando sus textos en la lista `texts`."""
+        converted, texts[:] = future.result()
+        return converted
+
+    # (ruta, salida, destino de la conversión, clave de caché, textos) de los que hay que convertir
+    jobs = []
+    for path, output_file in zip(paths, output_paths(paths, folder)):
+        texts = index_texts(search_index, path)
+        if cache is None:
+            jobs.append((path, output_file, output_file, None, texts))
+            continue
+        lookup_started = time.perf_counter()
+        try:
+            key = cache.key_for(path, stream=cli_args.stream, strict_cleanup=cli_args.strict_cleanup,
+                                css_classes=cli_args.css_classes, minify=cli_args.minify,
+                                compress=cli_args.compress)
+        except OSError as e:
+            failed += 1
+            print(f'ERROR: {path}: {e}', file=sys.stderr)
+            continue
+        cached = cache.lookup(key) if texts is None else None
+        if profile is not None:
+            profile.add('cache', time.perf_counter() - lookup_started, os.path.getsize(path))
+        if cached is not None:
+            report(path, output_file, lambda: publish(cached, output_file))
+        else:
+            jobs.append((path, output_file, cache.temp_path(key), key, texts))
 
-    def select_file(self):
-        path, _ = QFileDialog.getOpenFileName(self, 'Open QTF', '', 'QTF Files (*.qtf)')
-        if path:
-            self.label.setText(f'Parsing: {os.path.basename(path)}')
-            self.browse_button.setEnabled(False)
-            self.progress_bar.setValue(0)
+    if serial:
+        for path, output_file, target, key, texts in jobs:
+            report(path, output_file, lambda: convert(path, target, texts=texts, **options), key, target, texts)
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        with ProcessPoolExecutor(max_workers=cli_args.jobs, initializer=init_worker_logging,
+                                 initargs=(log_levels(),)) as pool:
+            futures = {}
+            for path, output_file, target, key, texts in jobs:
+                if texts is None:
+                    future = pool.submit(convert, path, target, **options)
+                else:
+                    future = pool.submit(convert_indexed, convert, path, target, **options)
+                futures[future] = (path, output_file, target, key, texts)
+            for future in as_completed(futures):
+                path, output_file, target, key, texts = futures[future]
+                if texts is None:
+                    report(path, output_file, future.result, key, target)
+                else:
+                    report(path, output_file, lambda: collected(future, texts), key, target, texts)
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    mb = total_bytes / (1024 * 1024)
+    summary = (f'[QPad-QTF2HTML]: Batch done: {done} converted, {failed} failed in {elapsed:.2f}s '
+               f'({done / elapsed:.1f} files/s, {mb / elapsed:.2f} MB/s)')
+    if cache is not None:
+        cache.evict()
+        summary += f', {cache.summary()}'
+    if search_index is not None:
+        summary += f', {search_index.summary()}'
+    print(summary, file=sys.stderr)
+    return failed
+
+
+def configure_logging(cli_args):
+    """Los logs van siempre a stderr: stdout solo lleva las rutas generadas."""
+    add_log_handler(sys.stderr)
+    root = logging.getLogger('q2h')
+    if cli_args.debug:
+        root.setLevel(logging.DEBUG)
+    elif cli_args.verbose:
+        root.setLevel(logging.INFO)
+    else:
+        root.setLevel(logging.WARNING)
+    for stage in cli_args.debug_stage:
+        logging.getLogger(f'q2h.{stage}').setLevel(logging.DEBUG)
 
-            self.thread = ParserThread(path)
-            self.thread.progress.connect(self.progress_bar.setValue)
-            self.thread.finished.connect(self.on_finished)
-            self.thread.start()
 
-    def on_finished(self, output_path: str):
-        self.browse_button.setEnabled(True)
-        if output_path.startswith('ERROR'):
-            QMessageBox.critical(self, 'Error', output_path)
-            self.label.setText('Select a QTF file')
-        else:
-            QMessageBox.information(self, 'Done', f'HTML saved to:\n{output_path}')
-            self.label.setText('Select a QTF file')
-            self.progress_bar.setValue(100)
+def report_profile(profile, cli_args):
+    """Resumen de --profile en stderr y, si se pide, en JSON."""
+    print(profile.report(), file=sys.stderr)
+    if cli_args.profile_json:
+        with open(cli_args.profile_json, 'w', encoding='utf-8') as f:
+            f.write(profile.to_json())
+    if cli_args.profile_stats:
+        print(f'  cProfile stats written to {cli_args.profile_stats}', file=sys.stderr)
 
 
-def run_cli(cli_args, debug=False):
-    with open(cli_args.input, encoding='utf-8') as f:
-        qtf = f.read()
+def run_reverse(cli_args) -> int:
+    """--h2q: convierte HTML -> QTF en serie, informando los errores por fichero."""
+    from h2q_core import convert_html_file
 
-    html = convert_qtf_to_html(qtf, debug=debug)
-    folder = cli_args.output or os.path.join(os.getcwd(), 'comp', 'cache')
+    folder = cli_args.output or default_output_dir()
     os.makedirs(folder, exist_ok=True)
-
-    base = os.path.splitext(os.path.basename(cli_args.input))[0]
-    output_file = os.path.join(folder, f'{base}.html')
+    failed = 0
+    paths = expand_inputs(cli_args.input, pattern='*.html')
+    # x/a.html e y/a.html no pueden acabar los dos en a.qtf
+    for path, output_file in zip(paths, claim_output_paths(paths, folder, extension='qtf')):
+        try:
+            print(convert_html_file(path, output_file))
+        except (OSError, UnicodeDecodeError) as e:
+            failed += 1
+            print(f'[QPad-HTML2QTF]: {path}: {e}', file=sys.stderr)
+    return 1 if failed else 0
 
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html)
+def run_formats(cli_args, formats) -> int:
+    """
+    --format: cada fichero se convierte a todos los formatos en una pasada, en
+    serie y sin caché. --strict-cleanup, --css-classes, --minify y
+    --gzip/--zstd se aplican a la salida html; --index indexa los textos de
+    la misma pasada. Las opciones que no caben en esa pasada (--stream,
+    --incremental, --jobs, --profile) las rechaza el parser.
+    """
+    from q2h_emit import EMITTERS, convert_formats
 
-    print(output_file)
+    folder = cli_args.output or default_output_dir()
+    os.makedirs(folder, exist_ok=True)
+    search_index = None
+    if cli_args.index:
+        from q2h_search import SearchIndex, default_index_path
+        search_index = SearchIndex(default_index_path(cli_args.cache_dir))
+    failed = 0
+    try:
+        for path in expand_inputs(cli_args.input):
+            # el nombre se decide una vez (el del .html) y vale para todas las extensiones
+            base = os.path.splitext(claim_output_path(path, folder))[0]
+            outputs = {fmt: f'{base}.{EMITTERS[fmt].extension}' for fmt in formats}
+            texts = index_texts(search_index, path)
+            try:
+                convert_formats(path, outputs, strict_cleanup=cli_args.strict_cleanup,
+                                css_classes=cli_args.css_classes, minify=cli_args.minify,
+                                compress=cli_args.compress, texts=texts)
+            except (OSError, UnicodeDecodeError) as e:
+                failed += 1
+                print(f'[QPad-QTF2HTML]: {path}: {e}', file=sys.stderr)
+                continue
+            for output_file in outputs.values():
+                print(output_file)
+            index_converted(search_index, path, texts)
+    finally:
+        if search_index is not None:
+            print(f'[QPad-QTF2HTML]: {search_index.summary()}', file=sys.stderr)
+            search_index.close()
+    return 1 if failed else 0
+
+
+def run_cli(cli_args) -> int:
+    if cli_args.h2q:
+        return run_reverse(cli_args)
+    if cli_args.format and cli_args.format != ['html']:
+        return run_formats(cli_args, cli_args.format)
+    folder = cli_args.output or default_output_dir()
+    os.makedirs(folder, exist_ok=True)
+    cache = None
+    if not cli_args.no_cache:
+        cache = ConversionCache(cli_args.cache_dir, max_bytes=int(cli_args.cache_max_mb * 1024 * 1024))
+    profile = profiler = None
+    if cli_args.profile or cli_args.profile_json or cli_args.profile_stats:
+        from q2h_profile import ConversionProfile
+        profile = ConversionProfile()
+    if cli_args.profile_stats:
+        # Solo ve el proceso principal: con --jobs los workers quedan fuera
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    search_index = None
+    if cli_args.index:
+        from q2h_search import SearchIndex, default_index_path
+        search_index = SearchIndex(default_index_path(cli_args.cache_dir))
+
+    try:
+        single = cli_args.input[0]
+        if len(cli_args.input) == 1 and single != '-' and not os.path.isdir(single):
+            # Un único fichero: el paralelismo (--jobs) se aplica a nivel de párrafo
+            texts = index_texts(search_index, single)
+            options = dict(stream=cli_args.stream, strict_cleanup=cli_args.strict_cleanup,
+                           workers=cli_args.jobs, profile=profile, css_classes=cli_args.css_classes,
+                           minify=cli_args.minify, compress=cli_args.compress, texts=texts)
+            if cache is None and cli_args.incremental and not cli_args.stream:
+                print(convert_incremental(single, claim_output_path(single, folder),
+                                          state_dir=cli_args.cache_dir or default_cache_dir(),
+                                          strict_cleanup=cli_args.strict_cleanup, workers=cli_args.jobs,
+                                          profile=profile, css_classes=cli_args.css_classes,
+                                          minify=cli_args.minify, compress=cli_args.compress, texts=texts))
+            elif cache is None:
+                print(convert_path(single, folder, **options))
+            else:
+                output_file, _ = convert_cached(single, folder, cache, incremental=cli_args.incremental,
+                                                **options)
+                print(output_file)
+                cache.evict()
+                print(f'[QPad-QTF2HTML]: {cache.summary()}', file=sys.stderr)
+            index_converted(search_index, single, texts)
+            return 0
+
+        failed = run_batch(expand_inputs(cli_args.input), folder, cli_args, cache=cache, profile=profile,
+                           search_index=search_index)
+        return 1 if failed else 0
+    finally:
+        if cache is not None:
+            cache.save()
+        if search_index is not None:
+            search_index.close()
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cli_args.profile_stats)
+        if profile is not None:
+            report_profile(profile, cli_args)
 
 
 if __name__ == '__main__':
+    if sys.argv[1:2] == ['search']:
+        from q2h_search import search_main
+        sys.exit(search_main(sys.argv[2:]))
     parser = argparse.ArgumentParser(description='QTF to HTML converter')
-    parser.add_argument('-i', '--input', help='QTF input file')
+    parser.add_argument('-i', '--input', action='extend', nargs='+',
+                        help="QTF input files or folders (searched recursively); '-' reads paths from stdin")
     parser.add_argument('-o', '--output', help='Output folder')
     parser.add_argument('--gui', action='store_true', help='Use GUI mode')
-    parser.add_argument('--debug', action='store_true', help='Enable debug output')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log progress messages to stderr')
+    parser.add_argument('--debug', action='store_true', help='Log debug output of every stage to stderr')
+    parser.add_argument('--debug-stage', action='append', choices=STAGES, default=[],
+                        help='Log debug output of one stage only (repeatable)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Stream the input in chunks, writing each paragraph as soon as it is parsed')
+    parser.add_argument('--strict-cleanup', action='store_true',
+                        help='Run the BeautifulSoup empty-tag cleanup pass over the output')
+    parser.add_argument('--css-classes', action='store_true',
+                        help='Write each distinct style once as a CSS class in a <style> block '
+                             'instead of inline style attributes (smaller output)')
+    parser.add_argument('--minify', action='store_true',
+                        help='Strip whitespace that does not change the rendering from the HTML output')
+    parser.add_argument('--gzip', type=int, nargs='?', const=COMPRESSORS['gz'][1], metavar='LEVEL',
+                        help='Also write a precompressed <name>.html.gz next to each output, compressed while '
+                             'it is generated (level 0-9, default %(const)s)')
+    parser.add_argument('--zstd', type=int, nargs='?', const=COMPRESSORS['zst'][1], metavar='LEVEL',
+                        help='Also write <name>.html.zst (needs the zstandard module; level 1-22, default %(const)s)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Worker processes: per paragraph for one file, per file in batch mode '
+                             '(0 = one per CPU)')
+    parser.add_argument('--no-cache', action='store_true', help='Always reconvert, bypassing the conversion cache')
+    parser.add_argument('--cache-dir', help='Conversion cache folder (default: comp/cache/store)')
+    parser.add_argument('--cache-max-mb', type=float, default=512,
+                        help='Evict least recently used cache entries above this size')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only re-render paragraphs that changed since the previous conversion of each file')
+    parser.add_argument('--format', type=lambda value: value.split(','),
+                        help='Comma-separated output formats written in one pass: html, text, md, json '
+                             '(anything but plain html skips the cache and runs serially: no --stream, '
+                             '--incremental, --jobs or --profile)')
+    parser.add_argument('--index', action='store_true',
+                        help="Add converted documents to the full-text index used by 'q2h.py search'")
+    parser.add_argument('--h2q', action='store_true',
+                        help='Reverse mode: convert HTML inputs (folders: *.html) back to QTF '
+                             '(serial, no cache: no HTML output options, --jobs, --format or --index)')
+    parser.add_argument('--serve', action='store_true',
+                        help='Run as a daemon answering JSON-lines requests on a local socket')
+    parser.add_argument('--socket', help='Unix socket path for --serve (default: comp/q2h.sock)')
+    parser.add_argument('--port', type=int, help='Listen on 127.0.0.1:PORT instead of a Unix socket')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print per-stage wall time, throughput and paragraph/tag rates to stderr')
+    parser.add_argument('--profile-json', metavar='FILE', help='Also write the --profile summary as JSON to FILE')
+    parser.add_argument('--profile-stats', metavar='FILE',
+                        help='Run under cProfile and dump pstats data to FILE (main process only)')
     args = parser.parse_args()
-
-    if args.gui or not args.input:
-        app = QApplication(sys.argv)
-        exporter = Qtf2HtmlExporter()
-        exporter.show()
-        sys.exit(app.exec())
+    if args.h2q:
+        # La conversión inversa es un recorrido en serie sin caché ni opciones de salida HTML
+        unsupported = [flag for flag, value in (
+            ('--css-classes', args.css_classes), ('--strict-cleanup', args.strict_cleanup),
+            ('--minify', args.minify), ('--gzip', args.gzip is not None), ('--zstd', args.zstd is not None),
+            ('--stream', args.stream), ('--incremental', args.incremental), ('--jobs', args.jobs != 1),
+            ('--format', args.format), ('--index', args.index),
+            ('--profile', args.profile or args.profile_json or args.profile_stats)) if value]
+        if unsupported:
+            parser.error(f"--h2q cannot be combined with {', '.join(unsupported)}")
+    if args.format:
+        from q2h_emit import EMITTERS
+        unknown = sorted(set(args.format) - set(EMITTERS))
+        if unknown:
+            parser.error(f"unknown --format: {', '.join(unknown)} (choose from {', '.join(EMITTERS)})")
+        if args.format != ['html']:
+            # Una sola pasada en serie sobre el fichero mapeado: esto no se aplicaría
+            unsupported = [flag for flag, value in (
+                ('--stream', args.stream), ('--incremental', args.incremental), ('--jobs', args.jobs != 1),
+                ('--profile', args.profile or args.profile_json or args.profile_stats)) if value]
+            if unsupported:
+                parser.error(f"--format {','.join(args.format)} cannot be combined with {', '.join(unsupported)}")
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    args.compress = {ext: level for ext, level in (('gz', args.gzip), ('zst', args.zstd)) if level is not None}
+    try:
+        args.compress = check_compress(args.compress) or None
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.serve:
+        from q2h_daemon import serve
+        configure_logging(args)
+        cache = None
+        if not args.no_cache:
+            cache = ConversionCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024))
+        sys.exit(serve(workers=args.jobs, cache=cache, folder=args.output, socket_path=args.socket,
+                       port=args.port))
+    elif args.gui or not args.input:
+        # La GUI (y con ella PyQt6) solo se carga cuando se pide
+        from q2h_gui import main as gui_main
+        sys.exit(gui_main(sys.argv))
     else:
-        run_cli(args, debug=args.debug)
+        configure_logging(args)
+        sys.exit(run_cli(args))
@@ -0,0 +1,303 @@
+"""
+Caché de conversiones en comp/cache/store, direccionada por contenido.
+
+La clave es el SHA-256 del .qtf más CONVERTER_VERSION y las opciones que
+afectan a la salida, así que dos ficheros con el mismo nombre no se pisan y
+un .qtf sin cambios no se vuelve a convertir. Tampoco al publicarse: la
+ruta de salida por defecto sale de claim_output_path. El HTML de cada clave vive en
+store/objects/<ab>/<clave>.html y store/index.json guarda tamaño y último
+acceso de cada entrada para expulsar por LRU cuando se superan los límites de
+tamaño o de número de entradas. Las variantes precomprimidas (--gzip/--zstd)
+se guardan junto al objeto como <clave>.html.gz/.zst, cuentan en el tamaño de
+su entrada y se publican con él. La caché va en su propia subcarpeta: la
+carpeta de salida por defecto (default_output_dir, comp/cache) solo tiene las
+copias publicadas, y --cache-max-mb mide únicamente lo que es caché.
+
+En modo lote las búsquedas y altas se hacen en el proceso principal y los
+workers solo convierten. Dentro de un proceso varios hilos (la cola de la
+GUI) pueden compartir la misma ConversionCache: el índice se toca siempre con
+`lock`. Entre procesos (CLI, daemon y GUI sobre la misma carpeta) save()
+vuelve a leer index.json bajo index.json.lock y mezcla en él solo lo que este
+proceso añadió, usó o quitó, así que nadie pisa las entradas de otro. Los
+ficheros de objects/ que no están en el índice (un proceso que murió antes de
+guardarlo) se borran al guardar cuando pasan de ORPHAN_GRACE.
+"""
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+from q2h_core import COMPRESSORS, CONVERTER_VERSION, atomic_open, claim_output_path, convert_file, remove_variants
+from q2h_incremental import convert_incremental
+
+INDEX_FILE = 'index.json'
+INDEX_LOCK = 'index.json.lock'
+OBJECTS_DIR = 'objects'
+CACHE_SUBDIR = 'store'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 20000
+HASH_CHUNK = 1 << 20
+LOCK_POLL = 0.05
+LOCK_STALE = 30         # segundos: un index.json.lock más viejo es de un proceso caído
+ORPHAN_GRACE = 24 * 3600  # segundos: antes puede ser un alta de otro proceso aún sin guardar
+
+
+def default_output_dir() -> str:
+    """Carpeta de salida por defecto del CLI, la GUI y el daemon."""
+    return os.path.join(os.getcwd(), 'comp', 'cache')
+
+
+def default_cache_dir() -> str:
+    """Raíz por defecto de la caché (y del estado incremental y search.db)."""
+    return os.path.join(default_output_dir(), CACHE_SUBDIR)
+
+
+class ConversionCache:
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES, max_entries=DEFAULT_MAX_ENTRIES):
+        self.root = root or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(os.path.join(self.root, OBJECTS_DIR), exist_ok=True)
+        self.index = self._load()
+        self._dirty = False
+        self._touched = set()   # claves añadidas o usadas desde el último save()
+        self._removed = set()   # claves quitadas desde el último save()
+        self.lock = threading.Lock()
+        self._temp_ids = itertools.count()
+
+    def _load(self) -> dict:
+        try:
+            with open(os.path.join(self.root, INDEX_FILE), encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != CONVERTER_VERSION:
+            # Salida de otra versión del conversor: nada del índice es válido
+            return {}
+        return data.get('entries', {})
+
+    def key_for(self, input_path: str, **options) -> str:
+        """Clave de caché: hash del contenido + versión del conversor + opciones."""
+        h = hashlib.sha256()
+        with open(input_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+                h.update(chunk)
+        h.update(b'\0' + CONVERTER_VERSION.encode('ascii'))
+        h.update(b'\0' + json.dumps(options, sort_keys=True).encode('utf-8'))
+        return h.hexdigest()
+
+    def object_path(self, key: str) -> str:
+        return os.path.join(self.root, OBJECTS_DIR, key[:2], f'{key}.html')
+
+    def temp_path(self, key: str) -> str:
+        """
+        Ruta temporal junto al objeto definitivo (mismo disco, para os.replace).
+        Es distinta en cada llamada: dos ficheros idénticos del mismo lote (o
+        dos peticiones al daemon) comparten clave y se convierten a la vez.
+        """
+        folder = os.path.dirname(self.object_path(key))
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, f'{key}.{os.getpid()}.{threading.get_ident()}.{next(self._temp_ids)}.tmp')
+
+    def lookup(self, key: str):
+        """Devuelve la ruta del HTML en caché o None; actualiza los contadores."""
+        path = self.object_path(key)
+        with self.lock:
+            entry = self.index.get(key)
+            if entry is not None and os.path.exists(path):
+                entry['atime'] = time.time()
+                self._touched.add(key)
+                self._dirty = True
+                self.hits += 1
+                return path
+            if entry is not None:
+                del self.index[key]
+                self._removed.add(key)
+                self._dirty = True
+            self.misses += 1
+            return None
+
+    def store(self, key: str, html_path: str, source: str) -> str:
+        """Mueve `html_path` (ya escrito) y sus variantes a su objeto y lo registra en el índice."""
+        path = self.object_path(key)
+        variants = [ext for ext in COMPRESSORS if os.path.exists(f'{html_path}.{ext}')]
+        for ext in variants:
+            os.replace(f'{html_path}.{ext}', f'{path}.{ext}')
+        os.replace(html_path, path)
+        entry = {
+            'size': os.path.getsize(path) + sum(os.path.getsize(f'{path}.{ext}') for ext in variants),
+            'atime': time.time(),
+            'source': os.path.abspath(source),
+        }
+        if variants:
+            entry['variants'] = variants
+        with self.lock:
+            self.index[key] = entry
+            self._touched.add(key)
+            self._dirty = True
+        return path
+
+    def evict(self):
+        """Expulsa las entradas menos usadas hasta cumplir max_bytes y max_entries."""
+        total = sum(entry['size'] for entry in self.index.values())
+        if total <= self.max_bytes and len(self.index) <= self.max_entries:
+            return
+        for key, entry in sorted(self.index.items(), key=lambda kv: kv[1]['atime']):
+            if total <= self.max_bytes and len(self.index) <= self.max_entries:
+                break
+            path = self.object_path(key)
+            for name in [path] + [f'{path}.{ext}' for ext in entry.get('variants', ())]:
+                try:
+                    os.remove(name)
+                except OSError:
+                    pass
+            total -= entry['size']
+            del self.index[key]
+            self._removed.add(key)
+            self.evictions += 1
+            self._dirty = True
+
+    def _merge(self, entries: dict) -> dict:
+        """
+        Índice en disco `entries` (quizá escrito por otro proceso) más lo que
+        este proceso cambió: de una clave usada en los dos gana el acceso más
+        reciente, y una clave quitada aquí solo sale si su objeto ya no existe
+        (otro proceso pudo volver a guardarla).
+        """
+        for key in self._touched:
+            entry = self.index.get(key)
+            if entry is not None and (key not in entries or entries[key]['atime'] < entry['atime']):
+                entries[key] = entry
+        for key in self._removed:
+            if key in entries and not os.path.exists(self.object_path(key)):
+                del entries[key]
+        return entries
+
+    def _sweep_orphans(self):
+        """Borra los ficheros de objects/ que no son de ninguna entrada y pasan de ORPHAN_GRACE."""
+        known = set()
+        for key, entry in self.index.items():
+            path = self.object_path(key)
+            known.add(path)
+            known.update(f'{path}.{ext}' for ext in entry.get('variants', ()))
+        cutoff = time.time() - ORPHAN_GRACE
+        for folder, _, names in os.walk(os.path.join(self.root, OBJECTS_DIR)):
+            for name in names:
+                path = os.path.join(folder, name)
+                try:
+                    if path not in known and os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    @contextmanager
+    def _index_lock(self):
+        """Exclusión entre procesos para leer, mezclar y escribir index.json."""
+        path = os.path.join(self.root, INDEX_LOCK)
+        while True:
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(path) > LOCK_STALE:
+                        os.remove(path)
+                        continue
+                except OSError:
+                    continue
+                time.sleep(LOCK_POLL)
+        try:
+            os.close(fd)
+            yield
+        finally:
+            os.remove(path)
+
+    def save(self):
+        """Mezcla el índice con el de disco, aplica la expulsión y lo escribe de forma atómica."""
+        with self.lock:
+            if not self._dirty:
+                return
+            with self._index_lock():
+                self.index = self._merge(self._load())
+                self.evict()
+                self._sweep_orphans()
+                with atomic_open(os.path.join(self.root, INDEX_FILE)) as f:
+                    json.dump({'version': CONVERTER_VERSION, 'entries': self.index}, f)
+            self._touched.clear()
+            self._removed.clear()
+            self._dirty = False
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f'cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate), {self.evictions} evicted'
+
+
+def _copy(src_path: str, dst_path: str):
+    with open(src_path, 'rb') as src, atomic_open(dst_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+
+
+def publish(cached_path: str, output_file: str) -> str:
+    """
+    Copia el objeto de caché y sus variantes .gz/.zst a la ruta de salida
+    pedida (si no es la misma), cada uno de forma atómica y el .html el
+    último, como open_output.
+    """
+    if os.path.abspath(cached_path) != os.path.abspath(output_file):
+        variants = [ext for ext in COMPRESSORS if os.path.exists(f'{cached_path}.{ext}')]
+        for ext in variants:
+            _copy(f'{cached_path}.{ext}', f'{output_file}.{ext}')
+        _copy(cached_path, output_file)
+        remove_variants(output_file, keep=variants)
+    return output_file
+
+
+def convert_cached(input_path: str, folder: str, cache: ConversionCache, output_file=None, stream=False,
+                   strict_cleanup=False, workers=None, progress_callback=None, incremental=False,
+                   profile=None, cancel=None, css_classes=False, minify=False, compress=None, texts=None):
+    """
+    Convierte `input_path` pasando por la caché. En un acierto no se parsea
+    nada: solo se copia el HTML guardado. En un fallo, con incremental=True
+    solo se renderizan los párrafos que cambiaron desde la última vez.
+    Si `cancel` se activa a mitad (ConversionCancelled) no se guarda nada.
+    minify y compress forman parte de la clave, así que un acierto trae ya
+    sus variantes comprimidas. Con la lista `texts` (índice de búsqueda) se
+    convierte aunque haya acierto, para sacar los textos de esa pasada; el
+    resultado se vuelve a guardar. Devuelve (ruta de salida, acierto).
+    """
+    output_file = output_file or claim_output_path(input_path, folder)
+    started = time.perf_counter()
+    key = cache.key_for(input_path, stream=stream, strict_cleanup=strict_cleanup, css_classes=css_classes,
+                        minify=minify, compress=compress)
+    cached = cache.lookup(key) if texts is None else None
+    hit = cached is not None
+    if profile is not None:
+        profile.add('cache', time.perf_counter() - started, os.path.getsize(input_path))
+    if not hit:
+        tmp = cache.temp_path(key)
+        try:
+            if incremental and not stream:
+                convert_incremental(input_path, tmp, state_dir=cache.root, strict_cleanup=strict_cleanup,
+                                    workers=workers, progress_callback=progress_callback, profile=profile,
+                                    cancel=cancel, css_classes=css_classes, minify=minify, compress=compress,
+                                    texts=texts)
+            else:
+                convert_file(input_path, tmp, stream=stream, strict_cleanup=strict_cleanup, workers=workers,
+                             progress_callback=progress_callback, profile=profile, cancel=cancel,
+                             css_classes=css_classes, minify=minify, compress=compress, texts=texts)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        cached = cache.store(key, tmp, input_path)
+    elif progress_callback:
+        progress_callback(100)
+    return publish(cached, output_file), hit
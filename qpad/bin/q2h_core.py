@@ -0,0 +1,1623 @@
+"""
+Núcleo de conversión QTF -> HTML.
+
+No importa nada pesado (ni PyQt6 ni bs4): BeautifulSoup solo se carga si se
+pide la pasada post_proc y el pool de procesos solo con workers > 1. La
+interfaz gráfica vive en q2h_gui.py y el CLI en q2h.py.
+"""
+import codecs
+import gzip
+import hashlib
+import html
+import importlib.util
+import json
+import logging
+import mmap
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from functools import lru_cache
+
+
+# Un logger por etapa; sin configuración no emiten nada y cada traza de
+# depuración cuesta una sola comprobación de nivel.
+log = logging.getLogger('q2h')
+parse_log = logging.getLogger('q2h.parse')
+render_log = logging.getLogger('q2h.render')
+cleanup_log = logging.getLogger('q2h.cleanup')
+io_log = logging.getLogger('q2h.io')
+log.addHandler(logging.NullHandler())
+
+LOG_FORMAT = '[QPad-QTF2HTML] %(name)s: %(message)s'
+STAGES = ('parse', 'render', 'cleanup', 'io', 'cache', 'daemon', 'index')
+
+
+def log_levels() -> dict:
+    """Niveles efectivos de los loggers q2h.*, para replicarlos en los workers."""
+    names = ['q2h'] + [f'q2h.{stage}' for stage in STAGES]
+    return {name: logging.getLogger(name).getEffectiveLevel() for name in names}
+
+
+def add_log_handler(stream=None):
+    """Envía los logs q2h.* a `stream` (stderr por defecto) si aún no van a ningún sitio."""
+    if any(not isinstance(h, logging.NullHandler) for h in log.handlers):
+        return
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log.addHandler(handler)
+
+
+def init_worker_logging(levels: dict):
+    """Initializer del pool: con spawn (Windows) los workers no heredan la configuración."""
+    add_log_handler()
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+
+def post_proc(html: str) -> str:
+    """Pasada opcional de limpieza de tags vacíos con BeautifulSoup (--strict-cleanup)."""
+    from bs4 import BeautifulSoup
+
+    debug = cleanup_log.isEnabledFor(logging.DEBUG)
+    if debug:
+        cleanup_log.debug("Starting BeautifulSoup4 (%d chars)", len(html))
+    soup = BeautifulSoup(html, 'html.parser')
+    for tag_name in ['span', 'em', 'u', 'del', 'strong']:
+        for tag in soup.find_all(tag_name):
+            # Si el tag está vacío o solo espacios, lo eliminamos
+            if not tag.text.strip():
+                if debug:
+                    cleanup_log.debug("Decomposing empty <%s> %r", tag_name, tag.text)
+                tag.decompose()
+    if debug:
+        cleanup_log.debug("Finished BeautifulSoup4")
+    return str(soup)
+
+def time_now() -> str:
+    """Devuelve la hora actual formateada para logs."""
+    return datetime.now().strftime('%H:%M:%S~%Y/%m/%d')
+
+
+# Cambiar cuando cambie el HTML generado: invalida las entradas de comp/cache/store
+CONVERTER_VERSION = '2'
+
+# Tamaño de bloque para la lectura en modo streaming
+CHUNK_SIZE = 1 << 20
+# Párrafos por lote enviado a cada proceso con workers > 1
+BATCH_SIZE = 256
+# Búfer del escritor de salida
+OUTPUT_BUFFER = 1 << 20
+# Caracteres que el modo streaming acumula antes de pasarlos al escáner
+SCAN_BATCH = 1 << 16
+# Intervalo mínimo entre dos avisos de progreso (20 por segundo)
+PROGRESS_INTERVAL = 0.05
+
+
+class ConversionCancelled(Exception):
+    """La conversión se canceló (ver ProgressReporter); la salida no se escribe."""
+
+
+class ProgressReporter:
+    """
+    Progreso 0-100 limitado en frecuencia. El avance se mide en unidades de
+    entrada consumidas (bytes o caracteres) sobre `total`, así que no hace
+    falta saber cuántos párrafos hay. `callback` solo se llama si el
+    porcentaje cambió y han pasado `min_interval` segundos desde el último
+    aviso; finish() envía siempre el 100 final.
+
+    Con `position` (p. ej. el tell() del fichero) poll() lee la posición
+    solo cuando toca avisar.
+
+    Con `cancel` (un threading.Event) update() y poll(), que se llaman tras
+    cada párrafo, lanzan ConversionCancelled en cuanto el evento se activa.
+    """
+
+    def __init__(self, callback, total, min_interval=PROGRESS_INTERVAL, position=None, cancel=None):
+        self.callback = callback
+        self.total = total
+        self.min_interval = min_interval
+        self.position = position
+        self.cancel = cancel
+        self.last = -1
+        self._next = 0.0
+
+    def update(self, done):
+        if self.cancel is not None and self.cancel.is_set():
+            raise ConversionCancelled()
+        now = time.monotonic()
+        if now < self._next or not self.total:
+            return
+        percent = min(int(done * 100 / self.total), 99)
+        if percent > self.last:
+            self.last = percent
+            self._next = now + self.min_interval
+            if self.callback:
+                self.callback(percent)
+
+    def poll(self):
+        if self.cancel is not None and self.cancel.is_set():
+            raise ConversionCancelled()
+        if self.position is not None and time.monotonic() >= self._next:
+            self.update(self.position())
+
+    def finish(self):
+        if self.last != 100:
+            self.last = 100
+            if self.callback:
+                self.callback(100)
+
+
+# style="..." de <span>/<p> y cierres de <span> en el HTML ya renderizado de un <p>;
+# la primera alternativa es un </span> seguido (tras algún <br/>) de otro <span>
+STYLE_ATTR_RE = re.compile(r'</span>((?:<br/>)*)<span style="([^"]*)">|<(span|p) style="([^"]*)">|</span>')
+
+
+class StyleSheet:
+    """
+    Modo de clases CSS (css_classes=True): cada style="..." distinto de un
+    documento recibe una clase corta (s0, s1... por orden de aparición) y la
+    cabecera lleva un único <style> con todas, en vez de repetir el estilo en
+    cada <span>. Se aplica al HTML ya renderizado de cada <p>, así que vale
+    igual con workers, en modo incremental y en streaming.
+
+    Además, un <span> que se cierra y se vuelve a abrir con el mismo estilo
+    sin más que <br/> en medio (un <DEF>, o un cambio de estilo que quedó
+    vacío) se deja como un solo <span>.
+    """
+
+    def __init__(self):
+        self.classes = {}           # css -> nombre de la clase
+        self.markup = {}            # (tag, css) -> <tag class="...">
+        # Font=/Size= del documento, para cuando la cabecera se escribe al final
+        self.default_font = None
+        self.default_size = None
+
+    def class_for(self, css: str) -> str:
+        name = self.classes.get(css)
+        if name is None:
+            name = self.classes[css] = f's{len(self.classes):x}'
+        return name
+
+    def open_tag(self, tag: str, css: str) -> str:
+        markup = self.markup.get((tag, css))
+        if markup is None:
+            markup = self.markup[tag, css] = f'<{tag} class="{self.class_for(css)}">'
+        return markup
+
+    def convert(self, p: str) -> str:
+        """Sustituye los style="..." de un <p> por clases y une los <span> repetidos."""
+        out = []
+        append = out.append
+        spans = []      # css de cada <span> abierto
+        pos = 0
+        for m in STYLE_ATTR_RE.finditer(p):
+            breaks, reopened, tag, css = m.groups()
+            append(p[pos:m.start()])
+            pos = m.end()
+            if reopened is not None:
+                if spans.pop() == reopened:
+                    # mismo estilo: sigue abierto el anterior y el <br/> queda dentro
+                    append(breaks)
+                else:
+                    append('</span>')
+                    append(breaks)
+                    append(self.open_tag('span', reopened))
+                spans.append(reopened)
+            elif tag is not None:
+                if tag == 'span':
+                    spans.append(css)
+                append(self.open_tag(tag, css))
+            else:
+                spans.pop()
+                append('</span>')
+        if not out:
+            return p
+        append(p[pos:])
+        return ''.join(out)
+
+    def rules(self) -> list:
+        """Una regla .clase{...} por estilo; '<' se escapa para que no pueda cerrar el <style>."""
+        return ['.%s{%s}' % (name, css.replace('<', '\\3c ')) for css, name in self.classes.items()]
+
+
+def html_header(default_font=None, default_size=None, sheet=None) -> list:
+    """
+    Devuelve las líneas de cabecera del documento HTML hasta <body>. Con
+    `sheet` (StyleSheet) el estilo de <body> y las clases van en un <style>.
+    """
+    html = ['<!DOCTYPE html>', '<html>', '<head>', '<meta charset="utf-8">']
+
+    style = []
+    if default_font:
+        style.append(f"font-family:{default_font};")
+    if default_size:
+        style.append(f"font-size:{default_size};")
+    body_style = " ".join(style)
+    if sheet is None:
+        html.append('</head>')
+        html.append(f'<body style="{body_style}">')
+        return html
+    html.append('<style>')
+    if body_style:
+        html.append(f'body{{{body_style}}}')
+    html.extend(sheet.rules())
+    html.extend(['</style>', '</head>', '<body>'])
+    return html
+
+
+@contextmanager
+def html_body_writer(dst, header, spool=False):
+    """
+    Escribe en `dst` la cabecera (header() devuelve su texto) y devuelve
+    dónde escribir el resto del documento. Con spool=True la cabecera depende
+    de lo que se escriba después (el <style> de StyleSheet): el resto va a un
+    temporal en disco y al salir se copia a `dst` detrás de la cabecera, sin
+    tener el documento entero en memoria.
+    """
+    if not spool:
+        dst.write(header())
+        yield dst
+        return
+    with tempfile.TemporaryFile('w+', encoding='utf-8', buffering=OUTPUT_BUFFER) as body:
+        yield body
+        dst.write(header())
+        body.seek(0)
+        shutil.copyfileobj(body, dst, OUTPUT_BUFFER)
+
+
+def block_lines(block: str) -> list:
+    """Líneas no vacías de un bloque [P] (partido por <def>), sin espacios en los extremos."""
+    return [line for line in map(str.strip, block.split('<def>')) if line]
+
+
+def render_lines(align, lines_events) -> list:
+    """Elementos <p> (uno por línea con texto visible) de los eventos de cada línea de un [P]."""
+    out = []
+    for events in lines_events:
+        segment = render_events(events)
+        if segment.strip():
+            p_tag = f'<p style="text-align:{align};">' if align else '<p>'
+            out.append(f"{p_tag}{segment}</p>")
+    return out
+
+
+def render_paragraph(align, block: str) -> list:
+    """Convierte un bloque [P] a una lista de elementos <p> (uno por <def>)."""
+    return render_lines(align, map(qtf_events, block_lines(block)))
+
+
+# Espacios que el navegador muestra como uno solo
+SPACES_RE = re.compile(r'\s+')
+
+
+def lines_text(lines_events) -> str:
+    """
+    Texto de un [P] como se ve en el HTML, de los eventos de cada línea: una
+    línea por <def> con texto, los espacios colapsados y un <DEF> en otra
+    capitalización como salto de línea.
+    """
+    texts = (SPACES_RE.sub(' ', ''.join(arg if event == EV_TEXT else '\n' for event, arg, _, _, _ in events
+                                        if event == EV_TEXT or event == EV_DEF)).strip()
+             for events in lines_events)
+    return '\n'.join(text for text in texts if text)
+
+
+def render_paragraph_text(align, block: str) -> tuple:
+    """(render_paragraph, lines_text) de un bloque [P] tokenizándolo una sola vez."""
+    lines_events = [list(qtf_events(line)) for line in block_lines(block)]
+    return render_lines(align, lines_events), lines_text(lines_events)
+
+
+def _render_batch(batch, with_text=False) -> list:
+    """Renderiza un lote de (align, block) en un proceso del pool."""
+    render = render_paragraph_text if with_text else render_paragraph
+    return [render(align, block) for align, block in batch]
+
+
+def render_paragraphs(paragraphs, workers=None, batch_size=BATCH_SIZE, texts=None):
+    """
+    Renderiza un iterable de (align, block) y produce la lista [<p>...] de
+    cada párrafo en el orden original.
+
+    Con workers > 1 los párrafos se agrupan en lotes de `batch_size` y se
+    reparten en un ProcessPoolExecutor; como mucho hay 2 * workers lotes en
+    vuelo, así que la memoria sigue acotada en modo streaming.
+
+    Si se pasa la lista `texts`, se le añade el texto de cada párrafo
+    (lines_text) antes de producir su HTML, sacado de los mismos eventos:
+    así el índice de búsqueda no vuelve a leer el documento.
+    """
+    if not workers or workers <= 1:
+        if texts is None:
+            for align, block in paragraphs:
+                yield render_paragraph(align, block)
+        else:
+            for align, block in paragraphs:
+                rendered, text = render_paragraph_text(align, block)
+                texts.append(text)
+                yield rendered
+        return
+
+    def results(future):
+        if texts is None:
+            return future.result()
+        pairs = future.result()
+        texts.extend(text for _, text in pairs)
+        return [rendered for rendered, _ in pairs]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker_logging,
+                             initargs=(log_levels(),)) as pool:
+        in_flight = deque()
+        batch = []
+        for item in paragraphs:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                in_flight.append(pool.submit(_render_batch, batch, texts is not None))
+                batch = []
+                if len(in_flight) >= 2 * workers:
+                    yield from results(in_flight.popleft())
+        if batch:
+            in_flight.append(pool.submit(_render_batch, batch, texts is not None))
+        while in_flight:
+            yield from results(in_flight.popleft())
+
+
+# Escáner estructural de [Body] y [P]. Las marcas son de longitud fija y el
+# valor de align se delimita aparte con búsquedas que nunca vuelven atrás,
+# así que cada carácter se examina un número acotado de veces: el tiempo es
+# lineal aunque haya miles de marcas sin cerrar.
+MARKER_RE = re.compile(r'\[(?:/?Body\]|/P\]|P(?=[\]\s]))')
+MARKER_RE_B = re.compile(MARKER_RE.pattern.encode('ascii'))
+SPACE_RE = re.compile(r'\s*')
+SPACE_RE_B = re.compile(rb'\s*')
+# La marca más larga es [/Body]: al final de un bloque se retiene lo justo
+# para no perder una marca partida entre dos bloques
+MARKER_TAIL = len('[/Body]') - 1
+# Diagnósticos guardados por documento; del resto solo se lleva la cuenta
+MAX_DIAGNOSTICS = 100
+
+
+class QtfDiagnostics:
+    """
+    Errores de estructura de un documento como (línea, columna, mensaje),
+    ambas desde 1 (la columna en bytes si se escanean bytes). Las posiciones
+    llegan en orden creciente, así que línea y columna se calculan de forma
+    incremental. Con `source` cada error se avisa además en el log q2h.parse;
+    `first_line` es la línea en la que empieza el texto escaneado.
+    """
+
+    def __init__(self, source=None, first_line=1):
+        self.source = source
+        self.items = []
+        self.count = 0
+        self._pos = 0           # posición absoluta hasta la que se contaron líneas
+        self._line = first_line
+        self._line_start = 0
+
+    def locate(self, buf, index: int, base=0) -> tuple:
+        """(línea, columna) de buf[index], donde buf empieza en la posición absoluta `base`."""
+        newline = '\n' if isinstance(buf, str) else b'\n'
+        pos = base + index
+        if pos > self._pos:
+            first = self._pos - base
+            if isinstance(buf, mmap.mmap):
+                # mmap no tiene count(): se copia solo el tramo aún sin contar
+                with memoryview(buf) as view:
+                    found = bytes(view[first:index]).count(newline)
+            else:
+                found = buf.count(newline, first, index)
+            if found:
+                self._line += found
+                self._line_start = base + buf.rfind(newline, first, index) + 1
+            self._pos = pos
+        return self._line, pos - self._line_start + 1
+
+    def add(self, buf, index: int, message: str, base=0):
+        self.record(*self.locate(buf, index, base), message)
+
+    def record(self, line: int, column: int, message: str):
+        self.count += 1
+        if len(self.items) < MAX_DIAGNOSTICS:
+            self.items.append((line, column, message))
+            if self.source is not None:
+                parse_log.warning("%s:%d:%d: %s", self.source, line, column, message)
+
+    def summary(self) -> str:
+        hidden = self.count - len(self.items)
+        return f'{self.count} structure errors' + (f' ({hidden} not shown)' if hidden else '')
+
+
+class _Finder:
+    """buf.find(token, inicio) para inicios crecientes sin volver a recorrer lo ya buscado."""
+
+    def __init__(self, token):
+        self.token = token
+        self.pos = -1       # última aparición encontrada
+        self.until = 0      # si pos == -1: hasta aquí ya se buscó sin éxito
+
+    def find(self, buf, start: int) -> int:
+        if self.pos >= start:
+            return self.pos
+        if self.pos == -1 and start < self.until:
+            start = max(start, self.until - len(self.token) + 1)
+        self.pos = buf.find(self.token, start)
+        if self.pos == -1:
+            self.until = len(buf)
+        return self.pos
+
+    def shift(self, removed: int):
+        if self.pos != -1:
+            self.pos -= removed
+        self.until = max(self.until - removed, 0)
+
+
+WAIT = object()     # la marca puede completarse con el siguiente bloque
+
+
+class QtfBodyScanner:
+    """
+    Escáner incremental del [Body]: feed() recibe el documento por bloques
+    (o entero: str, bytes o mmap) y produce (align, block, fin) por cada [P]
+    en cuanto se cierra, con align y block sin decodificar ni normalizar y
+    fin la posición absoluta tras el párrafo. Solo se retiene el párrafo
+    abierto y, como mucho, una marca partida entre dos bloques.
+
+    En un documento bien formado equivale a las expresiones regulares de
+    antes (el primer [Body] hasta el primer [/Body], cada [P] hasta el
+    primer [/P]). Ante marcas desequilibradas se anota un diagnóstico y se
+    sigue: un [P] sin cerrar termina en el siguiente [P] o en [/Body], un
+    [Body] sin cerrar llega hasta el final y los [/P] sueltos se ignoran.
+    """
+
+    def __init__(self, diagnostics=None, text=True, in_body=False):
+        self.diagnostics = diagnostics if diagnostics is not None else QtfDiagnostics()
+        if text:
+            self.marker_re, self.space_re = MARKER_RE, SPACE_RE
+            self.body, self.body_end, self.p_close, self.align_kw = '[Body]', '[/Body]', '[/P]', 'align='
+            self.close_bracket, self.eol, self.buf = ']', '\r\n', ''
+        else:
+            self.marker_re, self.space_re = MARKER_RE_B, SPACE_RE_B
+            self.body, self.body_end, self.p_close, self.align_kw = b'[Body]', b'[/Body]', b'[/P]', b'align='
+            self.close_bracket, self.eol, self.buf = b']', b'\r\n', b''
+        self.base = 0               # posición absoluta de buf[0]
+        self.scan = 0               # desde dónde buscar marcas en buf
+        self.in_body = in_body
+        self.body_location = self.diagnostics.locate(self.buf, 0) if in_body else None
+        self.done = False
+        self.open_at = None         # índice en buf del [P] abierto
+        self.align = None
+        self.start = 0              # inicio del contenido del [P] abierto
+        self.space_end = 0          # espacios ya recorridos tras el '[P' pendiente
+        self.brackets = _Finder(self.close_bracket)
+        self.body_ends = _Finder(self.body_end)
+
+    def p_marker(self, buf, pos: int, final: bool):
+        """
+        Analiza el '[P' de `pos`: (align, inicio del contenido), None si no
+        es una marca o WAIT si faltan datos para saberlo.
+        """
+        end = pos + 2
+        if buf[end:end + 1] == self.close_bracket:
+            return None, end + 1
+        space = self.space_re.match(buf, max(end, self.space_end)).end()
+        kw = self.align_kw
+        if space == len(buf) or (len(buf) - space < len(kw) and kw.startswith(buf[space:])):
+            self.space_end = space
+            return None if final else WAIT
+        self.space_end = 0
+        if buf[space:space + len(kw)] != kw:
+            return None
+        value = space + len(kw)
+        bracket = self.brackets.find(buf, value)
+        if bracket == -1:
+            return None if final else WAIT
+        if bracket == value:
+            return None
+        stop = self.body_ends.find(buf, value)
+        if stop != -1 and stop < bracket:
+            # el align llegaría más allá de [/Body]: no es una marca
+            return None
+        return buf[value:bracket], bracket + 1
+
+    def feed(self, data, final=False):
+        """Añade `data` y produce los párrafos que ya se pueden cerrar."""
+        if self.done:
+            return
+        buf = self.buf
+        self.buf = None
+        if buf:
+            buf += data
+        else:
+            buf = data
+        diagnostics = self.diagnostics
+        base = self.base
+        open_at, align, start = self.open_at, self.align, self.start
+        resume = self.scan
+        waiting = False
+
+        for m in self.marker_re.finditer(buf, self.scan):
+            pos = m.start()
+            if pos < resume:
+                continue
+            token = m.group()
+            if not self.in_body:
+                if token == self.body:
+                    self.in_body = True
+                    self.body_location = diagnostics.locate(buf, pos, base)
+                    resume = m.end()
+                continue
+            if token == self.body_end:
+                if open_at is not None:
+                    diagnostics.add(buf, open_at, '[P] not closed before [/Body]', base)
+                    yield align, buf[start:pos], base + pos
+                self.done = True
+                self.buf = buf[:0]
+                return
+            if token == self.body:
+                if open_at is None:
+                    diagnostics.add(buf, pos, 'duplicate [Body] ignored', base)
+                resume = m.end()
+                continue
+            if token == self.p_close:
+                if open_at is None:
+                    diagnostics.add(buf, pos, '[/P] without a matching [P] ignored', base)
+                else:
+                    yield align, buf[start:pos], base + m.end()
+                    open_at = None
+                resume = m.end()
+                continue
+
+            # '[P' seguido de ']' o de un espacio: [P] o [P align=...]
+            marker = self.p_marker(buf, pos, final)
+            if marker is WAIT:
+                waiting = True
+                resume = pos
+                break
+            if marker is None:
+                continue
+            if open_at is not None:
+                diagnostics.add(buf, open_at, '[P] not closed before the next [P]', base)
+                yield align, buf[start:pos], base + pos
+            open_at = pos
+            align, start = marker
+            resume = start
+
+        if final:
+            yield from self.finish(buf, open_at, align, start)
+            return
+        # Retener solo el [P] abierto y lo que pueda ser el inicio de una marca
+        scan = resume if waiting else max(resume, len(buf) - MARKER_TAIL)
+        keep = scan if open_at is None else min(open_at, scan)
+        if keep:
+            diagnostics.locate(buf, keep, base)
+            buf = buf[keep:]
+            self.base = base + keep
+            scan -= keep
+            start -= keep
+            if open_at is not None:
+                open_at -= keep
+            if self.space_end:
+                self.space_end -= keep
+            self.brackets.shift(keep)
+            self.body_ends.shift(keep)
+        self.buf = buf
+        self.scan = scan
+        self.open_at, self.align, self.start = open_at, align, start
+
+    def finish(self, buf, open_at, align, start):
+        self.done = True
+        self.buf = buf[:0]
+        diagnostics = self.diagnostics
+        if not self.in_body:
+            diagnostics.record(1, 1, 'no [Body] section')
+            return
+        if open_at is not None:
+            diagnostics.add(buf, open_at, '[P] not closed at end of document', self.base)
+            # los saltos de línea finales del fichero no son parte del párrafo
+            yield align, buf[start:].rstrip(self.eol), self.base + len(buf)
+        diagnostics.record(*self.body_location, '[Body] not closed')
+
+    def close(self):
+        """Fin de la entrada: el [P] que quede abierto llega hasta el final."""
+        if not self.done:
+            yield from self.feed(self.buf[:0], final=True)
+
+
+def scan_qtf_body(buf, diagnostics=None):
+    """Escanea un documento completo (str, bytes o mmap) con QtfBodyScanner."""
+    return QtfBodyScanner(diagnostics, text=isinstance(buf, str)).feed(buf, final=True)
+
+
+def parse_qtf(qtf_content: str, profile=None, diagnostics=None):
+    """
+    Extrae de un documento QTF completo (default_font, default_size, p_blocks),
+    donde p_blocks es la lista de (align, block) de los [P] de [Body].
+    Los errores de estructura van a `diagnostics` (QtfDiagnostics) si se
+    pasa, o al log q2h.parse.
+    """
+    started = time.perf_counter()
+    default_font = None
+    default_size = None
+
+    for line in qtf_content.splitlines():
+        line = line.strip()
+        if line.startswith('Font='):
+            default_font = line.split('=', 1)[1]
+        elif line.startswith('Size='):
+            default_size = line.split('=', 1)[1]
+    header_done = time.perf_counter()
+
+    if diagnostics is None:
+        diagnostics = QtfDiagnostics(source='<qtf>')
+    p_blocks = [(align if align is None else normalize_block(align), normalize_block(block))
+                for align, block, _ in scan_qtf_body(qtf_content, diagnostics)]
+    if profile is not None:
+        profile.add('header', header_done - started, len(qtf_content))
+        profile.add('body', time.perf_counter() - header_done, len(qtf_content))
+    return default_font, default_size, p_blocks
+
+
+def convert_qtf_to_html(qtf_content: str, progress_callback=None, strict_cleanup=False,
+                        workers=None, profile=None, css_classes=False, minify=False) -> str:
+    """
+    Convierte contenido QTF a HTML.
+    Si se pasa progress_callback, se actualiza el progreso (0-100) según los
+    caracteres de párrafo ya renderizados (ver ProgressReporter).
+    Con strict_cleanup=True se pasa además post_proc (BeautifulSoup) sobre
+    el documento completo; por defecto process_block ya omite los tags vacíos.
+    Con workers > 1 los párrafos se convierten en paralelo (ver render_paragraphs).
+    Con profile (q2h_profile.ConversionProfile) se mide el tiempo de cada etapa.
+    Con css_classes=True los estilos van como clases en un <style> (StyleSheet).
+    Con minify=True se quitan los espacios que no se ven (HtmlMinifier).
+    """
+    origin = "GUI" if progress_callback else "CLI"
+    log.info("Parsing [Started at> %s | Origin> %s]", time_now(), origin)
+
+    default_font, default_size, p_blocks = parse_qtf(qtf_content, profile=profile)
+    parse_log.debug("%d paragraphs, Font=%s, Size=%s", len(p_blocks), default_font, default_size)
+
+    sheet = StyleSheet() if css_classes else None
+    # con clases la cabecera se pone al final, cuando ya se conocen todas
+    html = [] if sheet else html_header(default_font, default_size)
+
+    progress = None
+    if progress_callback:
+        progress = ProgressReporter(progress_callback, sum(len(block) for _, block in p_blocks))
+        sizes = deque(len(block) for _, block in p_blocks)
+    done = 0
+    if profile is not None:
+        profile.documents += 1
+        rendered_iter = profile.render(p_blocks, workers=workers)
+    else:
+        rendered_iter = render_paragraphs(p_blocks, workers=workers)
+    for rendered in rendered_iter:
+        html.extend(map(sheet.convert, rendered) if sheet else rendered)
+        if progress:
+            done += sizes.popleft()
+            progress.update(done)
+
+    html.extend(['</body>', '</html>'])
+    if sheet:
+        html[:0] = html_header(default_font, default_size, sheet)
+
+    if progress:
+        progress.finish()
+    log.info("Parsing Done.")
+
+    html_result = '\n'.join(html)
+
+    if strict_cleanup:
+        # Pasada opcional de limpieza con BeautifulSoup sobre todo el documento
+        started = time.perf_counter()
+        html_result = post_proc(html_result)
+        if profile is not None:
+            profile.add('cleanup', time.perf_counter() - started, len(html_result))
+        log.info("Post-Parsing Done.")
+
+    if minify:
+        html_result = minify_html(html_result)
+    return html_result
+
+
+def iter_qtf_lines(stream, chunk_size=CHUNK_SIZE):
+    """
+    Lee `stream` por bloques de `chunk_size` caracteres y produce cada línea
+    ya sin espacios al inicio/final (igual que splitlines() + strip()).
+    """
+    tail = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        parts = (tail + chunk).splitlines(True)
+        # La última pieza puede estar incompleta (o ser un '\r' de un '\r\n' partido)
+        tail = parts.pop()
+        for line in parts:
+            yield line.strip()
+    if tail:
+        yield tail.strip()
+
+
+def read_qtf_header(lines):
+    """
+    Consume líneas hasta encontrar [Body].
+    Devuelve (default_font, default_size, resto de la línea tras [Body]);
+    el resto es None si el documento no tiene [Body].
+    """
+    default_font = None
+    default_size = None
+    for line in lines:
+        if line.startswith('Font='):
+            default_font = line.split('=', 1)[1]
+        elif line.startswith('Size='):
+            default_size = line.split('=', 1)[1]
+        pos = line.find('[Body]')
+        if pos != -1:
+            return default_font, default_size, line[pos + 6:]
+    return default_font, default_size, None
+
+
+def iter_body_paragraphs(lines, head='', diagnostics=None):
+    """
+    Produce (align, block) por cada [P]...[/P] del cuerpo en cuanto se cierra.
+    `head` es el texto que sigue a [Body] en su misma línea. Las líneas se
+    pasan a QtfBodyScanner en bloques de SCAN_BATCH caracteres, así que solo
+    se retiene el párrafo en curso, no el documento entero.
+    """
+    scanner = QtfBodyScanner(diagnostics, in_body=True)
+    pending = [head]
+    size = len(head)
+    for line in lines:
+        pending.append(line)
+        size += len(line) + 1
+        if size >= SCAN_BATCH:
+            for align, block, _ in scanner.feed('\n'.join(pending)):
+                yield align, block
+            if scanner.done:
+                return
+            pending = ['']      # el siguiente bloque empieza con el salto de línea
+            size = 0
+    for align, block, _ in scanner.feed('\n'.join(pending), final=True):
+        yield align, block
+
+
+def iter_qtf_html(stream, chunk_size=CHUNK_SIZE, strict_cleanup=False, workers=None, profile=None,
+                  source='<qtf>', sheet=None, texts=None):
+    """
+    Modo streaming: lee `stream` por bloques y produce el HTML línea a línea,
+    emitiendo cada [P] en cuanto se cierra. La memoria queda acotada por el
+    párrafo más grande, no por el documento.
+
+    A diferencia de convert_qtf_to_html, Font=/Size= solo se toman de antes
+    de [Body]. Los errores de estructura se avisan como los de `source`; las
+    columnas cuentan sobre las líneas ya sin espacios en los extremos.
+
+    Con `sheet` (StyleSheet) los <p> salen con clases y la cabecera no se
+    produce: Font=/Size= quedan en el sheet para escribirla al final. Con
+    `texts` se recoge el texto de cada párrafo (ver render_paragraphs).
+    """
+    started = time.perf_counter()
+    read = [0]
+
+    def counted(lines):
+        for line in lines:
+            read[0] += 1
+            yield line
+
+    lines = counted(iter_qtf_lines(stream, chunk_size))
+    default_font, default_size, head = read_qtf_header(lines)
+    if profile is not None:
+        profile.documents += 1
+        profile.add('header', time.perf_counter() - started)
+
+    if sheet is None:
+        yield from html_header(default_font, default_size)
+    else:
+        sheet.default_font, sheet.default_size = default_font, default_size
+    if head is None:
+        QtfDiagnostics(source).record(1, 1, 'no [Body] section')
+    else:
+        paragraphs = iter_body_paragraphs(lines, head, QtfDiagnostics(source, first_line=read[0]))
+        if profile is not None:
+            rendered_iter = profile.render(paragraphs, workers=workers, scan=True, texts=texts)
+        else:
+            rendered_iter = render_paragraphs(paragraphs, workers=workers, texts=texts)
+        for rendered in rendered_iter:
+            for p in rendered:
+                if sheet is not None:
+                    p = sheet.convert(p)
+                if strict_cleanup:
+                    # post_proc por párrafo: el vaciado de tags es local a cada <p>
+                    started = time.perf_counter()
+                    p = post_proc(p)
+                    if profile is not None:
+                        profile.add('cleanup', time.perf_counter() - started, len(p))
+                yield p
+    yield '</body>'
+    yield '</html>'
+
+
+def convert_qtf_file(input_path: str, output_path: str, chunk_size=CHUNK_SIZE, strict_cleanup=False,
+                     workers=None, profile=None, progress_callback=None, cancel=None, css_classes=False,
+                     minify=False, compress=None, texts=None) -> str:
+    """
+    Convierte `input_path` en streaming escribiendo directamente en `output_path`.
+    El progreso sale de los bytes ya leídos del fichero, con la resolución
+    de un bloque de lectura. Con `cancel` (threading.Event) se puede cancelar
+    entre párrafos (ConversionCancelled). Con css_classes el cuerpo pasa por
+    un temporal en disco (html_body_writer) hasta tener el <style> completo.
+    minify y compress se aplican al escribir (ver open_output). Con `texts`
+    se recoge el texto de cada párrafo (ver render_paragraphs).
+    """
+    sheet = StyleSheet() if css_classes else None
+
+    def header():
+        # sin sheet la cabecera ya sale de iter_qtf_html
+        if sheet is None:
+            return ''
+        return '\n'.join(html_header(sheet.default_font, sheet.default_size, sheet)) + '\n'
+
+    io_log.info("Streaming [Started at> %s | Input> %s]", time_now(), input_path)
+    with open(input_path, encoding='utf-8') as src, open_output(output_path, minify, compress) as dst, \
+            html_body_writer(dst, header, spool=sheet is not None) as out:
+        progress = None
+        if progress_callback or cancel:
+            progress = ProgressReporter(progress_callback, os.fstat(src.fileno()).st_size,
+                                        position=src.buffer.tell, cancel=cancel)
+        first = True
+        write_time = 0.0
+        for piece in iter_qtf_html(src, chunk_size=chunk_size, strict_cleanup=strict_cleanup, source=input_path,
+                                   workers=workers, profile=profile, sheet=sheet, texts=texts):
+            started = time.perf_counter()
+            if not first:
+                out.write('\n')
+            out.write(piece)
+            first = False
+            write_time += time.perf_counter() - started
+            if progress:
+                progress.poll()
+    if progress:
+        progress.finish()
+    if profile is not None:
+        # En streaming la lectura va dentro de 'scan'
+        profile.add('write', write_time, os.path.getsize(output_path))
+    io_log.info("Streaming Done.")
+    return output_path
+
+
+@contextmanager
+def atomic_open(path: str, mode='w', buffering=OUTPUT_BUFFER):
+    """
+    Abre <path>.<pid>.tmp para escribir y al cerrar sin errores lo renombra a
+    `path`: quien lea `path` (p. ej. comp/cache) nunca ve un fichero a medias.
+    Si algo falla el temporal se borra y `path` queda como estaba. El
+    temporal lleva también el hilo, por si dos hilos escriben la misma ruta.
+    """
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    encoding = None if 'b' in mode else 'utf-8'
+    try:
+        with open(tmp, mode, buffering=buffering, encoding=encoding) as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+# Espacios que HTML colapsa (no incluye &nbsp; / U+00A0, que sí se ve) y
+# tags de bloque (o <br/>), alrededor de los cuales no se muestran. Cada
+# expresión empieza por un literal para que re salte rápido lo que no casa
+HTML_SPACES = ' \t\n\r\f'
+BLOCK_TAG = r'<(?:!DOCTYPE|/?(?:html|head|body|meta|style|p|br)\b)'
+BLOCK_TAG_RE = re.compile(BLOCK_TAG)
+MINIFY_SPACES_RE = re.compile(' {2,}')
+MINIFY_BEFORE_BLOCK_RE = re.compile(f' (?={BLOCK_TAG})')
+MINIFY_AFTER_BLOCK_RE = re.compile(f'({BLOCK_TAG}[^>]*>) ')
+# Dentro de style="...", el espacio tras cada ';'. El texto va escapado
+# (sin '"' ni '<'), así que solo un atributo llega a '"' sin pasar por '<'
+MINIFY_STYLE_RE = re.compile('; (?=[-a-zA-Z]+:[^"<>]*")')
+
+
+class HtmlMinifier:
+    """
+    Quita los espacios del HTML que no cambian lo que se ve: los que rodean
+    a los tags de bloque desaparecen, el resto de secuencias se reduce a un
+    espacio y los style="..." pierden los espacios entre declaraciones.
+    feed() acepta el documento en trozos cortados en cualquier punto: lo
+    que sigue al último '>' se retiene hasta el trozo siguiente.
+    """
+
+    def __init__(self):
+        self.carry = ''
+        self.after_block = True     # el documento empieza como tras un bloque
+
+    def feed(self, text: str, final=False) -> str:
+        data = self.carry + text
+        cut = len(data) if final else data.rfind('>') + 1
+        self.carry = data[cut:]
+        data = data[:cut]
+        if self.after_block:
+            data = data.lstrip(HTML_SPACES)
+        if not data:
+            return ''
+        for space in '\n\t\r\f':
+            if space in data:
+                data = data.replace(space, ' ')
+        if '  ' in data:
+            data = MINIFY_SPACES_RE.sub(' ', data)
+        data = MINIFY_AFTER_BLOCK_RE.sub(r'\1', MINIFY_BEFORE_BLOCK_RE.sub('', data))
+        # el ';' final de un style="..." tampoco hace falta
+        data = MINIFY_STYLE_RE.sub(';', data).replace(';"', '"')
+        if final:
+            return data.rstrip(' ')
+        self.after_block = BLOCK_TAG_RE.match(data, data.rfind('<')) is not None
+        return data
+
+
+def minify_html(html_text: str) -> str:
+    return HtmlMinifier().feed(html_text, final=True)
+
+
+def _open_gzip(raw, level: int):
+    # mtime=0: la misma salida da siempre los mismos bytes (ETag estable)
+    return gzip.GzipFile(filename='', mode='wb', compresslevel=level, fileobj=raw, mtime=0)
+
+
+def _open_zstd(raw, level: int):
+    import zstandard  # dependencia opcional, ver zstd_available()
+    return zstandard.ZstdCompressor(level=level).stream_writer(raw, closefd=False)
+
+
+# Variantes precomprimidas: extensión -> (abrir compresor, nivel por defecto, niveles válidos)
+COMPRESSORS = {
+    'gz': (_open_gzip, 6, range(0, 10)),
+    'zst': (_open_zstd, 3, range(1, 23)),
+}
+
+
+def zstd_available() -> bool:
+    return importlib.util.find_spec('zstandard') is not None
+
+
+def check_compress(compress) -> dict:
+    """Valida `compress` ({extensión: nivel}) y lo devuelve; ValueError si no es válido."""
+    if compress and not isinstance(compress, dict):
+        raise ValueError('compress must map an extension (gz, zst) to a level')
+    for ext, level in (compress or {}).items():
+        if ext not in COMPRESSORS:
+            raise ValueError(f'unknown compression: {ext} (choose from {", ".join(COMPRESSORS)})')
+        levels = COMPRESSORS[ext][2]
+        if not isinstance(level, int) or level not in levels:
+            raise ValueError(f'{ext} level must be between {levels[0]} and {levels[-1]}')
+        if ext == 'zst' and not zstd_available():
+            raise ValueError('zst compression needs the zstandard module (pip install zstandard)')
+    return compress
+
+
+class OutputWriter:
+    """
+    Escritor de open_output: acumula lo escrito, lo pasa por HtmlMinifier si
+    se pide y reparte los mismos bytes UTF-8 entre el .html y sus variantes
+    comprimidas, que se comprimen según se genera el documento.
+    """
+
+    def __init__(self, sinks, minify=False):
+        self.sinks = sinks
+        self.minifier = HtmlMinifier() if minify else None
+        self.pending = []
+        self.size = 0
+
+    def write(self, text: str) -> int:
+        self.pending.append(text)
+        self.size += len(text)
+        if self.size >= OUTPUT_BUFFER:
+            self.flush()
+        return len(text)
+
+    def flush(self, final=False):
+        text = ''.join(self.pending)
+        self.pending.clear()
+        self.size = 0
+        if self.minifier is not None:
+            text = self.minifier.feed(text, final)
+        if text:
+            data = text.encode('utf-8')
+            for sink in self.sinks:
+                sink.write(data)
+
+
+@contextmanager
+def open_output(path: str, minify=False, compress=None):
+    """
+    atomic_open(path) para el HTML de salida. Con minify se quitan los
+    espacios sobrantes (HtmlMinifier) y con `compress` ({'gz': nivel,
+    'zst': nivel}) se escriben además <path>.gz y <path>.zst en la misma
+    pasada. Cada fichero se renombra al terminar bien, el .html el último;
+    si algo falla no se toca ninguno. Las variantes no pedidas que queden de
+    una conversión anterior se borran para no servirlas desactualizadas.
+    """
+    compress = compress or {}
+    if not minify and not compress:
+        with atomic_open(path) as f:
+            yield f
+    else:
+        with ExitStack() as stack:
+            sinks = [stack.enter_context(atomic_open(path, 'wb'))]
+            for ext, level in compress.items():
+                raw = stack.enter_context(atomic_open(f'{path}.{ext}', 'wb'))
+                sinks.append(stack.enter_context(COMPRESSORS[ext][0](raw, level)))
+            out = OutputWriter(sinks, minify)
+            yield out
+            out.flush(final=True)
+    remove_variants(path, keep=compress)
+
+
+def remove_variants(path: str, keep=()):
+    """Borra <path>.gz / <path>.zst salvo las extensiones de `keep`."""
+    for ext in COMPRESSORS:
+        if ext not in keep and os.path.exists(f'{path}.{ext}'):
+            os.remove(f'{path}.{ext}')
+
+
+@contextmanager
+def map_file(path: str):
+    """mmap de solo lectura de `path` (b'' si está vacío: mmap no admite tamaño 0)."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+HEADER_RE_B = re.compile(rb'(Font|Size)=')
+# Los mismos separadores de línea que reconoce str.splitlines(), y en UTF-8
+LINE_BREAKS = frozenset('\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029')
+LINE_BREAK_RE_B = re.compile(rb'[\n\r\x0b\x0c\x1c\x1d\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9]')
+
+
+def read_header_bytes(buf):
+    """
+    (default_font, default_size) de los bytes de un documento, con el mismo
+    criterio que parse_qtf: una línea de str.splitlines() que, sin espacios
+    en los extremos, empieza por Font= o Size=. Se buscan las claves y solo
+    para cada aparición se mira hacia atrás (solo espacios hasta un salto de
+    línea o el inicio) y hacia delante (el valor llega al siguiente salto).
+    """
+    default_font = None
+    default_size = None
+    line_end = -1
+    for m in HEADER_RE_B.finditer(buf):
+        start = m.start()
+        # Espacios hasta el inicio de la línea: se decodifica una ventana que
+        # se amplía mientras sea toda espacios (un corte a mitad de carácter
+        # solo puede quedar al principio, donde errors='ignore' lo descarta)
+        window = 64
+        while True:
+            before = buf[max(0, start - window):start].decode('utf-8', errors='ignore')
+            text = before.rstrip()
+            if text or window >= start:
+                break
+            window *= 4
+        if text and not any(c in LINE_BREAKS for c in before[len(text):]):
+            continue
+        if line_end < m.end():
+            brk = LINE_BREAK_RE_B.search(buf, m.end())
+            line_end = brk.start() if brk else len(buf)
+        value = buf[m.end():line_end].decode('utf-8').rstrip()
+        if m.group(1) == b'Font':
+            default_font = value
+        else:
+            default_size = value
+    return default_font, default_size
+
+
+def check_utf8(buf, chunk_size=CHUNK_SIZE):
+    """Valida `buf` como UTF-8 por bloques, sin decodificarlo entero en memoria."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for pos in range(0, len(buf), chunk_size):
+        decoder.decode(buf[pos:pos + chunk_size])
+    decoder.decode(b'', final=True)
+
+
+def normalize_block(block: str) -> str:
+    """
+    Deja un párrafo leído en crudo igual que si saliera de parse_qtf, que
+    quita los espacios de los extremos de cada línea: la primera línea solo
+    pierde los del final, la última los del inicio y las de en medio ambos.
+    """
+    lines = block.splitlines()
+    if block and block[-1] in LINE_BREAKS:
+        lines.append('')  # termina en salto de línea
+    if len(lines) <= 1:
+        return block
+    lines[0] = lines[0].rstrip()
+    lines[-1] = lines[-1].lstrip()
+    for i in range(1, len(lines) - 1):
+        lines[i] = lines[i].strip()
+    return '\n'.join(lines)
+
+
+def parse_qtf_buffer(buf, offsets=None, diagnostics=None):
+    """
+    Como parse_qtf, pero sobre los bytes de un documento (normalmente un
+    mmap): devuelve (default_font, default_size, iterador de (align, block)).
+    [Body] y cada [P] se localizan por posición en `buf` (scan_qtf_body) y
+    solo se copia y decodifica el párrafo en curso. Si se pasa la deque
+    `offsets`, se añade a ella la posición final de cada párrafo producido.
+    """
+    default_font, default_size = read_header_bytes(buf)
+    if diagnostics is None:
+        diagnostics = QtfDiagnostics(source='<qtf>')
+
+    def paragraphs():
+        for align, block, end in scan_qtf_body(buf, diagnostics):
+            if align is not None:
+                align = normalize_block(align.decode('utf-8'))
+            if offsets is not None:
+                offsets.append(end)
+            yield align, normalize_block(block.decode('utf-8'))
+
+    return default_font, default_size, paragraphs()
+
+
+def convert_mapped_file(input_path: str, output_path: str, progress_callback=None, strict_cleanup=False,
+                        workers=None, profile=None, cancel=None, css_classes=False, minify=False,
+                        compress=None, texts=None) -> str:
+    """
+    Convierte `input_path` leyéndolo con mmap y escribiendo cada párrafo en
+    cuanto se renderiza, con un escritor con búfer y rename atómico al final.
+    En memoria solo están los lotes en vuelo, no el texto ni el HTML completos.
+
+    La salida es la misma que la de convert_qtf_to_html. El progreso se
+    calcula por bytes consumidos de la entrada. Con strict_cleanup el HTML
+    sí se materializa, porque post_proc necesita el documento entero.
+    Con `cancel` (threading.Event) se puede cancelar entre párrafos. Con
+    css_classes el cuerpo pasa por un temporal (html_body_writer), porque la
+    cabecera lleva el <style> con las clases de todo el documento. minify y
+    compress se aplican al escribir (ver open_output). Con `texts` se recoge
+    el texto de cada párrafo (ver render_paragraphs).
+    """
+    io_log.info("Mapped conversion [Started at> %s | Input> %s]", time_now(), input_path)
+    with map_file(input_path) as buf:
+        started = time.perf_counter()
+        check_utf8(buf)
+        offsets = deque()
+        default_font, default_size, paragraphs = parse_qtf_buffer(buf, offsets, QtfDiagnostics(input_path))
+        progress = None
+        if progress_callback or cancel:
+            progress = ProgressReporter(progress_callback, len(buf), cancel=cancel)
+        sheet = StyleSheet() if css_classes else None
+        if profile is not None:
+            profile.documents += 1
+            profile.add('header', time.perf_counter() - started, len(buf))
+            rendered_iter = profile.render(paragraphs, workers=workers, scan=True, texts=texts)
+        else:
+            rendered_iter = render_paragraphs(paragraphs, workers=workers, texts=texts)
+        try:
+            if strict_cleanup:
+                html = []
+                for rendered in rendered_iter:
+                    html.extend(map(sheet.convert, rendered) if sheet else rendered)
+                    end = offsets.popleft()
+                    if progress:
+                        progress.update(end)
+                html[:0] = html_header(default_font, default_size, sheet)
+                html.extend(['</body>', '</html>'])
+                started = time.perf_counter()
+                html_result = post_proc('\n'.join(html))
+                if profile is not None:
+                    profile.add('cleanup', time.perf_counter() - started, len(html_result))
+                started = time.perf_counter()
+                with open_output(output_path, minify, compress) as dst:
+                    dst.write(html_result)
+                write_time = time.perf_counter() - started
+            else:
+                write_time = 0.0
+                with open_output(output_path, minify, compress) as dst, \
+                        html_body_writer(dst, lambda: '\n'.join(html_header(default_font, default_size, sheet)),
+                                         spool=sheet is not None) as out:
+                    for rendered in rendered_iter:
+                        end = offsets.popleft()
+                        if progress:
+                            progress.update(end)
+                        if not rendered:
+                            continue
+                        started = time.perf_counter()
+                        out.write('\n')
+                        out.write('\n'.join(map(sheet.convert, rendered) if sheet else rendered))
+                        write_time += time.perf_counter() - started
+                    out.write('\n</body>\n</html>')
+        finally:
+            # Si se cancela o falla a mitad, los generadores suspendidos aún
+            # tienen exportado el mmap: se cierran antes de que map_file lo cierre
+            rendered_iter.close()
+            paragraphs.close()
+    if progress:
+        progress.finish()
+    if profile is not None:
+        profile.add('write', write_time, os.path.getsize(output_path))
+    io_log.info("Mapped conversion Done.")
+    return output_path
+
+
+# Mapeo semántico
+SEM = {'bold': 'strong', 'italic': 'em', 'underline': 'u', 'strikeout': 'del'}
+# (nombre, markup) de apertura de cada semántico
+SEM_OPEN = {tag: (name, f'<{name}>') for tag, name in SEM.items()}
+# Cierre de cada tag HTML que puede abrir process_block
+CLOSE_TAG = {name: f'</{name}>' for name in ('span', *SEM.values())}
+
+# Tags QTF (<def>, <bold>, </bold>, <font=...>, etc.); el texto es lo que queda entre ellos
+TOKEN_RE = re.compile(r'(?:<def>)|(?:</?[A-Za-z]+(?:=[^>]+)?>)', re.IGNORECASE)
+
+# Clasificación de tags para process_block
+TAG_DEF, TAG_OPEN, TAG_CLOSE, TAG_STYLE, TAG_OTHER = range(5)
+# Posición de cada propiedad en la clave de estilo (font, size, color)
+STYLE_INDEX = {'font': 0, 'size': 1, 'color': 2}
+NO_STYLE = (None, None, None)
+# Entradas de cada caché compartida entre párrafos (tags, spans, reaperturas)
+STYLE_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=STYLE_CACHE_SIZE)
+def classify_tag(raw: str) -> tuple:
+    """
+    (acción, argumento) de un tag tal y como aparece en el texto:
+    <def> -> (TAG_DEF, None), <bold> -> (TAG_OPEN, 'bold'),
+    </x> -> (TAG_CLOSE, 'x'), <font=Arial> -> (TAG_STYLE, (0, 'arial')).
+    """
+    tag = raw[1:-1].lower()  # quita < y >
+    if tag == 'def':
+        return TAG_DEF, None
+    if tag in SEM:
+        return TAG_OPEN, tag
+    if tag.startswith('/'):
+        return TAG_CLOSE, tag[1:]
+    if '=' in tag:
+        key, val = tag.split('=', 1)
+        if key in STYLE_INDEX:
+            return TAG_STYLE, (STYLE_INDEX[key], sys.intern(val))
+    return TAG_OTHER, None
+
+
+def span_open_tag(font, size, color) -> str:
+    """Devuelve el <span> de estilo para la combinación dada ('' si no hay estilo)."""
+    css = []
+    if font:
+        css.append(f'font-family:{font};')
+    if size:
+        css.append(f'font-size:{size};')
+    if color:
+        css.append(f'color:{color};')
+    if css:
+        return f'<span style="{" ".join(css)}">'
+    return ''
+
+
+@lru_cache(maxsize=STYLE_CACHE_SIZE)
+def style_span(style: tuple) -> str:
+    """span_open_tag memoizado por clave de estilo (font, size, color)."""
+    return span_open_tag(*style)
+
+
+@lru_cache(maxsize=STYLE_CACHE_SIZE)
+def restyle(style: tuple, index: int, val: str) -> tuple:
+    """(clave nueva, su <span>) al cambiar la propiedad `index` de `style` a `val`."""
+    style = style[:index] + (val,) + style[index + 1:]
+    return style, style_span(style)
+
+
+@lru_cache(maxsize=STYLE_CACHE_SIZE)
+def reopen_sequence(semantic: tuple) -> tuple:
+    """(nombre, markup) de cada semántico de `semantic`, en el orden en que se reabren."""
+    return tuple(SEM_OPEN[tag] for tag in semantic)
+
+
+# Eventos de qtf_events
+EV_TEXT, EV_DEF, EV_OPEN, EV_CLOSE, EV_STYLE = range(5)
+
+
+def qtf_events(content: str):
+    """
+    Tokenizador de una línea QTF, común a process_block y a los emisores de
+    q2h_emit: TOKEN_RE.finditer separa texto y tags y aquí se aplican las
+    reglas de estado, así que todos ven el mismo documento.
+
+    Produce (evento, arg, semánticos, estilo, posición), con semánticos (la
+    pila 'bold', 'italic'...) y estilo (font, size, color) ya actualizados:
+
+        EV_TEXT   arg = el texto
+        EV_DEF    <DEF> dentro de la línea; arg = semántico del tope que
+                  cierra (o None)
+        EV_OPEN   arg = semántico que se abre (si no estaba ya abierto)
+        EV_CLOSE  arg = semántico que se cierra (solo si está en el tope)
+        EV_STYLE  <font=>/<size=>/<color=> que cambia el estilo
+
+    Los tags que no cambian nada (desconocidos, un cierre que no es el tope,
+    un estilo igual al actual) no producen evento.
+    """
+    classify = classify_tag
+    semantic = ()
+    style = NO_STYLE
+    pos = 0
+
+    for m in TOKEN_RE.finditer(content):
+        start = m.start()
+        if start > pos:
+            yield EV_TEXT, content[pos:start], semantic, style, pos
+        pos = m.end()
+
+        action, arg = classify(m.group())
+        if action == TAG_DEF:
+            # cierra solo el semántico del tope
+            closed = semantic[-1] if semantic else None
+            semantic = semantic[:-1]
+            yield EV_DEF, closed, semantic, style, start
+        elif action == TAG_OPEN:
+            if arg not in semantic:
+                semantic += (arg,)
+                yield EV_OPEN, arg, semantic, style, start
+        elif action == TAG_CLOSE:
+            if semantic and semantic[-1] == arg:
+                semantic = semantic[:-1]
+                yield EV_CLOSE, arg, semantic, style, start
+        elif action == TAG_STYLE:
+            index, val = arg
+            if style[index] != val:
+                style = restyle(style, index, val)[0]
+                yield EV_STYLE, index, semantic, style, start
+        # ignorar cualquier otro
+
+    if pos < len(content):
+        yield EV_TEXT, content[pos:], semantic, style, pos
+
+
+def render_events(events) -> str:
+    """
+    Convierte a HTML los eventos de una línea (qtf_events) en una sola pasada;
+    la salida se acumula en una lista.
+
+    Los tags abiertos se escriben de forma diferida: solo llegan a la salida
+    cuando dentro de ellos aparece texto no vacío, de modo que los
+    span/strong/em/u/del vacíos se descartan sin pasar por post_proc. Los
+    cierres siguen la misma regla que html.parser (cierran hasta el tag
+    abierto más reciente con ese nombre), así que el HTML queda bien anidado.
+
+    El estado de estilo es una tupla (font, size, color) y la pila semántica
+    otra tupla, así que abrir un <span> o reabrir los semánticos tras <def>
+    son búsquedas en cachés compartidas entre párrafos.
+    """
+    debug = render_log.isEnabledFor(logging.DEBUG)
+    dbg = render_log.debug
+    reopen = reopen_sequence
+
+    semantic = ()
+    span_open = False
+
+    out = []
+    escape = html.escape
+    stack = []      # tags HTML abiertos, del más externo al más interno
+    marks = []      # posición en `pending` donde empieza cada tag de `stack`
+    pending = []    # salida retenida de los tags aún sin texto
+    flushed = 0     # cuántos tags de `stack` ya se escribieron en `out`
+
+    def open_tag(name, markup):
+        stack.append(name)
+        marks.append(len(pending))
+        pending.append(markup)
+
+    def close_tag(name):
+        nonlocal flushed
+        if name not in stack:
+            return
+        while True:
+            top = stack.pop()
+            mark = marks.pop()
+            if len(stack) < flushed:
+                flushed = len(stack)
+                out.append(CLOSE_TAG[top])
+            else:
+                # nunca recibió texto: se descarta junto con su contenido
+                del pending[mark:]
+                if debug:
+                    dbg("Dropping empty <%s>", top)
+            if top == name:
+                return
+
+    def write(markup, blank):
+        nonlocal flushed
+        if flushed == len(stack):
+            out.append(markup)
+        elif blank:
+            pending.append(markup)
+        else:
+            out.extend(pending)
+            pending.clear()
+            flushed = len(stack)
+            out.append(markup)
+
+    for event, arg, semantic, style, start in events:
+        if event == EV_TEXT:
+            write(escape(arg), not arg.strip())
+
+        elif event == EV_DEF:
+            # cerrar semánticos (solo el tope) y span
+            if arg is not None:
+                close_tag(SEM[arg])
+            if span_open:
+                close_tag('span')
+            write('<br/>', True)
+            span = style_span(style)
+            span_open = bool(span)
+            if span:
+                open_tag('span', span)
+            if debug:
+                dbg("<def> at %d, reopening %s", start, semantic)
+            # reabrir semánticos en orden
+            for name, markup in reopen(semantic):
+                open_tag(name, markup)
+
+        elif event == EV_OPEN:
+            open_tag(*SEM_OPEN[arg])
+            if debug:
+                dbg("Opening <%s> at %d", arg, start)
+
+        elif event == EV_CLOSE:
+            close_tag(SEM[arg])
+            if debug:
+                dbg("Closing <%s> at %d", arg, start)
+
+        else:
+            if debug:
+                dbg("Style %s=%s at %d, reopening span", ('font', 'size', 'color')[arg], style[arg], start)
+            if span_open:
+                close_tag('span')
+            span = style_span(style)
+            span_open = bool(span)
+            if span:
+                open_tag('span', span)
+            # reabrir semánticos
+            for name, markup in reopen(semantic):
+                open_tag(name, markup)
+
+    # cierre final
+    if span_open:
+        close_tag('span')
+    for tag in reversed(semantic):
+        close_tag(SEM[tag])
+    # lo que quede abierto (reaperturas huérfanas) se cierra como haría </p>
+    while stack:
+        close_tag(stack[-1])
+
+    return ''.join(out)
+
+
+def process_block(content: str) -> str:
+    """Convierte una línea QTF a HTML (render_events sobre qtf_events)."""
+    return render_events(qtf_events(content))
+
+
+def output_path_for(input_path: str, folder: str, unique=False, extension='html') -> str:
+    """
+    Ruta de salida `folder`/<nombre>.html (o .`extension`). Con unique=True se
+    añade un sufijo derivado de la ruta completa, para entradas distintas con
+    el mismo nombre.
+    """
+    base = os.path.splitext(os.path.basename(input_path))[0]
+    if unique:
+        digest = hashlib.sha1(os.path.abspath(input_path).encode('utf-8')).hexdigest()[:8]
+        base = f'{base}-{digest}'
+    return os.path.join(folder, f'{base}.{extension}')
+
+
+# Qué entrada es dueña de cada fichero de salida en una carpeta
+OUTPUT_SOURCES = '.q2h-sources.json'
+_output_sources_lock = threading.Lock()
+# ruta del registro -> (firma (mtime, tamaño), {nombre de salida: entrada})
+_output_owners = {}
+
+
+def _read_owners(record: str) -> dict:
+    """
+    El registro de dueños de `record`, leído de disco solo si cambió desde la
+    última vez (otro proceso pudo escribirlo); si no, el que está en memoria.
+    """
+    try:
+        st = os.stat(record)
+    except OSError:
+        return _output_owners.setdefault(record, (None, {}))[1]
+    signature = (st.st_mtime_ns, st.st_size)
+    cached = _output_owners.get(record)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    try:
+        with open(record, encoding='utf-8') as f:
+            owners = json.load(f)
+    except (OSError, ValueError):
+        owners = {}
+    _output_owners[record] = (signature, owners)
+    return owners
+
+
+def claim_output_paths(paths, folder: str, extension='html') -> list:
+    """
+    output_path_for de cada ruta de `paths` sin pisar la salida de otra
+    entrada con el mismo nombre. `folder`/.q2h-sources.json apunta de qué
+    entrada es cada fichero de salida: su dueño (si sigue existiendo) conserva
+    el nombre sin sufijo y cualquier otra entrada recibe el de unique=True.
+    Un nombre sin dueño repetido dentro de `paths` tampoco se lo queda nadie
+    (todos con sufijo, como siempre en un lote); si no se repite, se apunta a
+    su entrada. Los nombres se comparan con os.path.normcase, como los ve
+    Windows. El registro se guarda en memoria y solo se reescribe cuando
+    alguien se queda un nombre nuevo.
+    """
+    names = [os.path.normcase(os.path.basename(output_path_for(p, folder, extension=extension))) for p in paths]
+    sources = [os.path.normcase(os.path.abspath(p)) for p in paths]
+    counts = Counter(names)
+    record = os.path.join(folder, OUTPUT_SOURCES)
+    with _output_sources_lock:
+        owners = _read_owners(record)
+        result = []
+        claimed = {}
+        for path, name, source in zip(paths, names, sources):
+            owner = owners.get(name)
+            if owner is not None and owner != source and not os.path.exists(owner):
+                owner = None    # la entrada que lo tenía ya no existe: el nombre queda libre
+            if owner is None and counts[name] == 1:
+                claimed[name] = owner = source
+            result.append(output_path_for(path, folder, unique=owner != source, extension=extension))
+        if claimed:
+            owners = {**owners, **claimed}
+            os.makedirs(folder, exist_ok=True)
+            with atomic_open(record) as f:
+                json.dump(owners, f, ensure_ascii=False, indent=0)
+            st = os.stat(record)
+            _output_owners[record] = ((st.st_mtime_ns, st.st_size), owners)
+    return result
+
+
+def claim_output_path(input_path: str, folder: str, extension='html') -> str:
+    """claim_output_paths de una sola entrada (GUI, CLI de un fichero, daemon)."""
+    return claim_output_paths([input_path], folder, extension)[0]
+
+
+def convert_file(input_path: str, output_file: str, stream=False, strict_cleanup=False, workers=None,
+                 progress_callback=None, profile=None, cancel=None, css_classes=False, minify=False,
+                 compress=None, texts=None) -> str:
+    """
+    Convierte `input_path` y escribe el HTML en `output_file` (de forma
+    atómica). Por defecto la entrada se lee con mmap (convert_mapped_file);
+    con stream=True se lee por bloques (convert_qtf_file). Si `cancel` se
+    activa, se lanza ConversionCancelled y `output_file` no se toca. Con
+    css_classes los estilos van como clases en un <style> (StyleSheet). Con
+    minify se quitan los espacios sobrantes y con `compress` ({'gz': nivel,
+    'zst': nivel}) se escriben también <output_file>.gz/.zst (open_output).
+    Si se pasa la lista `texts`, se llena con el texto de cada [P] para el
+    índice de búsqueda (ver render_paragraphs).
+    """
+    if stream:
+        return convert_qtf_file(input_path, output_file, strict_cleanup=strict_cleanup, workers=workers,
+                                profile=profile, progress_callback=progress_callback, cancel=cancel,
+                                css_classes=css_classes, minify=minify, compress=compress, texts=texts)
+    return convert_mapped_file(input_path, output_file, progress_callback=progress_callback,
+                               strict_cleanup=strict_cleanup, workers=workers, profile=profile, cancel=cancel,
+                               css_classes=css_classes, minify=minify, compress=compress, texts=texts)
+
+
+def convert_path(input_path: str, folder: str, stream=False, strict_cleanup=False, workers=None,
+                 profile=None, css_classes=False, minify=False, compress=None, texts=None) -> str:
+    """Convierte un fichero .qtf a `folder`/<nombre>.html (claim_output_path) y devuelve la ruta de salida."""
+    return convert_file(input_path, claim_output_path(input_path, folder), stream=stream,
+                        strict_cleanup=strict_cleanup, workers=workers, profile=profile, css_classes=css_classes,
+                        minify=minify, compress=compress, texts=texts)
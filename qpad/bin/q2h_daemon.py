@@ -0,0 +1,418 @@
+"""
+Conversor residente (q2h.py --serve).
+
+Mantiene el intérprete, los imports y un pool de procesos calientes y atiende
+peticiones por un socket Unix o TCP en localhost. El protocolo es JSON por
+líneas: cada línea es una petición y cada respuesta lleva el mismo "id".
+
+    {"id": 1, "op": "convert", "qtf": "[Doc]..."}          -> {"id": 1, "ok": true, "html": "..."}
+    {"id": 2, "op": "convert", "path": "doc.qtf"}           -> {"id": 2, "ok": true, "output": ".../doc.html"}
+    {"id": 3, "op": "convert", "path": "doc.qtf", "html": true}   (devuelve también el HTML)
+    {"id": 4, "op": "stats"}                                -> {"id": 4, "ok": true, "stats": {...}}
+    {"id": 5, "op": "ping"}
+
+Opciones de convert: "strict_cleanup", "css_classes", "minify", y solo con
+"path": "output" y "compress" (p. ej. {"gz": 9, "zst": 3}, ver open_output).
+"output" tiene que quedar dentro de la carpeta de salida del servidor (las
+rutas relativas se toman desde ella): cualquier otra se rechaza, para que
+un cliente no pueda escribir donde quiera con los permisos del daemon. El
+socket Unix se crea solo para el usuario que arranca el servidor.
+Los errores se devuelven como {"ok": false, "error": "..."} sin cerrar la
+conexión. Las peticiones de una misma conexión se atienden en paralelo, así
+que las respuestas pueden llegar en otro orden.
+
+Los payloads convertidos se guardan en una caché LRU en memoria; las rutas
+pasan por comp/cache/store (ConversionCache) igual que en el CLI. El bucle asyncio
+es el único escritor del índice de la caché; los workers solo convierten.
+El índice se guarda (y se expulsa por LRU) SAVE_DELAY segundos después de
+la última conversión, no solo al parar: un daemon de larga vida no crece
+sin límite y si muere de golpe pierde como mucho esos segundos.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import signal
+import socket
+import sys
+import time
+from collections import OrderedDict, deque
+
+from q2h_cache import default_output_dir, publish
+from q2h_core import (
+    CONVERTER_VERSION, check_compress, claim_output_path, convert_file, convert_qtf_to_html, init_worker_logging,
+    log_levels
+)
+
+log = logging.getLogger('q2h.daemon')
+
+DEFAULT_PORT = 8765
+MAX_REQUEST = 64 * 1024 * 1024       # tamaño máximo de una línea de petición
+MEMORY_CACHE_BYTES = 64 * 1024 * 1024
+LATENCY_WINDOW = 1000                # latencias recientes para los percentiles
+SAVE_DELAY = 2.0                     # segundos sin conversiones antes de guardar el índice
+
+
+def default_socket_path() -> str:
+    return os.path.join(os.getcwd(), 'comp', 'q2h.sock')
+
+
+def percentile(values, pct: float):
+    """Percentil `pct` (0-100) por el método del rango más cercano; None si no hay datos."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class MemoryCache:
+    """Caché LRU de HTML en memoria para los payloads, acotada en caracteres."""
+
+    def __init__(self, max_size=MEMORY_CACHE_BYTES):
+        self.max_size = max_size
+        self.size = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(qtf: str, **options) -> str:
+        h = hashlib.sha256(qtf.encode('utf-8'))
+        h.update(b'\0' + CONVERTER_VERSION.encode('ascii'))
+        h.update(b'\0' + json.dumps(options, sort_keys=True).encode('utf-8'))
+        return h.hexdigest()
+
+    def get(self, key: str):
+        html = self.entries.get(key)
+        if html is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return html
+
+    def put(self, key: str, html: str):
+        if len(html) > self.max_size:
+            return
+        if key in self.entries:
+            # misma clave, mismo HTML: solo cuenta como uso reciente
+            self.entries.move_to_end(key)
+            return
+        self.entries[key] = html
+        self.size += len(html)
+        while self.size > self.max_size:
+            _, old = self.entries.popitem(last=False)
+            self.size -= len(old)
+
+
+class ConversionServer:
+    def __init__(self, workers=1, cache=None, folder=None, memory_cache_bytes=MEMORY_CACHE_BYTES):
+        self.workers = max(workers, 1)
+        self.cache = cache
+        self.folder = folder or default_output_dir()
+        os.makedirs(self.folder, exist_ok=True)
+        self.memory = MemoryCache(memory_cache_bytes)
+        self.pool = None
+        # Como mucho 2 trabajos por worker en el pool; el resto espera en cola
+        self.slots = asyncio.Semaphore(2 * self.workers)
+        self.queued = 0
+        self.running = 0
+        self.requests = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.inflight = {}      # clave -> tarea de la conversión en curso
+        self.save_handle = None
+        self.started = time.time()
+
+    def start_pool(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker_logging,
+                                        initargs=(log_levels(),))
+        # Arrancar los procesos ya, no con la primera petición
+        for _ in range(self.workers):
+            self.pool.submit(int)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+        if self.save_handle is not None:
+            self.save_handle.cancel()
+            self.save_handle = None
+        if self.cache is not None:
+            self.cache.save()
+
+    def schedule_save(self):
+        """Guarda el índice (altas y accesos) SAVE_DELAY segundos después de la última conversión."""
+        if self.save_handle is not None:
+            self.save_handle.cancel()
+        self.save_handle = asyncio.get_running_loop().call_later(SAVE_DELAY, self.save_cache)
+
+    def save_cache(self):
+        self.save_handle = None
+        try:
+            self.cache.save()
+        except OSError as e:
+            log.warning("Could not save the cache index: %s", e)
+
+    def output_path(self, path: str, output) -> str:
+        """Ruta de salida de una petición, siempre dentro de self.folder."""
+        if not output:
+            return claim_output_path(path, self.folder)
+        folder = os.path.realpath(self.folder)
+        target = os.path.realpath(os.path.join(folder, output))
+        if os.path.commonpath([folder, target]) != folder:
+            raise ValueError(f'output must be inside {folder}')
+        return target
+
+    async def run_in_pool(self, func, *args, **kwargs):
+        """Ejecuta `func` en el pool respetando el límite de trabajos en vuelo."""
+        loop = asyncio.get_running_loop()
+        self.queued += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+        try:
+            return await loop.run_in_executor(self.pool, _call, func, args, kwargs)
+        finally:
+            self.running -= 1
+            self.slots.release()
+
+    async def once(self, key: str, make):
+        """Une las peticiones simultáneas con la misma clave en una sola conversión."""
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make())
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def convert_payload(self, request: dict) -> dict:
+        qtf = request['qtf']
+        strict_cleanup = bool(request.get('strict_cleanup'))
+        css_classes = bool(request.get('css_classes'))
+        minify = bool(request.get('minify'))
+        key = MemoryCache.key_for(qtf, strict_cleanup=strict_cleanup, css_classes=css_classes, minify=minify)
+        html = self.memory.get(key)
+        cached = html is not None
+        if not cached:
+            html = await self.once(key, lambda: self.convert_to_memory(key, qtf, strict_cleanup=strict_cleanup,
+                                                                       css_classes=css_classes, minify=minify))
+        return {'html': html, 'cached': cached}
+
+    async def convert_to_memory(self, key: str, qtf: str, **options) -> str:
+        """Convierte un payload y lo guarda en self.memory; corre una vez por clave aunque esperen varios (once)."""
+        html = await self.run_in_pool(convert_qtf_to_html, qtf, **options)
+        self.memory.put(key, html)
+        return html
+
+    async def convert_path(self, request: dict) -> dict:
+        path = request['path']
+        options = dict(strict_cleanup=bool(request.get('strict_cleanup')),
+                       css_classes=bool(request.get('css_classes')), minify=bool(request.get('minify')),
+                       compress=check_compress(request.get('compress')) or None)
+        # claim_output_path lee y escribe el registro de dueños: fuera del bucle
+        output_file = await asyncio.to_thread(self.output_path, path, request.get('output'))
+        cached = False
+        if self.cache is None:
+            await self.run_in_pool(convert_file, path, output_file, **options)
+        else:
+            key = await asyncio.to_thread(self.cache.key_for, path, stream=False, **options)
+            cached_path = self.cache.lookup(key)
+            cached = cached_path is not None
+            if not cached:
+                cached_path = await self.once(key, lambda: self.convert_to_cache(key, path, options))
+            await asyncio.to_thread(publish, cached_path, output_file)
+            self.schedule_save()
+        response = {'output': output_file, 'cached': cached}
+        if request.get('html'):
+            response['html'] = await asyncio.to_thread(_read_text, output_file)
+        return response
+
+    async def convert_to_cache(self, key: str, path: str, options: dict) -> str:
+        tmp = self.cache.temp_path(key)
+        try:
+            await self.run_in_pool(convert_file, path, tmp, **options)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return self.cache.store(key, tmp, path)
+
+    def stats(self) -> dict:
+        latencies = list(self.latencies)
+        stats = {
+            'uptime_s': round(time.time() - self.started, 1),
+            'workers': self.workers,
+            'requests': self.requests,
+            'errors': self.errors,
+            'queue_depth': self.queued,
+            'running': self.running,
+            'latency_ms': {
+                name: (round(value * 1000, 3) if value is not None else None)
+                for name, value in (('p50', percentile(latencies, 50)), ('p90', percentile(latencies, 90)),
+                                    ('p99', percentile(latencies, 99)), ('max', max(latencies, default=None)))
+            },
+            'memory_cache': {
+                'entries': len(self.memory.entries),
+                'size': self.memory.size,
+                'hits': self.memory.hits,
+                'misses': self.memory.misses,
+                'hit_rate': _rate(self.memory.hits, self.memory.misses),
+            },
+        }
+        if self.cache is not None:
+            stats['disk_cache'] = {
+                'entries': len(self.cache.index),
+                'hits': self.cache.hits,
+                'misses': self.cache.misses,
+                'evictions': self.cache.evictions,
+                'hit_rate': _rate(self.cache.hits, self.cache.misses),
+            }
+        return stats
+
+    async def handle_request(self, request) -> dict:
+        if not isinstance(request, dict):
+            raise ValueError('request must be a JSON object')
+        op = request.get('op', 'convert')
+        if op == 'ping':
+            return {'pong': True}
+        if op == 'stats':
+            return {'stats': self.stats()}
+        if op != 'convert':
+            raise ValueError(f'unknown op: {op}')
+        if 'qtf' in request:
+            return await self.convert_payload(request)
+        if 'path' in request:
+            return await self.convert_path(request)
+        raise ValueError("convert needs 'qtf' or 'path'")
+
+    async def answer(self, line: bytes, writer, lock):
+        started = time.perf_counter()
+        request_id = None
+        try:
+            request = json.loads(line)
+            if isinstance(request, dict):
+                request_id = request.get('id')
+            response = {'id': request_id, 'ok': True, **await self.handle_request(request)}
+        except Exception as e:
+            self.errors += 1
+            log.debug("Request %r failed: %s", request_id, e)
+            response = {'id': request_id, 'ok': False, 'error': str(e)}
+        if response.get('ok') and 'stats' not in response and 'pong' not in response:
+            self.requests += 1
+            self.latencies.append(time.perf_counter() - started)
+        async with lock:
+            writer.write(json.dumps(response).encode('utf-8') + b'\n')
+            await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        peer = writer.get_extra_info('peername') or 'unix'
+        log.info("Connection from %s", peer)
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Línea más larga que MAX_REQUEST: no se puede resincronizar
+                    writer.write(b'{"id": null, "ok": false, "error": "request too large"}\n')
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self.answer(line, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            log.info("Connection from %s closed", peer)
+
+    async def serve(self, socket_path=None, port=None, host='127.0.0.1'):
+        """Escucha en `socket_path` (Unix) o en host:port (TCP) hasta que se cancele."""
+        self.start_pool()
+        try:
+            # SIGTERM (p. ej. al parar el servicio) termina igual que Ctrl+C
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except NotImplementedError:
+            pass  # Windows
+        try:
+            if port is None:
+                os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+                if os.path.exists(socket_path):
+                    os.remove(socket_path)  # socket de una ejecución anterior
+                # sin autenticación en el protocolo: solo el dueño puede conectarse
+                umask = os.umask(0o177)
+                try:
+                    server = await asyncio.start_unix_server(self.handle_connection, socket_path,
+                                                             limit=MAX_REQUEST)
+                finally:
+                    os.umask(umask)
+                address = socket_path
+            else:
+                server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_REQUEST)
+                address = f'{host}:{port}'
+            print(f'[QPad-QTF2HTML]: Serving on {address} with {self.workers} workers', file=sys.stderr,
+                  flush=True)
+            async with server:
+                await server.serve_forever()
+        finally:
+            if port is None and socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+            self.close()
+
+
+def _call(func, args, kwargs):
+    """run_in_executor no admite kwargs: se reenvían desde el worker."""
+    return func(*args, **kwargs)
+
+
+def _read_text(path: str) -> str:
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _rate(hits: int, misses: int):
+    total = hits + misses
+    return round(hits / total, 4) if total else None
+
+
+def serve(workers=1, cache=None, folder=None, socket_path=None, port=None):
+    """Punto de entrada de --serve; vuelve al recibir Ctrl+C."""
+    if port is None and not hasattr(socket, 'AF_UNIX'):
+        port = DEFAULT_PORT  # Windows: sin sockets Unix en asyncio
+    if port is None:
+        socket_path = socket_path or default_socket_path()
+    server = ConversionServer(workers=workers, cache=cache, folder=folder)
+    try:
+        asyncio.run(server.serve(socket_path=socket_path, port=port))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    return 0
+
+
+def send_request(request: dict, socket_path=None, port=None, host='127.0.0.1', timeout=None) -> dict:
+    """Cliente síncrono mínimo: envía una petición y devuelve la respuesta."""
+    if port is None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        address = socket_path or default_socket_path()
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        address = (host, port)
+    with sock:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as f:
+            return json.loads(f.readline())
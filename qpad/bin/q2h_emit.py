@@ -0,0 +1,363 @@
+"""
+Formatos de salida del conversor: HTML, texto plano, Markdown y JSON.
+
+Un documento se analiza una sola vez (parse_qtf / parse_qtf_buffer) y cada
+párrafo pasa por todos los emisores pedidos, así que varios formatos salen
+de la misma pasada sobre la entrada:
+
+    documento  -> begin(font, size), paragraph(Paragraph)..., end()
+    Paragraph  -> align, block (QTF crudo) y events: los eventos de
+                  q2h_core.qtf_events de cada línea (<def>), calculados una
+                  vez y compartidos; de ellos salen
+                  html   las <p> de render_events, byte a byte las de
+                         convert_file
+                  lines  una lista de runs por línea
+    run        -> (texto, semánticos, estilo): semánticos es la pila
+                  ('bold', 'italic'...) y estilo la tupla (font, size, color)
+
+Así cada línea se tokeniza una sola vez, con las mismas reglas de estado
+para todos los formatos, y ningún emisor vuelve a leer el QTF ni el HTML.
+"""
+import io
+import json
+import logging
+import re
+import time
+from collections import deque
+from contextlib import ExitStack
+
+from q2h_core import (
+    EV_DEF, EV_TEXT, NO_STYLE, SPACES_RE, ProgressReporter, QtfDiagnostics, StyleSheet, atomic_open, block_lines,
+    check_utf8, html_body_writer, html_header, lines_text, map_file, open_output, parse_qtf, parse_qtf_buffer,
+    post_proc, qtf_events, render_lines, time_now
+)
+
+log = logging.getLogger('q2h.render')
+io_log = logging.getLogger('q2h.io')
+
+STYLE_NAMES = ('font', 'size', 'color')
+
+
+def line_runs(events) -> list:
+    """
+    Runs (texto, semánticos, estilo) de los eventos de una línea
+    (qtf_events). Un <DEF> en otra capitalización es un salto de línea. Los
+    runs consecutivos con el mismo formato se unen.
+    """
+    runs = []
+    for event, arg, semantic, style, _ in events:
+        if event == EV_TEXT:
+            text = arg
+        elif event == EV_DEF:
+            text = '\n'
+        else:
+            continue
+        if runs and runs[-1][1] == semantic and runs[-1][2] == style:
+            runs[-1] = (runs[-1][0] + text, semantic, style)
+        else:
+            runs.append((text, semantic, style))
+    return runs
+
+
+class Paragraph:
+    """Un [P] del documento; events, lines y html se calculan la primera vez que se piden."""
+    __slots__ = ('align', 'block', '_events', '_lines', '_html')
+
+    def __init__(self, align, block: str):
+        self.align = align
+        self.block = block
+        self._events = None
+        self._lines = None
+        self._html = None
+
+    @property
+    def events(self) -> list:
+        """Eventos de qtf_events de cada línea no vacía del bloque."""
+        if self._events is None:
+            self._events = [list(qtf_events(line)) for line in block_lines(self.block)]
+        return self._events
+
+    @property
+    def lines(self) -> list:
+        """Runs de cada línea con texto visible, igual que las <p> que genera render_paragraph."""
+        if self._lines is None:
+            self._lines = []
+            for events in self.events:
+                runs = line_runs(events)
+                if any(text.strip() for text, _, _ in runs):
+                    self._lines.append(runs)
+        return self._lines
+
+    @property
+    def html(self) -> list:
+        """Las <p> del párrafo, como render_paragraph pero sobre los mismos eventos."""
+        if self._html is None:
+            self._html = render_lines(self.align, self.events)
+        return self._html
+
+
+class Emitter:
+    """Base de los emisores: cada método devuelve el texto a escribir."""
+    extension = ''
+
+    def begin(self, default_font, default_size) -> str:
+        return ''
+
+    def paragraph(self, para: Paragraph) -> str:
+        raise NotImplementedError
+
+    def end(self) -> str:
+        return ''
+
+
+class HtmlEmitter(Emitter):
+    """
+    El HTML de siempre (Paragraph.html), sin la limpieza de post_proc. Con
+    `sheet` (StyleSheet) los <p> salen con clases y begin() no devuelve la
+    cabecera: la da header() cuando ya se conocen todas las clases.
+    """
+    extension = 'html'
+
+    def __init__(self, sheet=None):
+        self.sheet = sheet
+        self.default_font = self.default_size = None
+
+    def header(self) -> str:
+        return '\n'.join(html_header(self.default_font, self.default_size, self.sheet))
+
+    def begin(self, default_font, default_size) -> str:
+        self.default_font, self.default_size = default_font, default_size
+        return '' if self.sheet else self.header()
+
+    def paragraph(self, para: Paragraph) -> str:
+        rendered = para.html
+        if not rendered:
+            return ''
+        if self.sheet:
+            rendered = map(self.sheet.convert, rendered)
+        return '\n' + '\n'.join(rendered)
+
+    def end(self) -> str:
+        return '\n</body>\n</html>'
+
+
+def plain_text(para: Paragraph) -> str:
+    """Texto de un párrafo como se ve en el HTML (lines_text): una línea por <def> y espacios colapsados."""
+    return lines_text(para.events)
+
+
+class TextEmitter(Emitter):
+    """Solo el texto (plain_text) con una línea en blanco entre párrafos."""
+    extension = 'txt'
+
+    def __init__(self):
+        self.first = True
+
+    def paragraph(self, para: Paragraph) -> str:
+        text = plain_text(para)
+        if not text:
+            return ''
+        separator = '' if self.first else '\n'
+        self.first = False
+        return f'{separator}{text}\n'
+
+
+# Delimitadores Markdown de cada semántico (el subrayado no existe: se deja en HTML)
+MD_MARKS = {'bold': ('**', '**'), 'italic': ('*', '*'), 'strikeout': ('~~', '~~'), 'underline': ('<u>', '</u>')}
+MD_ESCAPE_RE = re.compile(r'([\\`*_\[\]<>#|~])')
+
+
+class MarkdownEmitter(Emitter):
+    """
+    Markdown (CommonMark + ~~tachado~~ de GFM). Los semánticos se abren y
+    cierran siguiendo la pila de cada run, los espacios se colapsan y los de
+    los extremos se dejan fuera de los delimitadores para que sean válidos. La
+    alineación y el estilo (font/size/color) no tienen equivalente y se
+    pierden; los <def> son saltos de línea forzados.
+    """
+    extension = 'md'
+
+    def __init__(self):
+        self.first = True
+
+    def render_line(self, runs) -> str:
+        out = []
+        opened = ()
+        for text, semantic, _ in runs:
+            text = MD_ESCAPE_RE.sub(r'\\\1', SPACES_RE.sub(' ', text))
+            core = text.strip()
+            if not core:
+                # un delimitador de cierre no puede ir tras un espacio
+                out.extend(MD_MARKS[tag][1] for tag in reversed(opened))
+                opened = ()
+                out.append(text)
+                continue
+            keep = 0
+            while keep < len(opened) and keep < len(semantic) and opened[keep] == semantic[keep]:
+                keep += 1
+            lead = text[:len(text) - len(text.lstrip())]
+            trail = text[len(text.rstrip()):]
+            out.extend(MD_MARKS[tag][1] for tag in reversed(opened[keep:]))
+            out.append(lead)
+            out.extend(MD_MARKS[tag][0] for tag in semantic[keep:])
+            out.append(core)
+            opened = semantic
+            if trail:
+                # el espacio final queda fuera: se cierra aquí y se reabre en el siguiente run
+                out.extend(MD_MARKS[tag][1] for tag in reversed(opened))
+                opened = ()
+                out.append(trail)
+        out.extend(MD_MARKS[tag][1] for tag in reversed(opened))
+        return ''.join(out)
+
+    def paragraph(self, para: Paragraph) -> str:
+        lines = para.lines
+        if not lines:
+            return ''
+        text = '\\\n'.join(self.render_line(runs).strip() for runs in lines)
+        separator = '' if self.first else '\n'
+        self.first = False
+        return f'{separator}{text}\n'
+
+
+def run_json(run) -> dict:
+    """{'text': ..., 'marks': [...], 'style': {...}} omitiendo las claves vacías."""
+    text, semantic, style = run
+    node = {'text': text}
+    if semantic:
+        node['marks'] = list(semantic)
+    if style != NO_STYLE:
+        node['style'] = {name: value for name, value in zip(STYLE_NAMES, style) if value is not None}
+    return node
+
+
+class JsonEmitter(Emitter):
+    """
+    AST en JSON, escrito párrafo a párrafo:
+    {"font": ..., "size": ..., "paragraphs": [{"align": ..., "lines": [[run, ...], ...]}, ...]}
+    """
+    extension = 'json'
+
+    def __init__(self):
+        self.first = True
+
+    def begin(self, default_font, default_size) -> str:
+        head = json.dumps({'font': default_font, 'size': default_size}, ensure_ascii=False)
+        return head[:-1] + ', "paragraphs": ['
+
+    def paragraph(self, para: Paragraph) -> str:
+        lines = para.lines
+        if not lines:
+            return ''
+        node = {'align': para.align or None, 'lines': [[run_json(run) for run in runs] for runs in lines]}
+        separator = '\n' if self.first else ',\n'
+        self.first = False
+        return separator + json.dumps(node, ensure_ascii=False, separators=(',', ':'))
+
+    def end(self) -> str:
+        return '\n]}\n'
+
+
+EMITTERS = {'html': HtmlEmitter, 'text': TextEmitter, 'md': MarkdownEmitter, 'json': JsonEmitter}
+
+
+def make_emitters(formats) -> dict:
+    """{formato: emisor} para los nombres de EMITTERS en `formats`."""
+    unknown = [fmt for fmt in formats if fmt not in EMITTERS]
+    if unknown:
+        raise ValueError(f"Unknown output format(s): {', '.join(unknown)}")
+    return {fmt: EMITTERS[fmt]() for fmt in formats}
+
+
+def emit_document(default_font, default_size, paragraphs, emitters: dict, write, on_paragraph=None, texts=None):
+    """
+    Pasa el documento por todos los emisores: write(formato, texto) recibe la
+    salida de cada uno y on_paragraph(), si se da, se llama tras cada párrafo.
+    Con la lista `texts` se le añade el texto de cada párrafo (lines_text),
+    como hace render_paragraphs para el índice de búsqueda.
+    """
+    for fmt, emitter in emitters.items():
+        write(fmt, emitter.begin(default_font, default_size))
+    count = 0
+    for align, block in paragraphs:
+        para = Paragraph(align, block)
+        for fmt, emitter in emitters.items():
+            piece = emitter.paragraph(para)
+            if piece:
+                write(fmt, piece)
+        if texts is not None:
+            texts.append(lines_text(para.events))
+        count += 1
+        if on_paragraph:
+            on_paragraph()
+    for fmt, emitter in emitters.items():
+        write(fmt, emitter.end())
+    log.debug("%d paragraphs emitted as %s", count, ', '.join(emitters))
+
+
+def render_formats(qtf_content: str, formats=('text',)) -> dict:
+    """Convierte un documento QTF completo a cada formato de `formats`: {formato: texto}."""
+    default_font, default_size, p_blocks = parse_qtf(qtf_content)
+    emitters = make_emitters(formats)
+    parts = {fmt: [] for fmt in emitters}
+    emit_document(default_font, default_size, p_blocks, emitters, lambda fmt, text: parts[fmt].append(text))
+    return {fmt: ''.join(pieces) for fmt, pieces in parts.items()}
+
+
+def convert_formats(input_path: str, outputs: dict, progress_callback=None, strict_cleanup=False,
+                    css_classes=False, minify=False, compress=None, texts=None) -> dict:
+    """
+    Convierte `input_path` a todos los formatos de `outputs` ({formato: ruta})
+    en una sola pasada sobre el fichero mapeado, escribiendo cada salida de
+    forma atómica. Devuelve `outputs`.
+
+    strict_cleanup, css_classes, minify y compress se aplican a la salida
+    html igual que en convert_mapped_file: byte a byte el mismo fichero.
+    Con la lista `texts` se recoge el texto de cada párrafo para el índice.
+    """
+    io_log.info("Formats %s [Started at> %s | Input> %s]", ', '.join(outputs), time_now(), input_path)
+    started = time.perf_counter()
+    emitters = make_emitters(outputs)
+    html = emitters.get('html')
+    if html is not None and css_classes:
+        html = emitters['html'] = HtmlEmitter(StyleSheet())
+    html_doc = None
+    with map_file(input_path) as buf, ExitStack() as stack:
+        check_utf8(buf)
+        offsets = deque()
+        default_font, default_size, paragraphs = parse_qtf_buffer(buf, offsets, QtfDiagnostics(input_path))
+        files = {}
+        for fmt, path in outputs.items():
+            if fmt != 'html':
+                files[fmt] = stack.enter_context(atomic_open(path))
+            elif strict_cleanup:
+                # post_proc necesita el documento entero: se escribe al final
+                files[fmt] = html_doc = io.StringIO()
+            else:
+                files[fmt] = stack.enter_context(open_output(path, minify, compress))
+                if html.sheet:
+                    # la cabecera lleva el <style> de todo el documento (ver html_body_writer)
+                    files[fmt] = stack.enter_context(html_body_writer(files[fmt], html.header, spool=True))
+        progress = ProgressReporter(progress_callback, len(buf)) if progress_callback else None
+
+        def advance():
+            end = offsets.popleft()
+            if progress:
+                progress.update(end)
+
+        try:
+            emit_document(default_font, default_size, paragraphs, emitters,
+                          lambda fmt, text: files[fmt].write(text), advance, texts)
+        finally:
+            # suelta el mmap aunque un emisor falle a mitad (ver convert_mapped_file)
+            paragraphs.close()
+        if html_doc is not None:
+            document = html_doc.getvalue()
+            if html.sheet:
+                document = html.header() + document
+            with open_output(outputs['html'], minify, compress) as dst:
+                dst.write(post_proc(document))
+    if progress:
+        progress.finish()
+    io_log.info("Formats Done in %.3f s.", time.perf_counter() - started)
+    return outputs
@@ -0,0 +1,309 @@
+"""
+Interfaz gráfica del exportador QTF -> HTML. Solo se importa con `q2h.py --gui`.
+
+Los ficheros elegidos entran en una cola y se convierten en un QThreadPool
+propio con como mucho MAX_JOBS conversiones a la vez: el resto espera en la
+cola (no en el pool), así que un lote grande ni congela la ventana ni tiene
+cientos de documentos abiertos en memoria. Cada conversión lleva un
+threading.Event que el hilo comprueba tras cada párrafo (ConversionCancelled),
+de modo que cancelar no deja salidas a medias.
+"""
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from PyQt6.QtWidgets import (
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
+    QFileDialog, QProgressBar, QLabel, QListWidget, QListWidgetItem
+)
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+
+from q2h_cache import ConversionCache, convert_cached, default_output_dir
+from q2h_core import ConversionCancelled
+
+# Conversiones simultáneas. Con el GIL más hilos no renderizan más rápido:
+# dos bastan para solapar la lectura/escritura de uno con el render del otro
+MAX_JOBS = 2
+# Por encima de este tamaño no se usa el modo incremental, que construye el
+# HTML entero en memoria; se escribe párrafo a párrafo (convert_mapped_file)
+INCREMENTAL_MAX_BYTES = 8 * 1024 * 1024
+
+QUEUED, RUNNING, DONE, CANCELLED, FAILED = 'queued', 'running', 'done', 'cancelled', 'error'
+
+
+class TaskSignals(QObject):
+    """Señales de ConversionTask (un QRunnable no puede tenerlas)."""
+    progress = pyqtSignal(int, int)       # id, porcentaje
+    finished = pyqtSignal(int, str)       # id, ruta de salida
+    failed = pyqtSignal(int, str)         # id, mensaje
+    cancelled = pyqtSignal(int)
+
+
+class ConversionTask(QRunnable):
+    def __init__(self, job, cache: ConversionCache, output_folder: str):
+        super().__init__()
+        self.setAutoDelete(False)   # la referencia la guarda el ConversionJob
+        self.job = job
+        self.cache = cache
+        self.output_folder = output_folder
+        self.signals = TaskSignals()
+
+    def run(self):
+        job = self.job
+        try:
+            output_file, _ = convert_cached(job.path, self.output_folder, self.cache, progress_callback=self.report,
+                                            incremental=job.size <= INCREMENTAL_MAX_BYTES, cancel=job.cancel)
+        except ConversionCancelled:
+            self.signals.cancelled.emit(job.id)
+        except Exception as e:
+            self.signals.failed.emit(job.id, str(e))
+        else:
+            self.signals.finished.emit(job.id, output_file)
+
+    def report(self, percent: int):
+        # ProgressReporter ya limita la frecuencia: no se satura la cola de eventos
+        self.signals.progress.emit(self.job.id, percent)
+
+
+class ConversionJob:
+    """Un fichero de la cola y su estado."""
+    __slots__ = ('id', 'path', 'size', 'state', 'percent', 'started', 'cancel', 'task', 'item')
+
+    def __init__(self, job_id: int, path: str, item: QListWidgetItem):
+        self.id = job_id
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.state = QUEUED
+        self.percent = 0
+        self.started = None
+        self.cancel = threading.Event()
+        self.task = None
+        self.item = item
+
+    @property
+    def done_bytes(self) -> float:
+        return self.size * self.percent / 100
+
+
+def format_rate(rate: float) -> str:
+    return f'{rate / (1024 * 1024):.1f} MB/s'
+
+
+def format_eta(seconds: float) -> str:
+    seconds = int(seconds + 0.5)
+    return f'{seconds // 60}:{seconds % 60:02d}'
+
+
+class Qtf2HtmlExporter(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle('QTF → HTML Exporter')
+        self.resize(520, 360)
+
+        self.output_folder = default_output_dir()
+        os.makedirs(self.output_folder, exist_ok=True)
+        self.cache = ConversionCache()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(MAX_JOBS)
+
+        self.jobs = {}              # id -> ConversionJob
+        self.pending = deque()      # ids en cola, aún no enviados al pool
+        self.running = set()
+        self.next_id = 0
+        self.batch_started = None
+        self.batch_bytes = 0        # tamaño de todo lo encolado en este lote
+        self.finished_bytes = 0     # bytes ya terminados (o descartados) del lote
+
+        self.layout = QVBoxLayout(self)
+
+        self.label = QLabel('Select QTF files')
+        self.layout.addWidget(self.label)
+
+        self.queue_list = QListWidget()
+        self.queue_list.setSelectionMode(QListWidget.SelectionMode.ExtendedSelection)
+        self.layout.addWidget(self.queue_list)
+
+        buttons = QHBoxLayout()
+        self.browse_button = QPushButton('Add files')
+        self.browse_button.clicked.connect(self.select_files)
+        buttons.addWidget(self.browse_button)
+        self.cancel_button = QPushButton('Cancel selected')
+        self.cancel_button.clicked.connect(self.cancel_selected)
+        buttons.addWidget(self.cancel_button)
+        self.cancel_all_button = QPushButton('Cancel all')
+        self.cancel_all_button.clicked.connect(self.cancel_all)
+        buttons.addWidget(self.cancel_all_button)
+        self.layout.addLayout(buttons)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.layout.addWidget(self.progress_bar)
+
+        self.update_controls()
+
+    # --- cola ---
+
+    def select_files(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, 'Open QTF', '', 'QTF Files (*.qtf)')
+        self.enqueue(paths)
+
+    def enqueue(self, paths):
+        """Añade `paths` a la cola (los que ya están pendientes o en curso se ignoran)."""
+        active = {os.path.abspath(job.path) for job in self.jobs.values() if job.state in (QUEUED, RUNNING)}
+        if not self.running and not self.pending:
+            # lote nuevo: el progreso y la velocidad empiezan de cero
+            self.batch_started = time.monotonic()
+            self.batch_bytes = self.finished_bytes = 0
+        for path in paths:
+            if os.path.abspath(path) in active:
+                continue
+            active.add(os.path.abspath(path))
+            item = QListWidgetItem()
+            try:
+                job = ConversionJob(self.next_id, path, item)
+            except OSError as e:
+                item.setText(f'{os.path.basename(path)} — {FAILED}: {e}')
+                self.queue_list.addItem(item)
+                continue
+            item.setData(Qt.ItemDataRole.UserRole, job.id)
+            self.queue_list.addItem(item)
+            self.jobs[job.id] = job
+            self.pending.append(job.id)
+            self.batch_bytes += job.size
+            self.next_id += 1
+            self.refresh_item(job)
+        self.advance()
+
+    def fill_pool(self):
+        """Pasa trabajos de la cola al pool mientras haya hilos libres."""
+        while self.pending and len(self.running) < self.pool.maxThreadCount():
+            job = self.jobs[self.pending.popleft()]
+            job.state = RUNNING
+            job.started = time.monotonic()
+            job.task = ConversionTask(job, self.cache, self.output_folder)
+            job.task.signals.progress.connect(self.on_progress)
+            job.task.signals.finished.connect(self.on_finished)
+            job.task.signals.failed.connect(self.on_failed)
+            job.task.signals.cancelled.connect(self.on_cancelled)
+            self.running.add(job.id)
+            self.pool.start(job.task)
+            self.refresh_item(job)
+
+    def advance(self):
+        """Tras cualquier cambio en la cola: llena el pool y, si ya no queda nada, guarda la caché."""
+        self.fill_pool()
+        if not self.running and not self.pending:
+            self.cache.save()
+        self.update_controls()
+
+    def cancel_job(self, job: ConversionJob):
+        if job.state == QUEUED:
+            self.pending.remove(job.id)
+            self.finish_job(job, CANCELLED)
+        elif job.state == RUNNING:
+            # el hilo lo verá tras el párrafo en curso y avisará con cancelled
+            job.cancel.set()
+            self.refresh_item(job)
+
+    def cancel_selected(self):
+        for item in self.queue_list.selectedItems():
+            job = self.jobs.get(item.data(Qt.ItemDataRole.UserRole))
+            if job is not None:
+                self.cancel_job(job)
+        self.advance()
+
+    def cancel_all(self):
+        for job_id in list(self.pending) + list(self.running):
+            self.cancel_job(self.jobs[job_id])
+        self.advance()
+
+    # --- señales de los hilos ---
+
+    def on_progress(self, job_id: int, percent: int):
+        job = self.jobs[job_id]
+        job.percent = percent
+        self.refresh_item(job)
+        self.update_status()
+
+    def on_finished(self, job_id: int, output_path: str):
+        job = self.jobs[job_id]
+        job.item.setToolTip(output_path)
+        self.finish_job(job, DONE)
+        self.advance()
+
+    def on_failed(self, job_id: int, message: str):
+        job = self.jobs[job_id]
+        job.item.setToolTip(message)
+        self.finish_job(job, FAILED)
+        self.advance()
+
+    def on_cancelled(self, job_id: int):
+        self.finish_job(self.jobs[job_id], CANCELLED)
+        self.advance()
+
+    def finish_job(self, job: ConversionJob, state: str):
+        job.state = state
+        job.task = None
+        if state == DONE:
+            job.percent = 100
+        self.running.discard(job.id)
+        self.finished_bytes += job.size
+        self.refresh_item(job)
+
+    # --- presentación ---
+
+    def refresh_item(self, job: ConversionJob):
+        name = os.path.basename(job.path)
+        if job.state == RUNNING:
+            if job.cancel.is_set():
+                status = 'cancelling...'
+            else:
+                status = f'{job.percent}%'
+                elapsed = time.monotonic() - job.started
+                if job.percent and elapsed > 0:
+                    rate = job.done_bytes / elapsed
+                    status += f' · {format_rate(rate)} · ETA {format_eta((job.size - job.done_bytes) / rate)}'
+        else:
+            status = job.state
+        job.item.setText(f'{name} — {status}')
+
+    def update_status(self):
+        """Progreso, velocidad y tiempo restante del lote (por bytes de entrada)."""
+        done = self.finished_bytes + sum(self.jobs[job_id].done_bytes for job_id in self.running)
+        if self.batch_bytes:
+            self.progress_bar.setValue(int(done * 1000 / self.batch_bytes))
+        if not self.running and not self.pending:
+            states = [job.state for job in self.jobs.values()]
+            self.label.setText(f'{states.count(DONE)} converted, {states.count(CANCELLED)} cancelled, '
+                               f'{states.count(FAILED)} failed')
+            self.progress_bar.setValue(1000)
+            return
+        text = f'{len(self.running)} running, {len(self.pending)} queued'
+        elapsed = time.monotonic() - self.batch_started
+        if done and elapsed > 0:
+            rate = done / elapsed
+            text += f' · {format_rate(rate)} · ETA {format_eta((self.batch_bytes - done) / rate)}'
+        self.label.setText(text)
+
+    def update_controls(self):
+        busy = bool(self.running or self.pending)
+        self.cancel_button.setEnabled(busy)
+        self.cancel_all_button.setEnabled(busy)
+        if self.jobs:
+            self.update_status()
+
+    def closeEvent(self, event):
+        self.cancel_all()
+        # los hilos paran tras su párrafo en curso
+        self.pool.waitForDone()
+        self.cache.save()
+        super().closeEvent(event)
+
+
+def main(argv=None) -> int:
+    app = QApplication(argv if argv is not None else sys.argv)
+    exporter = Qtf2HtmlExporter()
+    exporter.show()
+    return app.exec()
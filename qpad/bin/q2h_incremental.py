@@ -0,0 +1,179 @@
+"""
+Reconversión incremental: solo se vuelve a renderizar lo que cambió.
+
+IncrementalConverter guarda, de la conversión anterior, un mapa
+huella(align, block) -> [<p>...] renderizados. En la siguiente conversión
+process_block solo corre para los párrafos cuya huella no está en el mapa y
+el resto se empalma tal cual. process_block no depende de nada fuera del
+párrafo, así que el resultado es idéntico al de convert_qtf_to_html.
+
+El mapa puede vivir en memoria (un editor que reexporta al guardar) o
+persistirse en comp/cache/store/incremental/<hash de la ruta>.json. Si se piden
+los textos para el índice de búsqueda, se guardan también por huella.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+
+from q2h_core import (
+    CONVERTER_VERSION, ProgressReporter, QtfDiagnostics, StyleSheet, atomic_open, check_utf8, html_header,
+    map_file, open_output, parse_qtf, parse_qtf_buffer, post_proc, render_paragraphs
+)
+
+STATE_DIR = 'incremental'
+
+log = logging.getLogger('q2h.cache')
+
+
+def fingerprint(align, block: str) -> str:
+    """Huella de un párrafo: su texto y su alineación."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update((align or '').encode('utf-8'))
+    h.update(b'\0')
+    h.update(block.encode('utf-8'))
+    return h.hexdigest()
+
+
+def state_path_for(input_path: str, cache_dir: str) -> str:
+    """Fichero de estado incremental de `input_path` dentro de la caché."""
+    digest = hashlib.sha1(os.path.abspath(input_path).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, STATE_DIR, f'{digest}.json')
+
+
+class IncrementalConverter:
+    def __init__(self, fragments=None, texts=None):
+        self.fragments = fragments or {}   # huella -> [<p>...] de la última conversión
+        self.texts = texts or {}           # huella -> texto (lines_text), si alguna vez se pidió
+        self.reused = 0
+        self.rendered = 0
+
+    def convert(self, qtf_content: str, progress_callback=None, strict_cleanup=False, workers=None,
+                profile=None, css_classes=False) -> str:
+        """Como convert_qtf_to_html, pero reutilizando los párrafos sin cambios."""
+        default_font, default_size, p_blocks = parse_qtf(qtf_content, profile=profile)
+        return self.convert_blocks(default_font, default_size, p_blocks, progress_callback=progress_callback,
+                                   strict_cleanup=strict_cleanup, workers=workers, profile=profile,
+                                   css_classes=css_classes)
+
+    def convert_blocks(self, default_font, default_size, p_blocks, progress_callback=None, strict_cleanup=False,
+                       workers=None, profile=None, cancel=None, css_classes=False, texts=None) -> str:
+        """
+        convert() a partir de un documento ya parseado (lista de (align, block)).
+        Con `cancel` (threading.Event) se puede cancelar entre párrafos; el
+        estado (self.fragments) solo cambia si la conversión termina. Los
+        fragmentos se guardan siempre con estilos en línea: con css_classes
+        las clases se asignan al montar el documento. Con la lista `texts` se
+        añade el texto de cada párrafo; los reutilizados de los que no se
+        guardó texto se vuelven a renderizar.
+        """
+        prints = [fingerprint(align, block) for align, block in p_blocks]
+
+        # Párrafos nuevos o modificados (una sola vez aunque se repitan)
+        missing = {}
+        for fp, item in zip(prints, p_blocks):
+            if fp in missing:
+                continue
+            if fp not in self.fragments or (texts is not None and fp not in self.texts):
+                missing[fp] = item
+        self.reused = len(p_blocks) - len(missing)
+        self.rendered = len(missing)
+
+        fresh = {}
+        fresh_texts = [] if texts is not None else None
+        if profile is not None:
+            profile.documents += 1
+            rendered_iter = profile.render(missing.values(), workers=workers, texts=fresh_texts)
+        else:
+            rendered_iter = render_paragraphs(missing.values(), workers=workers, texts=fresh_texts)
+        progress = None
+        if progress_callback or cancel:
+            # Solo cuenta lo que hay que renderizar: lo reutilizado no cuesta
+            progress = ProgressReporter(progress_callback, sum(len(block) for _, block in missing.values()),
+                                        cancel=cancel)
+        done = 0
+        for fp, rendered in zip(missing, rendered_iter):
+            fresh[fp] = rendered
+            if progress:
+                done += len(missing[fp][1])
+                progress.update(done)
+
+        known = self.texts
+        if fresh_texts is not None:
+            known = dict(known)
+            known.update(zip(missing, fresh_texts))
+            texts.extend(known[fp] for fp in prints)
+
+        sheet = StyleSheet() if css_classes else None
+        html = []
+        fragments = {}
+        for fp in prints:
+            rendered = fresh.get(fp)
+            if rendered is None:
+                rendered = self.fragments[fp]
+            fragments[fp] = rendered
+            html.extend(map(sheet.convert, rendered) if sheet else rendered)
+        html[:0] = html_header(default_font, default_size, sheet)
+        html.extend(['</body>', '</html>'])
+
+        # Solo se conserva lo usado en esta versión del documento
+        self.fragments = fragments
+        self.texts = {fp: known[fp] for fp in fragments if fp in known}
+        if progress:
+            progress.finish()
+
+        html_result = '\n'.join(html)
+        if strict_cleanup:
+            started = time.perf_counter()
+            html_result = post_proc(html_result)
+            if profile is not None:
+                profile.add('cleanup', time.perf_counter() - started, len(html_result))
+        return html_result
+
+    @classmethod
+    def load(cls, path: str) -> 'IncrementalConverter':
+        """Carga el estado guardado; si no existe o es de otra versión, empieza vacío."""
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        if data.get('version') != CONVERTER_VERSION:
+            return cls()
+        return cls(data.get('fragments'), data.get('texts'))
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with atomic_open(path) as f:
+            json.dump({'version': CONVERTER_VERSION, 'fragments': self.fragments, 'texts': self.texts}, f)
+
+
+def convert_incremental(input_path: str, output_file: str, state_dir=None, strict_cleanup=False,
+                        workers=None, progress_callback=None, profile=None, cancel=None, css_classes=False,
+                        minify=False, compress=None, texts=None) -> str:
+    """
+    Convierte `input_path` usando (y actualizando) su estado incremental en
+    `state_dir` (por defecto comp/cache/store, la raíz de la caché). Misma firma que convert_file.
+    """
+    state_dir = state_dir or os.path.join(os.getcwd(), 'comp', 'cache', 'store')
+    state_path = state_path_for(input_path, state_dir)
+    converter = IncrementalConverter.load(state_path)
+    with map_file(input_path) as buf:
+        started = time.perf_counter()
+        check_utf8(buf)
+        default_font, default_size, paragraphs = parse_qtf_buffer(buf, diagnostics=QtfDiagnostics(input_path))
+        p_blocks = list(paragraphs)
+        if profile is not None:
+            profile.add('body', time.perf_counter() - started, len(buf))
+    html = converter.convert_blocks(default_font, default_size, p_blocks, progress_callback=progress_callback,
+                                    strict_cleanup=strict_cleanup, workers=workers, profile=profile, cancel=cancel,
+                                    css_classes=css_classes, texts=texts)
+    started = time.perf_counter()
+    with open_output(output_file, minify, compress) as f:
+        f.write(html)
+    converter.save(state_path)
+    if profile is not None:
+        profile.add('write', time.perf_counter() - started, os.path.getsize(output_file))
+    log.info("Incremental: %d paragraphs rendered, %d reused", converter.rendered, converter.reused)
+    return output_file
@@ -0,0 +1,127 @@
+"""
+Medición por etapas del conversor (--profile).
+
+Un ConversionProfile se pasa como `profile=` a convert_qtf_to_html,
+iter_qtf_html, convert_file, etc. y acumula tiempo de pared y volumen
+procesado de cada etapa:
+
+    header   búsqueda de Font=/Size= (con mmap incluye validar el UTF-8)
+    body     extracción de [Body] y de los bloques [P]
+    scan     extracción de cada párrafo al irlo pidiendo (mmap y streaming)
+    render   process_block de todos los párrafos (sin contar scan)
+    cleanup  post_proc (solo con --strict-cleanup)
+    write    escritura del HTML
+    cache    hash de la entrada y búsqueda en comp/cache/store
+
+El volumen se cuenta en bytes del fichero para header/body con mmap,
+write y cache, y en caracteres en el resto. summary() devuelve un dict
+listo para volcar como JSON.
+
+Sin profile (el caso normal) el conversor no mide nada.
+"""
+import json
+import time
+from contextlib import contextmanager
+
+from q2h_core import TOKEN_RE, render_paragraphs
+
+
+class ConversionProfile:
+    def __init__(self):
+        self.stages = {}        # etapa -> [segundos, volumen, llamadas]
+        self.paragraphs = 0
+        self.tags = 0
+        self.documents = 0
+        self._chars = 0         # caracteres de párrafo entregados a render
+        self._excluded = 0.0    # tiempo de lectura/recuento dentro de render_paragraphs
+        self._started = time.perf_counter()
+
+    def add(self, stage: str, seconds: float, size=0):
+        entry = self.stages.setdefault(stage, [0.0, 0, 0])
+        entry[0] += seconds
+        entry[1] += size
+        entry[2] += 1
+
+    @contextmanager
+    def stage(self, name: str, size=0):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started, size)
+
+    def feed(self, paragraphs, scan=False):
+        """
+        Pasa los (align, block) contando párrafos y tags. Con scan=True el
+        tiempo de producir cada párrafo (lectura del stream) se carga a 'scan'.
+        """
+        it = iter(paragraphs)
+        while True:
+            started = time.perf_counter()
+            item = next(it, None)
+            scanned = time.perf_counter()
+            size = 0
+            if item is not None:
+                size = len(item[1])
+                self.paragraphs += 1
+                self.tags += sum(1 for _ in TOKEN_RE.finditer(item[1]))
+                self._chars += size
+            self._excluded += time.perf_counter() - started
+            if scan:
+                self.add('scan', scanned - started, size)
+            if item is None:
+                return
+            yield item
+
+    def render(self, paragraphs, workers=None, scan=False, texts=None):
+        """render_paragraphs cargando a 'render' solo el tiempo de renderizar."""
+        rendered_iter = render_paragraphs(self.feed(paragraphs, scan), workers=workers, texts=texts)
+        while True:
+            excluded, chars = self._excluded, self._chars
+            started = time.perf_counter()
+            rendered = next(rendered_iter, None)
+            elapsed = time.perf_counter() - started - (self._excluded - excluded)
+            self.add('render', elapsed, self._chars - chars)
+            if rendered is None:
+                return
+            yield rendered
+
+    def seconds(self, stage: str) -> float:
+        return self.stages.get(stage, [0.0])[0]
+
+    def summary(self) -> dict:
+        wall = time.perf_counter() - self._started
+        render = self.seconds('render')
+        stages = {}
+        for name, (seconds, size, calls) in self.stages.items():
+            stages[name] = {
+                'seconds': round(seconds, 6),
+                'size': size,
+                'calls': calls,
+                'mb_per_s': round(size / seconds / (1024 * 1024), 3) if seconds else None,
+            }
+        return {
+            'wall_seconds': round(wall, 6),
+            'documents': self.documents,
+            'paragraphs': self.paragraphs,
+            'tags': self.tags,
+            'paragraphs_per_s': round(self.paragraphs / render, 1) if render else None,
+            'tags_per_s': round(self.tags / render, 1) if render else None,
+            'stages': stages,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary(), indent=2, sort_keys=True)
+
+    def report(self) -> str:
+        """Resumen legible para stderr."""
+        data = self.summary()
+        lines = [f"profile: {data['wall_seconds']:.3f}s wall, {data['documents']} documents, "
+                 f"{data['paragraphs']} paragraphs, {data['tags']} tags"]
+        for name, stage in sorted(data['stages'].items(), key=lambda kv: -kv[1]['seconds']):
+            rate = f"{stage['mb_per_s']:.2f} MB/s" if stage['mb_per_s'] is not None else '-'
+            lines.append(f"  {name:<8} {stage['seconds'] * 1000:10.2f} ms  {stage['size']:>12}  {rate}")
+        if data['paragraphs_per_s']:
+            lines.append(f"  render rate: {data['paragraphs_per_s']:.0f} paragraphs/s, "
+                         f"{data['tags_per_s']:.0f} tags/s")
+        return '\n'.join(lines)
@@ -0,0 +1,256 @@
+"""
+Índice de texto completo de los documentos convertidos (SQLite FTS5).
+
+    q2h.py -i docs/ --index            convierte e indexa cada documento
+    q2h.py search "texto a buscar"     busca en el índice
+
+El índice vive en comp/cache/store/search.db junto a la caché de conversiones.
+Cada párrafo [P] es una fila de la tabla FTS5 con el texto que ve el lector
+(q2h_core.lines_text). Ese texto no se saca leyendo otra vez el documento:
+la conversión lo recoge de los mismos eventos con los que genera el HTML
+(el argumento `texts` de convert_file y compañía) y se lo pasa a add_file.
+El rowid
+codifica documento y párrafo (doc << PARA_BITS | párrafo), así que borrar
+o sustituir los párrafos de un documento es un rango de rowid y no un
+recorrido de la tabla.
+
+Las actualizaciones son incrementales: un fichero con el mismo tamaño y
+mtime no hace falta indexarlo (wants), uno con el mismo SHA-256 no cambia
+nada y, si cambió, solo se reescriben los párrafos cuya huella es distinta.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+
+from q2h_core import map_file
+
+log = logging.getLogger('q2h.index')
+
+INDEX_FILE = 'search.db'
+# Bits del rowid reservados al número de párrafo (hasta ~1M de [P] por documento)
+PARA_BITS = 20
+PARA_MASK = (1 << PARA_BITS) - 1
+COMMIT_EVERY = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    sha TEXT NOT NULL,
+    paragraphs INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS prints (
+    id INTEGER PRIMARY KEY,
+    print BLOB NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS paragraphs USING fts5(
+    text, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def default_index_path(cache_dir=None) -> str:
+    from q2h_cache import default_cache_dir
+    return os.path.join(cache_dir or default_cache_dir(), INDEX_FILE)
+
+
+def file_sha(buf) -> str:
+    return hashlib.sha256(buf).hexdigest()
+
+
+class SearchIndex:
+    """Índice FTS5 con un único escritor (el proceso principal del CLI)."""
+
+    def __init__(self, path=None):
+        self.path = path or default_index_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.pending = 0
+        self.added = self.updated = self.unchanged = 0
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def doc_id(self, path: str):
+        row = self.db.execute('SELECT id FROM documents WHERE path = ?', (path,)).fetchone()
+        return row[0] if row else None
+
+    def wants(self, input_path: str) -> bool:
+        """
+        True si `input_path` no está indexado o cambió de tamaño o mtime: solo
+        entonces hace falta pedir los textos a la conversión (y add_file).
+        """
+        path = os.path.abspath(input_path)
+        st = os.stat(path)
+        row = self.db.execute('SELECT size, mtime FROM documents WHERE path = ?', (path,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime:
+            self.unchanged += 1
+            return False
+        return True
+
+    def add_file(self, input_path: str, texts: list) -> bool:
+        """
+        Indexa (o reindexa) `input_path` con `texts`, el texto de cada [P] en
+        orden tal como lo recogió la conversión. Devuelve False si no había
+        nada que hacer porque el documento no cambió desde la última vez.
+        """
+        path = os.path.abspath(input_path)
+        st = os.stat(path)
+        row = self.db.execute('SELECT id, size, mtime, sha FROM documents WHERE path = ?', (path,)).fetchone()
+        with map_file(path) as buf:
+            sha = file_sha(buf)
+        if row and row[3] == sha:
+            # tocado pero idéntico: solo se actualiza la marca de tiempo
+            self.db.execute('UPDATE documents SET size = ?, mtime = ? WHERE id = ?', (st.st_size, st.st_mtime, row[0]))
+            self.unchanged += 1
+            return False
+        if len(texts) > PARA_MASK:
+            raise ValueError(f'{path}: more than {PARA_MASK} paragraphs')
+
+        if row is None:
+            doc = self.db.execute('INSERT INTO documents (path, size, mtime, sha, paragraphs) VALUES (?, ?, ?, ?, ?)',
+                                  (path, st.st_size, st.st_mtime, sha, len(texts))).lastrowid
+            self.added += 1
+        else:
+            doc = row[0]
+            self.db.execute('UPDATE documents SET size = ?, mtime = ?, sha = ?, paragraphs = ? WHERE id = ?',
+                            (st.st_size, st.st_mtime, sha, len(texts), doc))
+            self.updated += 1
+        self.replace_paragraphs(doc, texts)
+        self.pending += 1
+        if self.pending >= COMMIT_EVERY:
+            self.db.commit()
+            self.pending = 0
+        return True
+
+    def replace_paragraphs(self, doc: int, texts: list):
+        """Reescribe solo los párrafos de `doc` cuya huella cambió y borra los que sobran."""
+        base = doc << PARA_BITS
+        old = dict(self.db.execute('SELECT id, print FROM prints WHERE id BETWEEN ? AND ?',
+                                   (base, base | PARA_MASK)))
+        changed = 0
+        for index, text in enumerate(texts):
+            rowid = base | index
+            digest = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest() if text else b''
+            if old.pop(rowid, None) == digest:
+                continue
+            changed += 1
+            self.db.execute('DELETE FROM paragraphs WHERE rowid = ?', (rowid,))
+            if text:
+                self.db.execute('INSERT INTO paragraphs (rowid, text) VALUES (?, ?)', (rowid, text))
+            self.db.execute('INSERT OR REPLACE INTO prints (id, print) VALUES (?, ?)', (rowid, digest))
+        if old:
+            # el documento tiene ahora menos párrafos
+            first = base | len(texts)
+            self.db.execute('DELETE FROM paragraphs WHERE rowid BETWEEN ? AND ?', (first, base | PARA_MASK))
+            self.db.execute('DELETE FROM prints WHERE id BETWEEN ? AND ?', (first, base | PARA_MASK))
+        log.debug("doc %d: %d/%d paragraphs rewritten, %d removed", doc, changed, len(texts), len(old))
+
+    def remove(self, input_path: str) -> bool:
+        """Quita un documento del índice."""
+        doc = self.doc_id(os.path.abspath(input_path))
+        if doc is None:
+            return False
+        base = doc << PARA_BITS
+        self.db.execute('DELETE FROM paragraphs WHERE rowid BETWEEN ? AND ?', (base, base | PARA_MASK))
+        self.db.execute('DELETE FROM prints WHERE id BETWEEN ? AND ?', (base, base | PARA_MASK))
+        self.db.execute('DELETE FROM documents WHERE id = ?', (doc,))
+        return True
+
+    def prune(self) -> int:
+        """Quita los documentos cuyo fichero ya no existe."""
+        gone = [path for path, in self.db.execute('SELECT path FROM documents') if not os.path.exists(path)]
+        for path in gone:
+            self.remove(path)
+        self.db.commit()
+        return len(gone)
+
+    def search(self, query: str, limit=20, raw=False) -> list:
+        """
+        [(ruta, párrafo (desde 1), fragmento, puntuación)] por relevancia
+        (bm25). Sin raw cada palabra se busca literal y todas deben aparecer;
+        con raw `query` se pasa tal cual a FTS5 (OR, NEAR, prefijo*, "frase"...).
+        """
+        if not raw:
+            query = ' '.join('"{}"'.format(term.replace('"', '""')) for term in query.split())
+        if not query:
+            return []
+        rows = self.db.execute(
+            "SELECT rowid, snippet(paragraphs, 0, '[', ']', '...', 12), rank FROM paragraphs "
+            'WHERE paragraphs MATCH ? ORDER BY rank LIMIT ?', (query, limit)).fetchall()
+        paths = {}
+        results = []
+        for rowid, snippet, rank in rows:
+            doc = rowid >> PARA_BITS
+            if doc not in paths:
+                row = self.db.execute('SELECT path FROM documents WHERE id = ?', (doc,)).fetchone()
+                paths[doc] = row[0] if row else None
+            results.append((paths[doc], (rowid & PARA_MASK) + 1, snippet.replace('\n', ' '), rank))
+        return results
+
+    def stats(self) -> dict:
+        documents, paragraphs = self.db.execute(
+            'SELECT count(*), coalesce(sum(paragraphs), 0) FROM documents').fetchone()
+        return {'documents': documents, 'paragraphs': paragraphs, 'path': self.path}
+
+    def summary(self) -> str:
+        return f'index: {self.added} added, {self.updated} updated, {self.unchanged} unchanged'
+
+
+def search_main(argv=None) -> int:
+    """q2h.py search ..."""
+    parser = argparse.ArgumentParser(prog='q2h.py search', description='Search the full-text index of converted QTF')
+    parser.add_argument('query', nargs='*', help='Words that must all appear in the paragraph')
+    parser.add_argument('-n', '--limit', type=int, default=20, help='Maximum number of results')
+    parser.add_argument('--fts', action='store_true',
+                        help='Pass the query to SQLite FTS5 as is (OR, NEAR, prefix*, "phrases")')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON lines')
+    parser.add_argument('--cache-dir', help='Cache folder holding search.db (default: comp/cache/store)')
+    parser.add_argument('--prune', action='store_true', help='Drop indexed documents whose file no longer exists')
+    parser.add_argument('--stats', action='store_true', help='Print the number of indexed documents and paragraphs')
+    args = parser.parse_args(argv)
+    query = ' '.join(args.query)
+
+    path = default_index_path(args.cache_dir)
+    if not os.path.exists(path):
+        print(f'No index at {path}: convert with --index first', file=sys.stderr)
+        return 1
+    with SearchIndex(path) as index:
+        if args.prune:
+            print(f'{index.prune()} documents pruned', file=sys.stderr)
+        if args.stats:
+            print(json.dumps(index.stats()))
+        if not query:
+            return 0 if args.prune or args.stats else 2
+        started = time.perf_counter()
+        try:
+            results = index.search(query, limit=args.limit, raw=args.fts)
+        except sqlite3.OperationalError as e:
+            print(f'Invalid query: {e}', file=sys.stderr)
+            return 2
+        elapsed = time.perf_counter() - started
+    for path, paragraph, snippet, rank in results:
+        if args.json:
+            print(json.dumps({'path': path, 'paragraph': paragraph, 'snippet': snippet, 'rank': rank},
+                             ensure_ascii=False))
+        else:
+            print(f'{path}:{paragraph}: {snippet}')
+    print(f'{len(results)} results in {elapsed * 1000:.1f} ms', file=sys.stderr)
+    return 0 if results else 1
@@ -1,49 +1,81 @@
 import sys
 import os
-import requests
+import subprocess
+import threading
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QLabel, QVBoxLayout, QPushButton, QProgressBar, QDialog,
     QHBoxLayout, QTextEdit
 )
 from PyQt6.QtGui import QPixmap, QIcon, QFont
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QUrl
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal, QUrl
 from PyQt6.QtGui import QDesktopServices
 
+from qpad_download import DownloadCancelled, download, fetch_checksum, release_checksum
+
+# release_cache.py es común con el lanzador y vive en qpad/
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from release_cache import ReleaseCache  # noqa: E402
 
 REPO = "Soyzian/qpad"
 VERSION_FILE = "currentversion.txt"
-EXECUTABLE = "QPad-main.exe"
+EXECUTABLE = os.environ.get("QPAD_MAIN_EXE", "QPad-main.exe")
 RELEASES_URL = f"https://github.com/{REPO}/releases"
-GITHUB_API_RELEASES = f"https://api.github.com/repos/{REPO}/releases"
+TOAST_MS = 10000
+
+
+class UpdateCheckThread(QThread):
+    """Consulta la última release fuera del hilo de la interfaz."""
+    checked = pyqtSignal(object)    # dict de la release o None si no hay ninguna publicada
+    failed = pyqtSignal(str)
 
+    def run(self):
+        try:
+            # /releases/latest ya excluye borradores y prereleases; con la
+            # caché fresca no hay ninguna petición (ver release_cache.py)
+            self.checked.emit(ReleaseCache().latest_release(REPO))
+        except Exception as e:
+            self.failed.emit(str(e))
 
 
 class DownloaderThread(QThread):
+    """
+    Descarga el instalador con qpad_download: segmentos en paralelo,
+    reanudable si se corta y verificado con SHA-256 antes de avisar de que
+    terminó. El progreso llega como mucho 10 veces por segundo.
+    """
     progress_changed = pyqtSignal(int)
     download_finished = pyqtSignal(bool, str)
 
-    def __init__(self, url, dest):
+    def __init__(self, url, dest, sha256=None, checksum_url=None):
         super().__init__()
         self.url = url
         self.dest = dest
+        self.sha256 = sha256
+        self.checksum_url = checksum_url
+        self.cancel = threading.Event()
+        self.last_percent = -1
 
     def run(self):
         try:
-            with requests.get(self.url, stream=True) as r:
-                r.raise_for_status()
-                total_length = int(r.headers.get('content-length', 0))
-                downloaded = 0
-                with open(self.dest, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded += len(chunk)
-                            progress = int(downloaded * 100 / total_length) if total_length else 0
-                            self.progress_changed.emit(progress)
+            sha256 = self.sha256
+            if sha256 is None and self.checksum_url:
+                sha256 = fetch_checksum(self.checksum_url, os.path.basename(self.dest))
+            if sha256 is None:
+                # Sin suma publicada no se ejecuta nada descargado
+                raise ValueError("La release no publica el SHA-256 del instalador.")
+            download(self.url, self.dest, sha256=sha256, progress=self.report, cancel=self.cancel)
             self.download_finished.emit(True, self.dest)
+        except DownloadCancelled:
+            pass
         except Exception as e:
             self.download_finished.emit(False, str(e))
 
+    def report(self, done, total):
+        percent = int(done * 100 / total) if total else 0
+        if percent != self.last_percent:
+            self.last_percent = percent
+            self.progress_changed.emit(percent)
+
 
 class UpdateDialog(QDialog):
     def __init__(self, release, parent=None):
@@ -101,9 +133,64 @@ class UpdateDialog(QDialog):
         self.setLayout(layout)
 
 
+class UpdateToast(QWidget):
+    """
+    Aviso de nueva versión en una esquina de la pantalla, sin foco ni
+    modalidad: el editor sigue usable y el aviso se cierra solo.
+    """
+    def __init__(self, tag):
+        super().__init__(None, Qt.WindowType.Tool | Qt.WindowType.FramelessWindowHint
+                         | Qt.WindowType.WindowStaysOnTopHint)
+        self.setAttribute(Qt.WidgetAttribute.WA_ShowWithoutActivating)
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.setStyleSheet("""
+            QWidget {
+                background-color: #1e1e1e;
+                color: #ddd;
+                font-family: Verdana, sans-serif;
+                font-size: 10pt;
+            }
+            QPushButton {
+                background-color: #007ACC;
+                border: none;
+                padding: 6px 12px;
+                border-radius: 5px;
+                color: white;
+                font-weight: bold;
+            }
+            QPushButton#cancel {
+                background-color: #555;
+            }
+        """)
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel(f"Hay una nueva versión de QPad: <b>{tag}</b>"))
+        btn_layout = QHBoxLayout()
+        self.btn_update = QPushButton("Actualizar")
+        self.btn_later = QPushButton("Ahora no")
+        self.btn_later.setObjectName("cancel")
+        self.btn_later.clicked.connect(self.close)
+        btn_layout.addStretch()
+        btn_layout.addWidget(self.btn_later)
+        btn_layout.addWidget(self.btn_update)
+        layout.addLayout(btn_layout)
+        self.setLayout(layout)
+
+        QTimer.singleShot(TOAST_MS, self.close)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        screen = self.screen().availableGeometry()
+        self.move(screen.right() - self.width() - 20, screen.bottom() - self.height() - 20)
+
+
 class UpdateChecker(QWidget):
-    def __init__(self):
+    def __init__(self, background=False):
         super().__init__()
+        # background: el editor ya se lanzó y solo se avisa si hay versión nueva
+        self.background = background
+        self.app_launched = False
+        self.toast = None
         self.setWindowTitle("QPad - Actualizador")
         self.setWindowIcon(QIcon("Ico/icoqpad.ico"))  # Cambiar path si hace falta
         self.setFixedSize(420, 350)
@@ -174,7 +261,11 @@ class UpdateChecker(QWidget):
 
         self.local_version = self.read_local_version()
         self.local_version_label.setText(f"Versión actual: {self.local_version}")
-        self.check_for_updates()
+
+        self.checker = UpdateCheckThread()
+        self.checker.checked.connect(self.on_checked)
+        self.checker.failed.connect(self.on_check_failed)
+        self.checker.start()
 
     def read_local_version(self):
         try:
@@ -183,31 +274,64 @@ class UpdateChecker(QWidget):
         except Exception:
             return "Desconocida"
 
-    def check_for_updates(self):
-        try:
-            r = requests.get(GITHUB_API_RELEASES, timeout=10)
-            r.raise_for_status()
-            releases = r.json()
-
-            valid_releases = [rel for rel in releases if not rel['draft'] and not rel['prerelease']]
-
-            if not valid_releases:
-                self.remote_version_label.setText("No hay versiones públicas disponibles.")
-                self.launch_app()
-                return
-
-            latest = valid_releases[0]
-            latest_tag = latest['tag_name']
-
-            self.remote_version_label.setText(f"Última versión: {latest_tag}")
-
-            if self.version_greater(latest_tag, self.local_version):
-                self.show_update_dialog(latest)
+    def on_checked(self, latest):
+        if latest is None:
+            self.remote_version_label.setText("No hay versiones públicas disponibles.")
+            if self.background:
+                QApplication.quit()
             else:
-                self.remote_version_label.setText("Tu versión está actualizada.")
+                self.launch_app()
+            return
 
+        latest_tag = latest['tag_name']
+
+        self.remote_version_label.setText(f"Última versión: {latest_tag}")
+
+        if not self.version_greater(latest_tag, self.local_version):
+            self.remote_version_label.setText("Tu versión está actualizada.")
+            if self.background:
+                QApplication.quit()
+        elif self.background:
+            self.show_toast(latest)
+        else:
+            self.show_update_dialog(latest)
+
+    def on_check_failed(self, error):
+        self.remote_version_label.setText(f"Error al buscar actualizaciones: {error}")
+        if self.background:
+            QApplication.quit()
+
+    def show_toast(self, release):
+        self.toast = UpdateToast(release['tag_name'])
+        self.toast.btn_update.clicked.connect(lambda: self.open_from_toast(release))
+        self.toast.destroyed.connect(self.on_toast_closed)
+        self.toast.show()
+
+    def open_from_toast(self, release):
+        self.toast.close()
+        self.show()
+        self.show_update_dialog(release)
+
+    def on_toast_closed(self):
+        self.toast = None
+        if not self.isVisible():
+            QApplication.quit()
+
+    def start_app(self):
+        # Una sola vez: en segundo plano el editor ya se lanzó al empezar
+        if self.app_launched:
+            return True
+        try:
+            subprocess.Popen([os.path.join(os.getcwd(), EXECUTABLE)], shell=True)
         except Exception as e:
-            self.remote_version_label.setText(f"Error al buscar actualizaciones: {e}")
+            self.remote_version_label.setText(f"No se pudo iniciar QPad:\n{e}")
+            return False
+        self.app_launched = True
+        return True
+
+    def launch_app(self):
+        if self.start_app():
+            self.close()
 
     def version_greater(self, v1, v2):
         def parse_ver(v):
@@ -234,9 +358,10 @@ class UpdateChecker(QWidget):
 
         download_url = asset['browser_download_url']
         dest_file = os.path.join(os.getcwd(), asset['name'])
+        sha256, checksum_url = release_checksum(release, asset)
 
         self.progress.show()
-        self.downloader = DownloaderThread(download_url, dest_file)
+        self.downloader = DownloaderThread(download_url, dest_file, sha256, checksum_url)
         self.downloader.progress_changed.connect(self.progress.setValue)
         self.downloader.download_finished.connect(lambda success, info: self.install_update(success, info, dialog))
         self.downloader.start()
@@ -254,10 +379,26 @@ class UpdateChecker(QWidget):
             self.remote_version_label.setText(f"No se pudo iniciar el instalador:\n{e}")
         self.close()
 
+    def closeEvent(self, event):
+        # La consulta acaba como mucho en el timeout de release_cache
+        if self.checker.isRunning():
+            self.checker.wait()
+        # Lo ya descargado queda en <instalador>.part para reanudar la próxima vez
+        downloader = getattr(self, 'downloader', None)
+        if downloader is not None and downloader.isRunning():
+            downloader.cancel.set()
+            downloader.wait()
+        super().closeEvent(event)
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     app.setFont(QFont("Verdana", 9))
     app.setStyle("Windows")
-    w = UpdateChecker()
-    w.show()
+    # --background: lanza QPad al momento y solo avisa si hay versión nueva
+    if "--background" in sys.argv[1:]:
+        w = UpdateChecker(background=True)
+        w.start_app()
+    else:
+        w = UpdateChecker()
+        w.show()
     sys.exit(app.exec())
@@ -3,7 +3,7 @@
 
 a = Analysis(
     ['qpad-updater.py'],
-    pathex=[],
+    pathex=['..'],
     binaries=[],
     datas=[('splash.bmp', '.'), ('currentversion.txt', '.')],
     hiddenimports=[],
@@ -0,0 +1,303 @@
+"""
+Descargas del actualizador (qpad-updater.py).
+
+download() reparte el fichero en segmentos HTTP Range que se piden en
+paralelo y se escriben cada uno en su posición de <dest>.part, creado de
+antemano con el tamaño final. El avance de cada segmento se guarda en
+<dest>.part.json: si la descarga se corta (red, cierre del actualizador)
+la siguiente llamada con la misma URL sigue donde se quedó, siempre que el
+servidor sirva el mismo fichero (tamaño y ETag/Last-Modified). Al terminar
+se comprueba el SHA-256 y solo entonces se renombra a `dest`, así que quien
+ejecute `dest` nunca ve un instalador a medias ni alterado.
+
+Si el servidor no admite Range o no dice el tamaño, se descarga en una sola
+conexión, sin reanudación.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+import requests
+
+# Conexiones simultáneas y tamaño mínimo de cada segmento
+SEGMENTS = 4
+MIN_SEGMENT = 1 << 20
+CHUNK_SIZE = 64 * 1024
+# (conexión, lectura) en segundos: una conexión colgada no bloquea para siempre
+TIMEOUT = (5, 30)
+# Reintentos por segmento ante cortes de red, cada uno desde lo ya recibido
+RETRIES = 3
+RETRY_DELAY = 1.0
+# Frecuencia máxima de los avisos de progreso y del guardado del estado
+PROGRESS_INTERVAL = 0.1
+STATE_INTERVAL = 1.0
+HASH_CHUNK = 1 << 20
+
+CONTENT_RANGE_RE = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+SHA256_RE = re.compile(r'\b([0-9a-fA-F]{64})\b')
+
+
+class DownloadError(Exception):
+    """La descarga no se pudo completar."""
+
+
+class ChecksumError(DownloadError):
+    """El fichero descargado no tiene el SHA-256 esperado (se descarta)."""
+
+
+class DownloadCancelled(DownloadError):
+    """Se canceló; el estado queda guardado para reanudar."""
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def release_checksum(release: dict, asset: dict):
+    """
+    (sha256, url) del instalador `asset` de `release`, sin tocar la red: el
+    campo "digest" de la API ("sha256:<hex>") si lo hay y si no la URL de un
+    asset <nombre>.sha256 o SHA256SUMS que habrá que leer (fetch_checksum).
+    """
+    digest = asset.get('digest') or ''
+    if digest.startswith('sha256:'):
+        return digest[len('sha256:'):].lower(), None
+    names = {a['name']: a['browser_download_url'] for a in release.get('assets', [])}
+    for name in (f"{asset['name']}.sha256", 'SHA256SUMS', 'SHA256SUMS.txt'):
+        if name in names:
+            return None, names[name]
+    return None, None
+
+
+def fetch_checksum(url: str, name: str, timeout=TIMEOUT):
+    """SHA-256 de `name` en un fichero de sumas (una línea "<hex>  <nombre>" o solo el hex)."""
+    r = requests.get(url, timeout=timeout)
+    r.raise_for_status()
+    lines = r.text.splitlines()
+    for line in lines:
+        m = SHA256_RE.search(line)
+        if m and (len(lines) == 1 or line.rstrip().endswith(name)):
+            return m.group(1).lower()
+    return None
+
+
+class Throttle:
+    """Llama a callback(hecho, total) como mucho cada `interval` segundos (y siempre al final)."""
+
+    def __init__(self, callback, interval=PROGRESS_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self._next = 0.0
+
+    def __call__(self, done, total, force=False):
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        if force or now >= self._next:
+            self._next = now + self.interval
+            self.callback(done, total)
+
+
+class SegmentedDownload:
+    def __init__(self, url: str, dest: str, sha256=None, segments=SEGMENTS, progress=None, cancel=None,
+                 timeout=TIMEOUT, retries=RETRIES):
+        self.url = url
+        self.dest = dest
+        self.sha256 = sha256.lower() if sha256 else None
+        self.segments = max(segments, 1)
+        self.progress = Throttle(progress)
+        self.cancel = cancel
+        self.timeout = timeout
+        self.retries = retries
+        self.part = f'{dest}.part'
+        self.state_path = f'{dest}.part.json'
+        self.stop = threading.Event()   # cancelación o fallo de otro segmento
+        self.lock = threading.Lock()
+        self.size = 0
+        self.validator = None           # ETag (o Last-Modified) del fichero remoto
+        self.ranges = []                # [inicio, fin (exclusivo), bytes ya escritos]
+        self.resumed = 0                # bytes que ya estaban de una descarga anterior
+        self.changed = False            # el servidor ya sirve otro fichero: no se reanuda
+
+    # --- estado en disco ---
+
+    def load_state(self) -> bool:
+        """Recupera los segmentos de una descarga anterior del mismo fichero."""
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (state.get('url') != self.url or state.get('size') != self.size
+                or state.get('validator') != self.validator or not os.path.exists(self.part)
+                or os.path.getsize(self.part) != self.size):
+            return False
+        self.ranges = [list(r) for r in state['ranges']]
+        self.resumed = self.done()
+        return True
+
+    def save_state(self):
+        with self.lock:
+            state = {'url': self.url, 'size': self.size, 'validator': self.validator,
+                     'ranges': [list(r) for r in self.ranges]}
+        tmp = f'{self.state_path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def discard(self):
+        for path in (self.part, self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def done(self) -> int:
+        with self.lock:
+            return sum(r[2] for r in self.ranges)
+
+    # --- descarga ---
+
+    def check_stop(self):
+        if self.cancel is not None and self.cancel.is_set():
+            self.stop.set()
+        if self.stop.is_set():
+            raise DownloadCancelled('download cancelled')
+
+    def run(self) -> str:
+        with requests.Session() as session:
+            # Range: bytes=0-0 dice a la vez el tamaño y si hay soporte de Range;
+            # si el servidor contesta 200 esa misma respuesta es la descarga
+            r = session.get(self.url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=self.timeout)
+            with r:
+                r.raise_for_status()
+                m = CONTENT_RANGE_RE.match(r.headers.get('Content-Range', ''))
+                if r.status_code != 206 or not m or m.group(3) == '*':
+                    return self.run_single(r)
+                self.size = int(m.group(3))
+                self.validator = r.headers.get('ETag') or r.headers.get('Last-Modified')
+        if not self.load_state():
+            self.discard()
+            count = max(min(self.segments, self.size // MIN_SEGMENT), 1)
+            step = -(-self.size // count)
+            self.ranges = [[start, min(start + step, self.size), 0] for start in range(0, self.size, step)]
+            with open(self.part, 'wb') as f:
+                f.truncate(self.size)
+            self.save_state()
+        self.run_segments()
+        return self.finish()
+
+    def run_segments(self):
+        pending = [r for r in self.ranges if r[2] < r[1] - r[0]]
+        if not pending:
+            return
+        saved = time.monotonic()
+        with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+            futures = [pool.submit(self.fetch_range, r) for r in pending]
+            try:
+                while True:
+                    finished, running = wait(futures, timeout=PROGRESS_INTERVAL, return_when=FIRST_EXCEPTION)
+                    self.progress(self.done(), self.size)
+                    for future in finished:
+                        future.result()     # relanza el primer error
+                    if not running:
+                        break
+                    if self.cancel is not None and self.cancel.is_set():
+                        self.stop.set()
+                    if time.monotonic() - saved >= STATE_INTERVAL:
+                        self.save_state()
+                        saved = time.monotonic()
+            except BaseException:
+                # los demás segmentos paran en su siguiente bloque
+                self.stop.set()
+                raise
+            finally:
+                wait(futures)
+                if self.changed:
+                    self.discard()
+                else:
+                    self.save_state()
+        self.check_stop()
+
+    def fetch_range(self, rng: list):
+        """Descarga un segmento desde lo ya escrito, reintentando ante cortes de red."""
+        failures = 0
+        with requests.Session() as session, open(self.part, 'r+b', buffering=0) as f:
+            while rng[2] < rng[1] - rng[0]:
+                self.check_stop()
+                start = rng[0] + rng[2]
+                headers = {'Range': f'bytes={start}-{rng[1] - 1}'}
+                if self.validator and not self.validator.startswith('W/'):
+                    # si el fichero cambió, el servidor contesta 200 con el nuevo
+                    # (If-Range no admite ETags débiles)
+                    headers['If-Range'] = self.validator
+                try:
+                    with session.get(self.url, headers=headers, stream=True, timeout=self.timeout) as r:
+                        r.raise_for_status()
+                        m = CONTENT_RANGE_RE.match(r.headers.get('Content-Range', ''))
+                        if r.status_code != 206 or not m or int(m.group(1)) != start:
+                            self.changed = True
+                            raise DownloadError('the file changed on the server or ranges are not honoured')
+                        f.seek(start)
+                        for chunk in r.iter_content(CHUNK_SIZE):
+                            self.check_stop()
+                            chunk = chunk[:rng[1] - rng[0] - rng[2]]
+                            f.write(chunk)
+                            with self.lock:
+                                rng[2] += len(chunk)
+                except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                    failures += 1
+                    if failures > self.retries:
+                        raise
+                    self.stop.wait(RETRY_DELAY * failures)
+
+    def run_single(self, r) -> str:
+        """Sin Range: una sola conexión, calculando el SHA-256 según llega."""
+        self.discard()
+        total = int(r.headers.get('Content-Length') or 0)
+        h = hashlib.sha256()
+        done = 0
+        try:
+            with open(self.part, 'wb') as f:
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    self.check_stop()
+                    f.write(chunk)
+                    h.update(chunk)
+                    done += len(chunk)
+                    self.progress(done, total)
+        except BaseException:
+            self.discard()
+            raise
+        self.size = done
+        return self.finish(h.hexdigest())
+
+    def finish(self, digest=None) -> str:
+        self.progress(self.size, self.size, force=True)
+        if self.sha256 is not None:
+            digest = digest or sha256_file(self.part)
+            if digest != self.sha256:
+                self.discard()
+                raise ChecksumError(f'SHA-256 mismatch: expected {self.sha256}, got {digest}')
+        os.replace(self.part, self.dest)
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        return self.dest
+
+
+def download(url: str, dest: str, sha256=None, segments=SEGMENTS, progress=None, cancel=None,
+             timeout=TIMEOUT, retries=RETRIES) -> str:
+    """
+    Descarga `url` en `dest` (ver el docstring del módulo) y devuelve `dest`.
+    Con `sha256` el fichero se verifica antes de publicarlo (ChecksumError si
+    no coincide). progress(bytes, total) se llama desde este hilo como mucho
+    cada PROGRESS_INTERVAL. Si `cancel` (threading.Event) se activa se lanza
+    DownloadCancelled y la próxima llamada continúa desde lo descargado.
+    """
+    return SegmentedDownload(url, dest, sha256=sha256, segments=segments, progress=progress, cancel=cancel,
+                             timeout=timeout, retries=retries).run()
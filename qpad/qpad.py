@@ -1,18 +1,20 @@
 import os
+import sys
 import threading
 import webbrowser
 import subprocess
-import requests
 import tkinter as tk
 from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
+
+from release_cache import ReleaseCache
 
 # — Configuración —
 REPO_OWNER  = "Soyzian"
 REPO_NAME   = "qpad"
 CV_FILE     = "cv.txt"
-MAIN_EXE    = "QPad-main.exe"
+MAIN_EXE    = os.environ.get("QPAD_MAIN_EXE", "QPad-main.exe")
 SPLASH_BMP  = "splash.bmp"
+TOAST_MS    = 10000
 
 # — Util: parse semántico de versiones simples —
 def parse_version(v):
@@ -35,18 +37,21 @@ def get_local_version():
         return "0.0.0"
 
 def get_latest_version():
-    url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/releases/latest"
-    r = requests.get(url, timeout=5)
-    r.raise_for_status()
-    data = r.json()
+    # Con la caché fresca no hay ninguna petición (ver release_cache.py)
+    data = ReleaseCache().latest_release(f"{REPO_OWNER}/{REPO_NAME}")
+    if data is None:
+        raise LookupError("no hay releases publicadas")
     return data["tag_name"], data["html_url"]
 
 # — Lanzar app y cerrar —
-def launch_main(window):
+def start_main():
     try:
         subprocess.Popen([os.path.join(os.getcwd(), MAIN_EXE)], shell=True)
     except:
         pass
+
+def launch_main(window):
+    start_main()
     window.destroy()
 
 # — Worker de comprobación de actualizaciones —
@@ -86,6 +91,9 @@ def check_updates(local_label, remote_label, progress, splash):
 
 # — Construye y muestra el splash —
 def create_splash():
+    # PIL solo hace falta para el splash: no retrasa el arranque directo
+    from PIL import Image, ImageTk
+
     root = tk.Tk()
     root.overrideredirect(True)
     root.configure(background="#0B1F0A")
@@ -129,5 +137,52 @@ def create_splash():
 
     root.mainloop()
 
+# — Aviso no bloqueante de nueva versión —
+def show_toast(latest, html_url):
+    root = tk.Tk()
+    root.overrideredirect(True)
+    root.attributes("-topmost", True)
+    root.configure(background="#0B1F0A")
+
+    tk.Label(root, text=f"Hay una nueva versión de QPad: {latest}", fg="white", bg="#0B1F0A",
+             font=("Verdana", 10)).pack(padx=12, pady=(10, 6))
+    buttons = tk.Frame(root, background="#0B1F0A")
+    buttons.pack(padx=12, pady=(0, 10), anchor="e")
+
+    def open_release():
+        webbrowser.open(html_url)
+        root.destroy()
+
+    ttk.Button(buttons, text="Ahora no", command=root.destroy).pack(side="right")
+    ttk.Button(buttons, text="Ver versión", command=open_release).pack(side="right", padx=(0, 6))
+
+    # Esquina inferior derecha, sin quitar el foco al editor
+    root.update_idletasks()
+    w, h = root.winfo_width(), root.winfo_height()
+    ws, hs = root.winfo_screenwidth(), root.winfo_screenheight()
+    root.geometry(f"+{ws - w - 20}+{hs - h - 60}")
+    root.after(TOAST_MS, root.destroy)
+    root.mainloop()
+
+# — Arranque directo: el editor primero, la comprobación después —
+def launch_and_check():
+    # QPad-main.exe es otro proceso: la consulta de versión corre en paralelo
+    # con su arranque y no retrasa nada
+    start_main()
+    local = get_local_version()
+    try:
+        latest, html_url = get_latest_version()
+    except Exception:
+        return
+    if is_newer(local, latest):
+        try:
+            show_toast(latest, html_url)
+        except tk.TclError:
+            pass    # sin pantalla donde avisar; ya se avisará en el próximo arranque
+
 if __name__ == "__main__":
-    create_splash()
+    # --splash: comportamiento anterior (comprobar y luego lanzar)
+    if "--splash" in sys.argv[1:]:
+        create_splash()
+    else:
+        launch_and_check()
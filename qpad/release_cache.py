@@ -0,0 +1,146 @@
+"""
+Caché en disco de los metadatos de releases de GitHub, compartida por el
+lanzador (qpad.py) y el actualizador (bin/qpad-updater.py).
+
+Cada URL de la API se guarda con su ETag/Last-Modified y la hora de la
+última respuesta del servidor:
+
+- fresca (edad < ttl): se devuelve sin tocar la red;
+- caducada (edad < max_stale): se devuelve al momento y se revalida en un
+  hilo con If-None-Match (un 304 solo renueva la hora y no gasta cuota de
+  la API sin autenticar);
+- sin entrada o más vieja: petición condicional síncrona.
+
+Si la red o la API fallan (sin conexión, límite de peticiones) se usa lo
+guardado aunque esté caducado. requests solo se importa si hay que pedir
+algo: un arranque con la caché fresca no carga nada de red.
+"""
+import json
+import os
+import threading
+import time
+
+GITHUB_API = os.environ.get('QPAD_GITHUB_API', 'https://api.github.com')
+TTL = 60 * 60
+MAX_STALE = 7 * 24 * 60 * 60
+TIMEOUT = 5
+CACHE_FILE = 'release-cache.json'
+
+
+def default_cache_path() -> str:
+    """%LOCALAPPDATA%/QPad en Windows, $XDG_CACHE_HOME/qpad (o ~/.cache/qpad) en el resto."""
+    override = os.environ.get('QPAD_RELEASE_CACHE')
+    if override:
+        return override
+    if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+        folder = os.path.join(os.environ['LOCALAPPDATA'], 'QPad')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        folder = os.path.join(base, 'qpad')
+    return os.path.join(folder, CACHE_FILE)
+
+
+class ReleaseCache:
+    def __init__(self, path=None, api=GITHUB_API, ttl=TTL, max_stale=MAX_STALE, timeout=TIMEOUT):
+        self.path = path or default_cache_path()
+        self.api = api.rstrip('/')
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.revalidating = {}      # url -> hilo de revalidación en curso
+        self.requests = 0           # peticiones hechas por esta instancia
+
+    # --- fichero ---
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_entry(self, url: str, entry: dict):
+        """Guarda una entrada releyendo el fichero: el lanzador y el actualizador lo comparten."""
+        with self.lock:
+            entries = self.load()
+            entries[url] = entry
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f)
+                os.replace(tmp, self.path)
+            except OSError:
+                # sin caché en disco se sigue funcionando, solo que sin ahorro
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+    # --- consultas ---
+
+    def fetch(self, url: str, entry=None) -> dict:
+        """Petición condicional; devuelve la entrada nueva (o la misma renovada si hubo 304)."""
+        import requests
+
+        headers = {'Accept': 'application/vnd.github+json'}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        elif entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        with self.lock:
+            self.requests += 1
+        r = requests.get(url, headers=headers, timeout=self.timeout)
+        if r.status_code == 304 and entry:
+            entry = dict(entry, fetched=time.time())
+        elif r.status_code == 404:
+            # p. ej. /releases/latest sin ninguna release publicada
+            entry = {'etag': r.headers.get('ETag'), 'last_modified': None, 'fetched': time.time(), 'data': None}
+        else:
+            r.raise_for_status()
+            entry = {'etag': r.headers.get('ETag'), 'last_modified': r.headers.get('Last-Modified'),
+                     'fetched': time.time(), 'data': r.json()}
+        self.save_entry(url, entry)
+        return entry
+
+    def revalidate(self, url: str, entry: dict):
+        """Revalida en segundo plano; el hilo no es daemon para que acabe aunque el lanzador termine."""
+        with self.lock:
+            if url in self.revalidating:
+                return
+            thread = threading.Thread(target=self._revalidate, args=(url, entry), name='release-revalidate')
+            self.revalidating[url] = thread
+        thread.start()
+
+    def _revalidate(self, url: str, entry: dict):
+        try:
+            self.fetch(url, entry)
+        except Exception:
+            pass    # se reintentará en la próxima consulta
+        finally:
+            with self.lock:
+                self.revalidating.pop(url, None)
+
+    def wait(self, timeout=None):
+        """Espera a las revalidaciones en curso (pruebas y benchmarks)."""
+        for thread in list(self.revalidating.values()):
+            thread.join(timeout)
+
+    def get(self, url: str):
+        """JSON de `url` según la política del docstring del módulo (None si es un 404)."""
+        entry = self.load().get(url)
+        age = time.time() - entry['fetched'] if entry else None
+        if entry is not None and age < self.ttl:
+            return entry['data']
+        if entry is not None and age < self.max_stale:
+            self.revalidate(url, entry)
+            return entry['data']
+        try:
+            return self.fetch(url, entry)['data']
+        except Exception:
+            if entry is None:
+                raise
+            return entry['data']
+
+    def latest_release(self, repo: str):
+        """Última release publicada de `repo` ("owner/nombre"): GitHub ya excluye borradores y prereleases."""
+        return self.get(f'{self.api}/repos/{repo}/releases/latest')